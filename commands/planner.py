@@ -46,8 +46,7 @@ def create_weekly_meeting_plan(month, year):
     next_month_first_day = datetime.datetime.strptime(f"01 {month}, {year}", "%d %b, %Y")
     weekly_meeting_planner = WeeklyMeetingPlanner(next_month_first_day)
     next_months_plan = weekly_meeting_planner.create_plan(f"{month} - Weekly Meeting Signup")
-    weekly_meeting_planner.create_buckets(next_months_plan.id)
-    weekly_meeting_planner.populate_tasks_in_buckets_from_template(next_months_plan.id)
+    weekly_meeting_planner.reconcile_plan(next_months_plan.id)
 
 
 @planner_cmd.command()
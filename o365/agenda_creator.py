@@ -1,6 +1,4 @@
-import asyncio
 from datetime import datetime
-import time
 import sys
 from loguru import logger
 from msgraph.generated.models.planner_task import PlannerTask
@@ -10,13 +8,17 @@ from o365.util.constants import Constants
 from o365.util.meeting_util import MeetingUtil
 from o365.util.date_util import DateUtil
 from o365.auth.auth_helper import AuthHelper
+from o365.drive.copy_monitor import CopyMonitor
 from o365.drive.drive_helper import DriveHelper
+from o365.drive.drive_item_resolver import DriveItemResolver
 from o365.excel.range_assignments import RangeAssignments
 from o365.excel.range_assignments_reverse import RangeAssignmentsReverse
 from o365.exception.agenda_exception import AgendaException
+from o365.user.member_directory import MemberDirectory
 from o365.user.user_helper import UserHelper
 from o365.planner.planner_helper import PlannerHelper
 from o365.graph.graph_helper import GraphHelper
+from o365.util.async_runner import AsyncRunner
 
 
 class AgendaCreator:
@@ -26,6 +28,9 @@ class AgendaCreator:
     _graph_client = None
     _next_tuesday: datetime
     _next_tuesday_date: str
+    # Folders from the root of the group drive
+    weekly_meeting_channel_path: str = "Weekly Meeting Channel"
+    meeting_automation_path: str = "Meeting Automation"
     _next_tuesday_date_us: str
     _next_tuesday_month: str
     _next_tuesday_meeting_docs: str
@@ -51,98 +56,70 @@ class AgendaCreator:
 
     def get_assigned_to_user(self, task):
         """Gets assigned to user for task"""
-        retry_count = 0
-        assigned_to_user = None
-        while retry_count < 5:
-            try:
-                logger.debug(f"Getting the assigned to user for task: {task.title}")
-                assigned_to_users = list(task.assignments.additional_data.keys())
-                if assigned_to_users is not None and len(assigned_to_users) > 0:
-                    assigned_to_user_id = list(task.assignments.additional_data.keys())[0]
-                    user = asyncio.run(UserHelper.get_user(self._graph_client, assigned_to_user_id))
-                    if user is not None:
-                        return user
-                else:
-                    return assigned_to_user
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-                    else:
-                        logger.error(f"Error getting assigned user. {e}")
-                        break  # do something here, like log the error
-        return assigned_to_user
+        logger.debug(f"Getting the assigned to user for task: {task.title}")
+        assigned_to_users = list(task.assignments.additional_data.keys())
+        if assigned_to_users is not None and len(assigned_to_users) > 0:
+            assigned_to_user_id = assigned_to_users[0]
+            return UserHelper.user_from_dict(MemberDirectory.get_user(self._group_id, assigned_to_user_id))
+        return None
+
+    # GET https://graph.microsoft.com/v1.0/users?$filter=id in ('{id}', ...)
+    def _get_assigned_to_users(self, tasks: list) -> dict:
+        """Gets the assigned to users for the tasks from the member directory, reading the others in bulk"""
+        assigned_to_user_ids = {}
+        for task in tasks:
+            if task.assignments is not None and task.assignments.additional_data:
+                assigned_to_user_ids[task.id] = list(task.assignments.additional_data.keys())[0]
+        users_by_id = {member["id"]: member for member in MemberDirectory.members(self._group_id)}
+        user_ids = []
+        for user_id in dict.fromkeys(assigned_to_user_ids.values()):
+            if user_id in users_by_id:
+                continue
+            # Users that are not members and were already read are not read again
+            users_by_id[user_id] = MemberDirectory.cached_user(user_id)
+            if users_by_id[user_id] is None:
+                user_ids.append(user_id)
+        if user_ids:
+            logger.debug(f"Getting the assigned to users {user_ids} that are not group members")
+            users = AsyncRunner.run(UserHelper.get_users(self._graph_client, user_ids))
+            for user_id, user in users.items():
+                users_by_id[user_id] = UserHelper.user_to_dict(user)
+                MemberDirectory.put_user(users_by_id[user_id])
+        return {
+            task_id: users_by_id[user_id]
+            for task_id, user_id in assigned_to_user_ids.items()
+            if users_by_id.get(user_id) is not None
+        }
 
     def get_drive(self):
         """Gets the drive for the specified group_id"""
-        retry_count = 0
-        drive_4_group = None
-        while retry_count < 3:
-            try:
-                logger.debug(f"Getting the drive for group: {self._group_id}")
-                drive = asyncio.run(DriveHelper.get_drive(self._graph_client, self._group_id))
-                if drive:
-                    return drive
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-                    else:
-                        logger.error(f"Error getting drive. {e}")
-                        break  # do something here, like log the error
-        return drive_4_group
+        logger.debug(f"Getting the drive for group: {self._group_id}")
+        return AsyncRunner.run(DriveHelper.get_drive(self._graph_client, self._group_id))
 
     def _create_weekly_meeting_docs(self, drive_id, item_id, meeting_docs_folder):
-        """Create the weekly meeting docs folder"""
-        retry_count = 0
-        folder_item_id = None
-        while retry_count < 5:
-            try:
-                logger.debug(f"Creating the folder {meeting_docs_folder} for drive item: {item_id}")
-                folder_item = asyncio.run(
-                    DriveHelper.create_folder(self._graph_client, drive_id, item_id, meeting_docs_folder)
-                )
-                if folder_item and folder_item.id:
-                    return folder_item.id
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-
-        return folder_item_id
-
-    # GET /drives/{drive-id}/root/search(q=\'FolderName\')?$filter=item ne null&$select=name,id,webUrl'
-    def search_item_with_name(self, drive_id: str, item_name: str, parent_sub_path: str = None):
-        """Search the the drive id for matching item"""
-        try:
-            logger.debug(f"Searching the item matching {item_name} in drive {drive_id}")
-            graph_helper: GraphHelper = GraphHelper()
-            if parent_sub_path is not None:
-                item = graph_helper.get_request(
-                    f"/drives/{drive_id}/root:/{parent_sub_path}/{item_name}?$select=name,id,webUrl",
-                    {"Content-Type": "application/json"},
-                )
-                if item and item is not None:
-                    logger.debug(f"Found {item}")
-                    return item
-            item = graph_helper.get_request(
-                f"/drives/{drive_id}/root/search(q='{item_name}')?$select=name,id,webUrl",
-                {"Content-Type": "application/json"},
+        """Create the weekly meeting docs folder and returns the item"""
+        logger.debug(f"Creating the folder {meeting_docs_folder} for drive item: {item_id}")
+        folder_item = AsyncRunner.run(
+            DriveHelper.create_folder(self._graph_client, drive_id, item_id, meeting_docs_folder)
+        )
+        if folder_item and folder_item.id:
+            return DriveItemResolver.put(
+                drive_id,
+                f"{self.weekly_meeting_channel_path}/{meeting_docs_folder}",
+                {
+                    "id": folder_item.id,
+                    "name": folder_item.name,
+                    "webUrl": folder_item.web_url,
+                    "eTag": folder_item.e_tag,
+                },
             )
-            if item and item["value"] is not None:
-                logger.debug(f"Found item vaue {len(item['value'])}")
-                for value in item["value"]:
-                    if value["name"] == item_name:
-                        logger.debug(f"Found item {value['name']}")
-                        return value
-        except AgendaException as e:
-            logger.error(f"Error searching drive item {item_name}. {e}")
         return None
 
-    # POST /drives/{drive-id}/items/{item-id}/copy'
+    # GET /drives/{drive-id}/root:/{parent-sub-path}/{item-name}
+    def search_item_with_name(self, drive_id: str, item_name: str, parent_sub_path: str = None):
+        """Get the item with the name in the folder at the sub path, searching the drive for it when not found there"""
+        return DriveItemResolver.get_item(drive_id, "/".join(path for path in [parent_sub_path, item_name] if path))
+
     def _copy_agenda_to_meeting_folder(
         self,
         drive_id: str,
@@ -150,35 +127,9 @@ class AgendaCreator:
         meeting_folder_item_id: str,
         meeting_agenda_excel_name: str,
     ):
-        """Copy agenda template to the meeting folder"""
-        retry_count = 0
-        agenda_item = None
-        while retry_count < 10:
-            try:
-                logger.debug(
-                    f"Copying the agenda template {template_item_id} to meeting folder: {meeting_folder_item_id}"
-                )
-                copy_status = asyncio.run(
-                    DriveHelper.copy_item(
-                        self._graph_client,
-                        drive_id,
-                        template_item_id,
-                        meeting_folder_item_id,
-                        meeting_agenda_excel_name,
-                    )
-                )
-                if copy_status:
-                    return copy_status
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 10:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-            except Exception as ex:
-                if "DeserializationError" in str(ex):
-                    time.sleep(30)
-
-        return agenda_item
+        """Copy agenda template to the meeting folder, returns the id of the copy once it completes"""
+        logger.debug(f"Copying the agenda template {template_item_id} to meeting folder: {meeting_folder_item_id}")
+        return CopyMonitor.copy_item(drive_id, template_item_id, meeting_folder_item_id, meeting_agenda_excel_name)
 
     def _do_next_meeting_docs_item(
         self,
@@ -187,48 +138,56 @@ class AgendaCreator:
         meeting_docs_folder,
         is_create_not_exist: bool,
     ):
-        """Searches and/or creates the next meeting docs folder and returns the item"""
-        retry = 0
-        while True:
-            meeting_docs_folder_item = self.search_item_with_name(drive_id, meeting_docs_folder)
+        """Gets and/or creates the next meeting docs folder and returns the item"""
+        meeting_docs_folder_path = f"{self.weekly_meeting_channel_path}/{meeting_docs_folder}"
+        meeting_docs_folder_item = DriveItemResolver.get_item(drive_id, meeting_docs_folder_path, search=False)
+        if meeting_docs_folder_item is not None:
+            return meeting_docs_folder_item
+        if is_create_not_exist:
+            meeting_docs_folder_item = self._create_weekly_meeting_docs(
+                drive_id, wmc_drive_item_id, meeting_docs_folder
+            )
             if meeting_docs_folder_item is not None:
                 return meeting_docs_folder_item
-            if is_create_not_exist and retry == 0:
-                self._create_weekly_meeting_docs(drive_id, wmc_drive_item_id, meeting_docs_folder)
-            retry = retry + 1
-            if retry < 30:
-                time.sleep(30)
-            else:
-                raise AgendaException(f"Could not find the id for the meeting docs folder {meeting_docs_folder}")
+        meeting_docs_folder_item = DriveItemResolver.wait_for_item(drive_id, meeting_docs_folder_path)
+        if meeting_docs_folder_item is None:
+            raise AgendaException(f"Could not find the id for the meeting docs folder {meeting_docs_folder}")
+        return meeting_docs_folder_item
 
     def _do_next_meeting_agenda_excel_item_id(
         self, drive_id, meeting_docs_folder_item_id, ma_agenda_template_item_id=None
     ):
-        """Search and/or copy the next meeting agenda excel file and returns the item"""
-        retry = 0
-        while True:
-            next_meeting_agenda_excel_item = self.search_item_with_name(drive_id, self._meeting_agenda_excel)
-            if next_meeting_agenda_excel_item is not None:
-                return next_meeting_agenda_excel_item
-            if ma_agenda_template_item_id is not None and retry == 0:
-                self._copy_agenda_to_meeting_folder(
-                    drive_id,
-                    ma_agenda_template_item_id,
-                    meeting_docs_folder_item_id,
-                    self._meeting_agenda_excel,
-                )
-            retry = retry + 1
-            if retry < 50:
-                time.sleep(30)
-            else:
-                raise AgendaException(
-                    f"Could not find the id for the next meeting agenda excel {self._meeting_agenda_excel}"
+        """Gets and/or copies the next meeting agenda excel file and returns the item"""
+        agenda_excel_path = (
+            f"{self.weekly_meeting_channel_path}/{self._next_tuesday_meeting_docs}/{self._meeting_agenda_excel}"
+        )
+        next_meeting_agenda_excel_item = DriveItemResolver.get_item(drive_id, agenda_excel_path, search=False)
+        if next_meeting_agenda_excel_item is not None:
+            return next_meeting_agenda_excel_item
+        if ma_agenda_template_item_id is not None:
+            next_meeting_agenda_excel_item_id = self._copy_agenda_to_meeting_folder(
+                drive_id,
+                ma_agenda_template_item_id,
+                meeting_docs_folder_item_id,
+                self._meeting_agenda_excel,
+            )
+            if next_meeting_agenda_excel_item_id is not None:
+                next_meeting_agenda_excel_item = DriveItemResolver.get_item_by_id(
+                    drive_id, next_meeting_agenda_excel_item_id, agenda_excel_path
                 )
+                if next_meeting_agenda_excel_item is not None:
+                    return next_meeting_agenda_excel_item
+        next_meeting_agenda_excel_item = DriveItemResolver.wait_for_item(drive_id, agenda_excel_path)
+        if next_meeting_agenda_excel_item is None:
+            raise AgendaException(
+                f"Could not find the id for the next meeting agenda excel {self._meeting_agenda_excel}"
+            )
+        return next_meeting_agenda_excel_item
 
     def _get_meeting_docs_folder_item(self, drive):
         """Get the meeting docs folder item"""
         meeting_docs_folder = self._next_tuesday_meeting_docs
-        wmc_drive_item = self.search_item_with_name(drive.id, "", "Weekly Meeting Channel")
+        wmc_drive_item = self.search_item_with_name(drive.id, "", self.weekly_meeting_channel_path)
         wmc_drive_item_id = wmc_drive_item["id"]
         logger.debug(f"Weekly Meeting Channel Drive Item Id: {wmc_drive_item_id}")
 
@@ -253,7 +212,7 @@ class AgendaCreator:
 
             logger.debug("Copying the meeting agenda to meeting docs folder.")
             ma_agenda_template_item = self.search_item_with_name(
-                drive.id, self._agenda_template_excel, "Meeting Automation"
+                drive.id, self._agenda_template_excel, self.meeting_automation_path
             )
             if ma_agenda_template_item is None:
                 raise AgendaException(f"Agenda template `{self._agenda_template_excel}` not found.")
@@ -286,13 +245,14 @@ class AgendaCreator:
             if tasks is None:
                 raise AgendaException("No matching tasks found for next the meeting next week")
             meeting_assignments: dict = {}
+            assigned_to_users = self._get_assigned_to_users(tasks)
             for task in tasks:
-                assigned_to_user = self.get_assigned_to_user(task)
+                assigned_to_user = assigned_to_users.get(task.id)
                 if assigned_to_user is not None:
                     logger.debug(
-                        f"{task.title}, due {task.due_date_time} is assigned to {assigned_to_user.display_name}"
+                        f"{task.title}, due {task.due_date_time} is assigned to {assigned_to_user['displayName']}"
                     )
-                    meeting_assignments[task.title.strip()] = assigned_to_user.display_name
+                    meeting_assignments[task.title.strip()] = assigned_to_user["displayName"]
             meeting_assignments["Meeting Day"] = "Tuesday"
             meeting_assignments["Meeting Date"] = self._next_tuesday_date_us
             return meeting_assignments
@@ -305,26 +265,26 @@ class AgendaCreator:
         try:
             logger.debug(f"Fetching the planner tasks from buucket {bucket_id}")
             graph_helper: GraphHelper = GraphHelper()
-            tasks = graph_helper.get_request(
+            tasks = graph_helper.get_paged_items(
                 f"planner/buckets/{bucket_id}/tasks",
                 {"Content-Type": "application/json"},
+                use_cache=True,
             )
-            if tasks and tasks["value"] is not None:
-                logger.debug(f"Found {len(tasks['value'])} tasks in bucket {bucket_id}.")
-                planner_tasks = []
-                for task in tasks["value"]:
-                    planner_task = PlannerTask()
-                    planner_task.id = task["id"]
-                    planner_task.title = task["title"]
-                    planner_task.percent_complete = task["percentComplete"]
-                    planner_task.priority = task["priority"]
-                    if task["dueDateTime"] is not None:
-                        planner_task.due_date_time = datetime.strptime(task["dueDateTime"], "%Y-%m-%dT%H:%M:%SZ")
-                    if task["assignments"] is not None:
-                        planner_task.assignments = PlannerAssignments(additional_data=task["assignments"])
-                    planner_tasks.append(planner_task)
-                logger.debug(f"Tasks: {planner_tasks}")
-                return planner_tasks
+            planner_tasks = []
+            for task in tasks:
+                planner_task = PlannerTask()
+                planner_task.id = task["id"]
+                planner_task.title = task["title"]
+                planner_task.percent_complete = task["percentComplete"]
+                planner_task.priority = task["priority"]
+                if task["dueDateTime"] is not None:
+                    planner_task.due_date_time = datetime.strptime(task["dueDateTime"], "%Y-%m-%dT%H:%M:%SZ")
+                if task["assignments"] is not None:
+                    planner_task.assignments = PlannerAssignments(additional_data=task["assignments"])
+                planner_tasks.append(planner_task)
+            logger.debug(f"Found {len(planner_tasks)} tasks in bucket {bucket_id}.")
+            logger.debug(f"Tasks: {planner_tasks}")
+            return planner_tasks
         except AgendaException as e:
             logger.error(f"Error getting tasks from bucket { {bucket_id}}. {e}")
         return None
@@ -1,4 +1,3 @@
-import asyncio
 import json
 import time
 from loguru import logger
@@ -8,6 +7,9 @@ from o365.excel.range_assignments import RangeAssignments
 from o365.excel.range_assignments_reverse import RangeAssignmentsReverse
 from o365.exception.agenda_exception import AgendaException
 from o365.graph.graph_helper import GraphHelper
+from o365.user.member_directory import MemberDirectory
+from o365.util.async_runner import AsyncRunner
+from o365.util.constants import Constants
 
 
 class AgendaExcel:
@@ -114,7 +116,17 @@ class AgendaExcel:
 
     # GET /users?$filter=startswith(displayName,'a')&$orderby=displayName&$count=true&$top=1
     def _get_user_by_display_name(self, display_name: str):
-        """Get the users with display name that matches"""
+        """Get the users with display name that matches, from the member directory before searching the users
+
+        A name matching more than one member is ambiguous and is not assigned, rather than guessing which member it is.
+        """
+        members = MemberDirectory.find_members_by_display_name(Constants.GROUP_IDS[0], display_name)
+        if len(members) == 1:
+            return members
+        if len(members) > 1:
+            member_names = ", ".join(member["displayName"] for member in members)
+            logger.warning(f"The name {display_name} matches the members {member_names}, it is not assigned")
+            return None
         try:
             logger.debug(f"Getting the users that matches the name {display_name}")
             graph_helper: GraphHelper = GraphHelper()
@@ -123,7 +135,7 @@ class AgendaExcel:
                 "&$count=true&$top=1&$select=id,displayName",
                 {"Content-Type": "application/json"},
             )
-            if users and users["value"] is not None:
+            if users and users["value"]:
                 logger.debug(users["value"])
                 return users["value"]
         except AgendaException as e:
@@ -151,24 +163,13 @@ class AgendaExcel:
     # GET /drives/{drive-id}/items/{id}/workbook/worksheets/
     def _get_agenda_worksheet_id(self, drive_id, item_id):
         """Create the Agenda worksheet id"""
-        retry_count = 0
-        excel_worksheet_id = None
-        while retry_count < 10:
-            try:
-                logger.debug(f"Getting the agenda worksheet id for drive item: {item_id}")
-                worksheets = asyncio.run(ExcelHelper.get_worksheets(self._graph_client, drive_id, item_id))
-                if worksheets and worksheets.value:
-                    for worksheet in worksheets.value:
-                        if worksheet.name == "Agenda":
-                            return worksheet.id
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 10:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-                    else:
-                        raise e
-        return excel_worksheet_id
+        logger.debug(f"Getting the agenda worksheet id for drive item: {item_id}")
+        worksheets = AsyncRunner.run(ExcelHelper.get_worksheets(self._graph_client, drive_id, item_id))
+        if worksheets and worksheets.value:
+            for worksheet in worksheets.value:
+                if worksheet.name == "Agenda":
+                    return worksheet.id
+        return None
 
     # PATCH /drives/{drive-id}/items/{id}/workbook/worksheets/{id|name}/range(address='A1:A2')
     # {
@@ -210,5 +211,6 @@ class AgendaExcel:
             self._update_agenda_worksheet_range(
                 self._drive_id, self._agenda_excel_item_id, self._agenda_worksheet_id, range_key, range_data
             )
+            # Workbook range updates sent back to back can fail to acquire the workbook edit lock, so they are paced
             time.sleep(2)
         return self._agenda_worksheet_id
@@ -9,6 +9,7 @@ from o365.teams.weekly_meeting_message import WeeklyMeetingMessage
 from o365.teams.teams_helper import TeamsHelper
 from o365.util.constants import Constants
 from o365.util.date_util import DateUtil
+from o365.util.retry_policy import RetryPolicy
 from o365.weekly_meeting_planner import WeeklyMeetingPlanner
 
 
@@ -29,6 +30,7 @@ class AgendaNotifier(AgendaCreator):
                 f"/teams/{team_id}/channels?"
                 f"$filter=startswith(displayName,'{display_name.replace(' ','%20')}')&$select=id,displayName",
                 {"Content-Type": "application/json"},
+                use_cache=True,
             )
             if channels and channels["value"] is not None:
                 logger.debug(channels["value"])
@@ -198,16 +200,18 @@ class AgendaNotifier(AgendaCreator):
                 if len(next_few_meeting_dates) == 0:
                     logger.info("Skip sending the meeting signup sheet as no meeting dates were found.")
                     return
-                meeting_date_role_assignments = {}
-                for meeting_date in next_few_meeting_dates:
-                    meeting_date_role_assignments[meeting_date] = WeeklyMeetingPlanner().get_functionary_signups(
-                        meeting_date
-                    )
-                meeting_date_absentees = {}
-                for meeting_date in next_few_meeting_dates:
-                    meeting_date_absentees[meeting_date] = WeeklyMeetingPlanner().get_absentee_signups(meeting_date)
-                retry_count = 0
-                while retry_count < 3:
+                # The signups of all the dates are read once and looked up by date
+                signup_index = WeeklyMeetingPlanner().signup_index()
+                meeting_date_role_assignments = {
+                    meeting_date: signup_index.functionary_signups(meeting_date)
+                    for meeting_date in next_few_meeting_dates
+                }
+                meeting_date_absentees = {
+                    meeting_date: signup_index.absentee_signups(meeting_date) for meeting_date in next_few_meeting_dates
+                }
+
+                def send_signup_sheet():
+                    """Send the signup sheet of the meeting dates, leaving out the last one when it is too large"""
                     logger.debug(f"Sending signup sheet for {next_few_meeting_dates}")
                     signup_sheet_card = WeeklyMeetingMessage.adaptive_card_signup_sheet_message(
                         meeting_date_role_assignments, meeting_date_absentees
@@ -221,18 +225,25 @@ class AgendaNotifier(AgendaCreator):
                     logger.debug(f"Payload: {signup_sheet_card_json}")
                     payload_size = len(json.dumps(signup_sheet_card_json).encode("utf-8"))
                     if payload_size > Constants.TEAMS_MSG_MAX_PAYLOAD_SIZE:
-                        logger.error(
-                            f"Could not send message as payload size {payload_size/1024}kb"
-                            f"is greater than allowed limit {Constants.TEAMS_MSG_MAX_PAYLOAD_SIZE/1024}kb"
-                        )
-                        retry_count += 1
+                        # The next attempt leaves out the last meeting date
                         meeting_date_role_assignments.pop(next_few_meeting_dates[-1])
                         meeting_date_absentees.pop(next_few_meeting_dates[-1])
                         next_few_meeting_dates.pop()
-                        continue
+                        raise AgendaException(
+                            f"Could not send message as payload size {payload_size/1024}kb "
+                            f"is greater than allowed limit {Constants.TEAMS_MSG_MAX_PAYLOAD_SIZE/1024}kb"
+                        )
                     logger.info(f"Sending Signup Sheet message of payload size {payload_size/1024}kb")
                     self._post_message_to_channel_webhook(signup_sheet_card_json)
-                    break
+
+                # A signup sheet too large to send is sent again right away with one meeting date less
+                retry_policy = RetryPolicy(
+                    max_attempts=3, base_delay=0, retry_if=lambda e: isinstance(e, AgendaException)
+                )
+                try:
+                    retry_policy.execute(send_signup_sheet)
+                except AgendaException as e:
+                    logger.error(f"Could not send the signup sheet within the payload size limit. {e}")
                 return
 
         except RuntimeError as e:
@@ -1,64 +1,142 @@
+import atexit
 import os
+import threading
+import time
 import httpx
 from loguru import logger
-from msal import ConfidentialClientApplication
+from msal import ConfidentialClientApplication, SerializableTokenCache
 from azure.identity.aio import ClientSecretCredential
 from msgraph import GraphServiceClient, GraphRequestAdapter
 from msgraph_core import GraphClientFactory
+from kiota_http.middleware.options import RetryHandlerOption
 from kiota_authentication_azure.azure_identity_authentication_provider import (
     AzureIdentityAuthenticationProvider,
 )
 
+from o365.graph.retry_transport import AsyncRetryTransport
+from o365.util.async_runner import AsyncRunner
 from o365.util.constants import Constants
 
 TENANT_ID = Constants.TENANT_ID
 CLIENT_ID = Constants.CLIENT_ID
 client_secret = os.environ["CLIENT_SECRET"]
 user_auth_code = os.environ.get("USER_AUTH_CODE")
+token_cache_path = os.environ.get("MSAL_TOKEN_CACHE_PATH")
 
 
 class AuthHelper:
     """Helper for authorization"""
 
+    # Tokens are refreshed this many seconds before they expire
+    token_expiry_skew: int = 300
+    _msal_app: ConfidentialClientApplication = None
+    _msal_token_cache: SerializableTokenCache = None
+    _access_tokens: dict = {}
+    _token_lock = threading.Lock()
+    _graph_service_clients: dict = {}
+    _graph_client_lock = threading.Lock()
+
     @staticmethod
-    def acquire_token():
+    def _confidential_client_app():
         """
-        Acquire token via MSAL
+        Get the MSAL confidential client app shared by the process, loading the persisted token cache if configured
         """
+        if AuthHelper._msal_app is not None:
+            return AuthHelper._msal_app
+        AuthHelper._msal_token_cache = SerializableTokenCache()
+        if token_cache_path is not None and os.path.exists(token_cache_path):
+            try:
+                with open(token_cache_path, "r", encoding="utf-8") as token_cache_file:
+                    AuthHelper._msal_token_cache.deserialize(token_cache_file.read())
+                logger.debug(f"Loaded the token cache from {token_cache_path}")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not load the token cache from {token_cache_path}. {e}")
         authority_url = f"https://login.microsoftonline.com/{TENANT_ID}"
-        app = ConfidentialClientApplication(
+        AuthHelper._msal_app = ConfidentialClientApplication(
             authority=authority_url,
             client_id=CLIENT_ID,
             client_credential=client_secret,
+            token_cache=AuthHelper._msal_token_cache,
         )
-        token = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-        if token.get("access_token") is None:
-            return None
-        return token["access_token"]
+        return AuthHelper._msal_app
 
     @staticmethod
-    def acquire_token_auth_code():
+    def _persist_token_cache():
         """
-        Acquire token on behalf of user via MSAL
+        Persist the serialized token cache to disk, if configured and changed
         """
-        authority_url = f"https://login.microsoftonline.com/{TENANT_ID}"
-        app = ConfidentialClientApplication(
-            authority=authority_url,
-            client_id=CLIENT_ID,
-            client_credential=client_secret,
-        )
-        token = app.acquire_token_by_authorization_code(
-            user_auth_code,
-            scopes=["user.read"],
-            redirect_uri="https://weeklymeetingagenda.azurewebsites.net/api/notify",
-        )
-        if token:
-            if token.get("access_token") is not None:
-                return token["access_token"]
-            logger.error(f"Invalid token: {token}")
+        if token_cache_path is None or not AuthHelper._msal_token_cache.has_state_changed:
+            return
+        try:
+            file_descriptor = os.open(token_cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            # The mode only applies when the file is created, so also restrict an existing file before writing to it
+            os.fchmod(file_descriptor, 0o600)
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as token_cache_file:
+                token_cache_file.write(AuthHelper._msal_token_cache.serialize())
+            logger.debug(f"Persisted the token cache to {token_cache_path}")
+        except OSError as e:
+            logger.warning(f"Could not persist the token cache to {token_cache_path}. {e}")
 
+    @staticmethod
+    def _cached_token(cache_key: str):
+        """
+        Get the cached access token, if it is not about to expire
+        """
+        cached_token = AuthHelper._access_tokens.get(cache_key)
+        if cached_token is not None and cached_token["expires_at"] - AuthHelper.token_expiry_skew > time.time():
+            return cached_token["access_token"]
         return None
 
+    @staticmethod
+    def _acquire_cached_token(cache_key: str, acquire):
+        """
+        Return the cached token for the key, or acquire it once under the lock and cache it until expiry
+        """
+        access_token = AuthHelper._cached_token(cache_key)
+        if access_token is not None:
+            return access_token
+        with AuthHelper._token_lock:
+            # Another thread may have refreshed the token while we waited on the lock
+            access_token = AuthHelper._cached_token(cache_key)
+            if access_token is not None:
+                return access_token
+            token = acquire(AuthHelper._confidential_client_app())
+            AuthHelper._persist_token_cache()
+            if not token:
+                return None
+            if token.get("access_token") is None:
+                logger.error(f"Invalid token: {token}")
+                return None
+            AuthHelper._access_tokens[cache_key] = {
+                "access_token": token["access_token"],
+                "expires_at": time.time() + int(token.get("expires_in", 0)),
+            }
+            return token["access_token"]
+
+    @staticmethod
+    def acquire_token():
+        """
+        Acquire token via MSAL, the token is reused until shortly before it expires
+        """
+        return AuthHelper._acquire_cached_token(
+            "client",
+            lambda app: app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"]),
+        )
+
+    @staticmethod
+    def acquire_token_auth_code():
+        """
+        Acquire token on behalf of user via MSAL, the token is reused until shortly before it expires
+        """
+        return AuthHelper._acquire_cached_token(
+            "auth_code",
+            lambda app: app.acquire_token_by_authorization_code(
+                user_auth_code,
+                scopes=["user.read"],
+                redirect_uri="https://weeklymeetingagenda.azurewebsites.net/api/notify",
+            ),
+        )
+
     @staticmethod
     def client_service_credential():
         """
@@ -82,17 +160,57 @@ class AuthHelper:
         return graph_client
 
     @staticmethod
-    def graph_service_client_with_adapter():
+    def graph_service_client_with_adapter(scopes: list = None):
         """
-        Get the graph service client
+        Get the graph service client for the scopes, one client with its credential and connection pool is shared
+        by the process for each tenant and set of scopes
+        """
+        scopes = scopes or ["https://graph.microsoft.com/.default"]
+        client_key = (TENANT_ID, CLIENT_ID, tuple(sorted(scopes)))
+        with AuthHelper._graph_client_lock:
+            registered_client = AuthHelper._graph_service_clients.get(client_key)
+            if registered_client is None:
+                registered_client = AuthHelper._create_graph_service_client(scopes)
+                AuthHelper._graph_service_clients[client_key] = registered_client
+        return registered_client["graph_client"]
+
+    @staticmethod
+    def _create_graph_service_client(scopes: list) -> dict:
+        """
+        Create the graph service client for the scopes along with the credential and http client it uses
         """
+        logger.debug(f"Creating the graph service client for tenant {TENANT_ID} and scopes {scopes}")
         credential: ClientSecretCredential = AuthHelper.client_service_credential()
-        auth_provider = AzureIdentityAuthenticationProvider(credential)
+        auth_provider = AzureIdentityAuthenticationProvider(credential, scopes=scopes)
         timeout = httpx.Timeout(connect=90, read=180, write=120, pool=None)
         limits = httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=30)
+        # Throttled and transient failures are retried by the transport, so turn off the sdk retry handler
         http_client = GraphClientFactory.create_with_default_middleware(
-            client=httpx.AsyncClient(timeout=timeout, limits=limits)
+            client=httpx.AsyncClient(transport=AsyncRetryTransport(limits=limits), timeout=timeout),
+            options={RetryHandlerOption.get_key(): RetryHandlerOption(should_retry=False)},
         )
         request_adapter = GraphRequestAdapter(auth_provider, http_client)
         graph_client = GraphServiceClient(request_adapter=request_adapter)
-        return graph_client
+        return {"graph_client": graph_client, "credential": credential, "http_client": http_client}
+
+    @staticmethod
+    def close_graph_service_clients():
+        """
+        Close the shared graph service clients, releasing their connection pools and credentials
+        """
+        with AuthHelper._graph_client_lock:
+            registered_clients = list(AuthHelper._graph_service_clients.values())
+            AuthHelper._graph_service_clients.clear()
+        for registered_client in registered_clients:
+            try:
+                # The clients were used on the shared event loop, so they are closed on it too
+                AsyncRunner.run(registered_client["http_client"].aclose())
+                AsyncRunner.run(registered_client["credential"].close())
+            except (RuntimeError, httpx.HTTPError) as e:
+                logger.warning(f"Could not close the graph service client. {e}")
+        if registered_clients:
+            logger.debug(f"Closed {len(registered_clients)} graph service clients")
+
+
+# Close the clients before the shared event loop they run on is stopped
+atexit.register(AuthHelper.close_graph_service_clients)
@@ -0,0 +1,100 @@
+import json
+import time
+from loguru import logger
+
+from o365.exception.agenda_exception import AgendaException
+from o365.graph.graph_helper import GraphHelper
+from o365.util.constants import Constants
+
+
+class CopyMonitor:
+    """This class copies drive items and follows the copy job to the new item
+
+    A copy runs asynchronously, the accepted response only has the url of its monitor in the Location header. The
+    monitor is polled with a backoff that adapts to the progress it reports, waiting about the time the copy still
+    needs, until it completes with the id of the new item.
+    """
+
+    min_delay: float = 0.5
+    max_delay: float = 15
+
+    # POST /drives/{drive-id}/items/{item-id}/copy
+    @staticmethod
+    def copy_item(
+        drive_id: str,
+        source_item_id: str,
+        dest_parent_item_id: str,
+        dest_item_name: str,
+        deadline: float = Constants.DRIVE_ITEM_WAIT_DEADLINE,
+    ):
+        """Copy the item to the parent folder with the name and wait for the copy, returns the id of the new item"""
+        try:
+            logger.debug(f"Copying item {source_item_id} as {dest_item_name} to parent {dest_parent_item_id}")
+            graph_helper: GraphHelper = GraphHelper()
+            monitor_url = graph_helper.post_request_for_monitor(
+                f"drives/{drive_id}/items/{source_item_id}/copy",
+                json.dumps(
+                    {"parentReference": {"driveId": drive_id, "id": dest_parent_item_id}, "name": dest_item_name}
+                ),
+                {"Content-Type": "application/json"},
+            )
+        except AgendaException as e:
+            logger.error(f"Error copying item {source_item_id} to {dest_item_name}. {e}")
+            return None
+        if monitor_url is None:
+            logger.error(f"The copy of item {source_item_id} to {dest_item_name} did not return a monitor")
+            return None
+        return CopyMonitor.wait(monitor_url, deadline)
+
+    # GET {monitor-url}
+    @staticmethod
+    def wait(monitor_url: str, deadline: float = Constants.DRIVE_ITEM_WAIT_DEADLINE):
+        """Poll the copy monitor until the copy completes, returns the id of the new item or None when it failed or
+        did not complete within the deadline in seconds
+        """
+        started = time.monotonic()
+        delay = CopyMonitor.min_delay
+        while True:
+            try:
+                monitor_status = GraphHelper().get_monitor_status(monitor_url)
+            except AgendaException as e:
+                logger.error(f"Error getting the status of the copy. {e}")
+                return None
+            status = monitor_status.get("status")
+            if status == "completed":
+                resource_id = CopyMonitor._resource_id(monitor_status)
+                logger.debug(f"The copy completed in {time.monotonic() - started:.1f}s as item {resource_id}")
+                return resource_id
+            if status in ["failed", "cancelled"]:
+                logger.error(f"The copy {status}. {monitor_status.get('error')}")
+                return None
+            delay = CopyMonitor._next_delay(delay, time.monotonic() - started, monitor_status)
+            if time.monotonic() - started + delay > deadline:
+                logger.error(f"The copy did not complete within {deadline}s, it is {status}")
+                return None
+            logger.debug(f"The copy is {status} {monitor_status.get('percentageComplete')}%, waiting {delay:.1f}s")
+            time.sleep(delay)
+
+    @staticmethod
+    def _next_delay(delay: float, elapsed: float, monitor_status: dict) -> float:
+        """Get the wait before polling the monitor again, the full Retry-After it asked for, or else the time the copy
+        still needs at the rate it progressed so far, or else double the last wait
+        """
+        if monitor_status.get("retryAfter") is not None:
+            return max(monitor_status["retryAfter"], CopyMonitor.min_delay)
+        percentage_complete = monitor_status.get("percentageComplete") or 0
+        if 0 < percentage_complete < 100:
+            delay = elapsed * (100 - percentage_complete) / percentage_complete
+        else:
+            delay = delay * 2
+        return min(max(delay, CopyMonitor.min_delay), CopyMonitor.max_delay)
+
+    @staticmethod
+    def _resource_id(monitor_status: dict):
+        """Get the id of the new item from the completed monitor status, or from the url it redirected to"""
+        if monitor_status.get("resourceId"):
+            return monitor_status["resourceId"]
+        resource_location = (monitor_status.get("resourceLocation") or "").split("?")[0]
+        if "/items/" in resource_location:
+            return resource_location.split("/items/")[-1].strip("/")
+        return None
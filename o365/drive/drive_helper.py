@@ -3,12 +3,10 @@ from loguru import logger
 from msgraph import GraphServiceClient
 from msgraph.generated.models.folder import Folder
 from msgraph.generated.models.drive_item import DriveItem
-from msgraph.generated.drives.item.items.item.copy.copy_post_request_body import (
-    CopyPostRequestBody,
-)
-from msgraph.generated.models.item_reference import ItemReference
 from kiota_abstractions.api_error import APIError
 
+from o365.graph.graph_helper import GraphHelper
+
 
 class DriveHelper:
     """This is a helper for Onedrive"""
@@ -116,39 +114,8 @@ class DriveHelper:
                 .items.by_drive_item_id(parent_item_id)
                 .children.post(request_body)
             )
+            GraphHelper.invalidate("drives")
             return folder_result
         except APIError as e:
             logger.error(f"Error creating folder {folder_name}: {e.error.message}")
         return None
-
-    @staticmethod
-    # GET /drives/{drive-id}/items/{parent-item-id}/children
-    async def copy_item(
-        graph_client: GraphServiceClient,
-        drive_id: str,
-        source_item_id: str,
-        dest_parent_item_id: str,
-        dest_item_name: str,
-    ):
-        """Create a folder under the parent item"""
-        try:
-            logger.debug(
-                f"Copying item {dest_item_name} with id {source_item_id}\
-                      to destination with parent id {dest_parent_item_id}"
-            )
-            request_body = CopyPostRequestBody(
-                parent_reference=ItemReference(
-                    drive_id=drive_id,
-                    id=dest_parent_item_id,
-                ),
-                name=dest_item_name,
-            )
-            copy_result = (
-                await graph_client.drives.by_drive_id(drive_id)
-                .items.by_drive_item_id(source_item_id)
-                .copy.post(request_body)
-            )
-            return copy_result
-        except APIError as e:
-            logger.error(f"Error copying item to {dest_item_name}: {e.error.message}")
-        return None
@@ -0,0 +1,144 @@
+import threading
+import time
+from urllib.parse import quote, unquote
+from loguru import logger
+
+from o365.exception.agenda_exception import AgendaException
+from o365.graph.graph_helper import GraphHelper
+from o365.util.constants import Constants
+
+
+class DriveItemResolver:
+    """This class resolves drive items by their path from the drive root, kept for a time to live
+
+    An item is read by its path, which unlike a search is consistent as soon as the item is created. The id, name,
+    webUrl and eTag of the items found are kept by drive and path, items that are not found are read again on the
+    next lookup. Searching the drive by name is only a fallback, as search results lag behind the changes.
+    """
+
+    ttl: float = Constants.DRIVE_ITEM_CACHE_TTL
+    # Seconds between searches for an item that is waited for and not found by path yet
+    search_interval: float = 60
+    select: str = "id,name,webUrl,eTag,parentReference"
+    _items: dict = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_item(drive_id: str, path: str, search: bool = True):
+        """Get the item at the path from the drive root, or else when search the item with its name in the drive"""
+        path = path.strip("/")
+        with DriveItemResolver._lock:
+            cached_item = DriveItemResolver._items.get((drive_id, path))
+            if cached_item is not None and cached_item["expires_at"] > time.monotonic():
+                return dict(cached_item["item"])
+        item = DriveItemResolver._get_item_by_path(drive_id, path)
+        if item is None and search:
+            item = DriveItemResolver._search_item(drive_id, path)
+        if item is None:
+            return None
+        return DriveItemResolver.put(drive_id, path, item)
+
+    # GET /drives/{drive-id}/items/{item-id}?$select=id,name,webUrl,eTag,parentReference
+    @staticmethod
+    def get_item_by_id(drive_id: str, item_id: str, path: str):
+        """Get the item with the id, such as an item just copied, and keep it as the item at the path"""
+        try:
+            logger.debug(f"Getting the drive item {item_id} in drive {drive_id}")
+            graph_helper: GraphHelper = GraphHelper()
+            item = graph_helper.get_request(
+                f"drives/{drive_id}/items/{item_id}?$select={DriveItemResolver.select}",
+                {"Content-Type": "application/json"},
+            )
+            if item and item.get("id") is not None:
+                return DriveItemResolver.put(drive_id, path, item)
+        except AgendaException as e:
+            logger.error(f"Error getting drive item {item_id}. {e}")
+        return None
+
+    @staticmethod
+    def wait_for_item(drive_id: str, path: str, deadline: float = Constants.DRIVE_ITEM_WAIT_DEADLINE):
+        """Wait for the item at the path to be created, reading it by path with backoff until the deadline in seconds
+        passes, and searching for it as well once every search interval
+        """
+        started = time.monotonic()
+        next_search = started + DriveItemResolver.search_interval
+        delay = 1
+        while True:
+            search = time.monotonic() >= next_search
+            if search:
+                logger.debug(f"The drive item {path} was not found by path yet, searching for it as well")
+                next_search = time.monotonic() + DriveItemResolver.search_interval
+            item = DriveItemResolver.get_item(drive_id, path, search=search)
+            if item is not None:
+                return item
+            if time.monotonic() - started + delay > deadline:
+                break
+            logger.debug(f"Waiting {delay}s for the drive item {path}")
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+        logger.warning(f"The drive item {path} was not found by path within {deadline}s, searching for it")
+        return DriveItemResolver.get_item(drive_id, path)
+
+    @staticmethod
+    def put(drive_id: str, path: str, item: dict) -> dict:
+        """Keep the id, name, webUrl and eTag of the item at the path, such as an item just created"""
+        item = {key: item.get(key) for key in ["id", "name", "webUrl", "eTag"]}
+        with DriveItemResolver._lock:
+            DriveItemResolver._items[(drive_id, path.strip("/"))] = {
+                "expires_at": time.monotonic() + DriveItemResolver.ttl,
+                "item": item,
+            }
+        return dict(item)
+
+    @staticmethod
+    def invalidate(drive_id: str = None, path: str = None):
+        """Read the item at the path, or all the items of the drive, or all the items, again on the next lookup"""
+        with DriveItemResolver._lock:
+            for key in list(DriveItemResolver._items):
+                if drive_id is None or (key[0] == drive_id and (path is None or key[1] == path.strip("/"))):
+                    DriveItemResolver._items.pop(key)
+
+    # GET /drives/{drive-id}/root:/{path}?$select=id,name,webUrl,eTag,parentReference
+    @staticmethod
+    def _get_item_by_path(drive_id: str, path: str):
+        """Read the item at the path from the drive root"""
+        try:
+            logger.debug(f"Getting the drive item at {path} in drive {drive_id}")
+            graph_helper: GraphHelper = GraphHelper()
+            item = graph_helper.get_request(
+                f"drives/{drive_id}/root:/{quote(path)}?$select={DriveItemResolver.select}",
+                {"Content-Type": "application/json"},
+                not_found_ok=True,
+            )
+            if item and item.get("id") is not None:
+                return item
+            logger.debug(f"The drive item {path} was not found by path")
+        except AgendaException as e:
+            logger.error(f"Error getting drive item {path}. {e}")
+        return None
+
+    # GET /drives/{drive-id}/root/search(q='{name}')?$select=id,name,webUrl,eTag,parentReference
+    @staticmethod
+    def _search_item(drive_id: str, path: str):
+        """Search the drive for the item with the name, preferring the one in the folder of the path"""
+        parent_path, _, item_name = path.rpartition("/")
+        try:
+            logger.debug(f"Searching the item matching {item_name} in drive {drive_id}")
+            # A quote in the name is escaped by doubling it
+            search_text = quote(item_name.replace("'", "''"))
+            graph_helper: GraphHelper = GraphHelper()
+            items = graph_helper.get_request(
+                f"drives/{drive_id}/root/search(q='{search_text}')?$select={DriveItemResolver.select}",
+                {"Content-Type": "application/json"},
+            )
+            matching_items = [item for item in (items or {}).get("value") or [] if item.get("name") == item_name]
+            logger.debug(f"Found {len(matching_items)} items named {item_name}")
+            for item in matching_items:
+                item_parent_path = unquote((item.get("parentReference") or {}).get("path") or "")
+                if item_parent_path.partition("root:")[2].strip("/") == parent_path:
+                    return item
+            if matching_items:
+                return matching_items[0]
+        except AgendaException as e:
+            logger.error(f"Error searching drive item {item_name}. {e}")
+        return None
@@ -1,8 +1,7 @@
-import asyncio
-import time
 from loguru import logger
 from msgraph import GraphServiceClient
 from kiota_abstractions.api_error import APIError
+from o365.util.async_runner import AsyncRunner
 
 
 class ExcelHelper:
@@ -94,19 +93,8 @@ class ExcelHelper:
         column: int,
     ):
         """Get the cell value from worksheet"""
-        retry_count = 0
-        cell_value = None
-        while retry_count < 3:
-            try:
-                logger.debug(f"Getting the cell value: {row}x{column}")
-                cell = asyncio.run(ExcelHelper.get_cell(graph_client, drive_id, item_id, worksheet_id, row, column))
-                if cell and cell.values:
-                    return cell.values
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-                    else:
-                        raise e
-        return cell_value
+        logger.debug(f"Getting the cell value: {row}x{column}")
+        cell = AsyncRunner.run(ExcelHelper.get_cell(graph_client, drive_id, item_id, worksheet_id, row, column))
+        if cell and cell.values:
+            return cell.values
+        return None
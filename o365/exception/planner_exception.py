@@ -4,9 +4,10 @@ from loguru import logger
 class PlannerException(Exception):
     """This class is a custom exception for known errors"""
 
-    def __init__(self, message):
-        """initialize the agenda exception"""
+    def __init__(self, message, status_code: int = None):
+        """initialize the agenda exception, with the http status code of the failed graph api request if known"""
         logger.error(message)
+        self.status_code = status_code
 
     @property
     def message(self):
@@ -0,0 +1,175 @@
+import asyncio
+import atexit
+import importlib.util
+import json
+import threading
+import httpx
+from loguru import logger
+
+from o365.auth.auth_helper import AuthHelper
+from o365.exception.agenda_exception import AgendaException
+from o365.exception.planner_exception import PlannerException
+from o365.graph.graph_helper import GraphHelper
+from o365.graph.retry_transport import AsyncRetryTransport
+from o365.util.async_runner import AsyncRunner
+from o365.util.constants import Constants
+from o365.util.single_flight import SingleFlight
+
+
+class AsyncGraphHelper:
+    """This class is a helper for making concurrent graph api calls via async http"""
+
+    access_token = None
+    url = "https://graph.microsoft.com/v1.0/"
+    headers = None
+    timeout = 60
+    max_concurrency: int = Constants.GRAPH_HTTP_MAX_CONCURRENCY
+    # The http client and semaphore of each event loop, as both are bound to the loop they are first used on
+    _loop_clients: dict = {}
+    _loop_clients_lock = threading.Lock()
+    _single_flight: SingleFlight = SingleFlight()
+
+    def __init__(self) -> None:
+        """initialize the async http helper"""
+        self.access_token = AuthHelper.acquire_token()
+        self.headers = {
+            "Authorization": f"Bearer {self.access_token}",
+        }
+
+    @classmethod
+    def _loop_client(cls) -> dict:
+        """Get the http client and semaphore of the running event loop, creating them on first use in the loop"""
+        loop = asyncio.get_running_loop()
+        with cls._loop_clients_lock:
+            loop_client = cls._loop_clients.get(loop)
+            if loop_client is None:
+                http2 = importlib.util.find_spec("h2") is not None
+                limits = httpx.Limits(
+                    max_connections=Constants.GRAPH_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=Constants.GRAPH_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=Constants.GRAPH_HTTP_KEEPALIVE_EXPIRY,
+                )
+                logger.debug(f"Creating the async graph http client for the loop, http2: {http2}, limits: {limits}")
+                loop_client = {
+                    "http_client": httpx.AsyncClient(
+                        transport=AsyncRetryTransport(http2=http2, limits=limits), timeout=cls.timeout
+                    ),
+                    "semaphore": asyncio.Semaphore(cls.max_concurrency),
+                }
+                # The clients of loops that were closed can not be used or closed any more
+                for closed_loop in [other_loop for other_loop in cls._loop_clients if other_loop.is_closed()]:
+                    cls._loop_clients.pop(closed_loop)
+                cls._loop_clients[loop] = loop_client
+        return loop_client
+
+    @classmethod
+    def http_client(cls) -> httpx.AsyncClient:
+        """Get the async http client of the running event loop, shared by the helpers used on that loop"""
+        return cls._loop_client()["http_client"]
+
+    @classmethod
+    async def close(cls):
+        """Close the async http client of the running event loop and release its pooled connections"""
+        with cls._loop_clients_lock:
+            loop_client = cls._loop_clients.pop(asyncio.get_running_loop(), None)
+        if loop_client is not None:
+            await loop_client["http_client"].aclose()
+
+    @classmethod
+    def close_all(cls):
+        """Close the async http clients of all the event loops, the ones of the shared loop on that loop"""
+        with cls._loop_clients_lock:
+            loop_clients = list(cls._loop_clients.items())
+            cls._loop_clients.clear()
+        for loop, loop_client in loop_clients:
+            try:
+                if loop is AsyncRunner.started_loop():
+                    AsyncRunner.run(loop_client["http_client"].aclose())
+                elif not loop.is_closed() and not loop.is_running():
+                    loop.run_until_complete(loop_client["http_client"].aclose())
+            except (RuntimeError, httpx.HTTPError) as e:
+                logger.warning(f"Could not close the async graph http client. {e}")
+        if loop_clients:
+            logger.debug(f"Closed {len(loop_clients)} async graph http clients")
+
+    async def _request(self, method: str, path: str, data: str = None, headers: dict = None):
+        """Send the request to the provided graph api path, with at most max_concurrency requests in flight"""
+        # The @odata.nextLink of a page is already an absolute url
+        request_url = path if path.startswith(self.url) else f"{self.url}{path.lstrip('/')}"
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+        loop_client = self._loop_client()
+        http_client = loop_client["http_client"]
+        async with loop_client["semaphore"]:
+            logger.debug(f"Sending {method} request to {request_url}")
+            graph_response = await http_client.request(
+                method, url=request_url, content=data or None, headers=request_headers, timeout=self.timeout
+            )
+
+        if graph_response.status_code >= 200 and graph_response.status_code < 300:
+            try:
+                return graph_response.json()
+            except json.JSONDecodeError:
+                logger.debug(f"The {method} response was not json return text. {graph_response.text}")
+                return graph_response.text
+        if "planner" in path:
+            raise PlannerException(
+                f"Error {graph_response.status_code} - {graph_response.text}", graph_response.status_code
+            )
+        raise AgendaException(f"Error {graph_response.status_code} - {graph_response.text}")
+
+    async def get_request(self, path: str, headers: dict):
+        """Make a GET request to the provided graph api path, passing the access token in a header
+
+        An identical request already in flight is awaited instead of being sent again
+        """
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+        return await self._single_flight.call_async(
+            (path.lstrip("/"), tuple(sorted(request_headers.items()))), self._request, "GET", path, headers=headers
+        )
+
+    async def post_request(self, path: str, data: str, headers: dict):
+        """Make a POST request to the provided graph api path, passing the access token in a header"""
+        GraphHelper.invalidate(path)
+        return await self._request("POST", path, data, headers)
+
+    async def patch_request(self, path: str, data: str, headers: dict):
+        """Make a PATCH request to the provided graph api path, passing the access token in a header"""
+        GraphHelper.invalidate(path)
+        return await self._request("PATCH", path, data, headers)
+
+    async def delete_request(self, path: str, data: str, headers: dict):
+        """Make a DELETE request to the provided graph api path, passing the access token in a header"""
+        GraphHelper.invalidate(path)
+        return await self._request("DELETE", path, data, headers)
+
+    async def get_all_pages(self, path: str, headers: dict):
+        """Make GET requests to the provided graph api path, following @odata.nextLink and merging the page values"""
+        response = await self.get_request(path, headers)
+        next_link = response.get("@odata.nextLink") if isinstance(response, dict) else None
+        while next_link:
+            page = await self.get_request(next_link, headers)
+            response["value"].extend(page.get("value") or [])
+            next_link = page.get("@odata.nextLink")
+        if isinstance(response, dict):
+            response.pop("@odata.nextLink", None)
+        return response
+
+    async def get_requests(self, paths: list, headers: dict) -> list:
+        """Make concurrent GET requests to the provided graph api paths reading all pages, None for failed ones"""
+
+        async def get_or_none(path: str):
+            try:
+                return await self.get_all_pages(path, headers)
+            except (AgendaException, PlannerException) as e:
+                logger.error(f"Error getting {path}. {e}")
+            except httpx.HTTPError as e:
+                logger.error(f"Error getting {path}. {e}")
+            return None
+
+        return await asyncio.gather(*[get_or_none(path) for path in paths])
+
+
+# Close the clients before the shared event loop they run on is stopped
+atexit.register(AsyncGraphHelper.close_all)
@@ -0,0 +1,132 @@
+from loguru import logger
+
+from o365.exception.agenda_exception import AgendaException
+
+
+class GraphBatch:
+    """This class is used to queue graph api requests to send through the JSON $batch endpoint"""
+
+    # The graph api accepts at most 20 requests per $batch envelope
+    max_batch_size: int = 20
+    _requests: list
+    _request_ids: set
+
+    def __init__(self) -> None:
+        """initialize the graph batch"""
+        self._requests = []
+        self._request_ids = set()
+
+    def __len__(self) -> int:
+        """Return the number of queued requests"""
+        return len(self._requests)
+
+    def __contains__(self, request_id: str) -> bool:
+        """Return if a request with the id is queued"""
+        return request_id in self._request_ids
+
+    def add(
+        self,
+        method: str,
+        path: str,
+        body: dict = None,
+        headers: dict = None,
+        depends_on: list = None,
+        request_id: str = None,
+    ) -> str:
+        """Queue a request to the graph api path, returns the id used to look up its response"""
+        if request_id is None:
+            request_id = str(len(self._requests) + 1)
+        if request_id in self._request_ids:
+            raise AgendaException(f"Duplicate batch request id {request_id}")
+        for depends_on_id in depends_on or []:
+            if depends_on_id not in self._request_ids:
+                raise AgendaException(f"Batch request {request_id} depends on unknown request {depends_on_id}")
+        request = {
+            "id": request_id,
+            "method": method.upper(),
+            "url": f"/{path.lstrip('/')}",
+        }
+        request_headers = dict(headers or {})
+        if body is not None:
+            request["body"] = body
+            request_headers.setdefault("Content-Type", "application/json")
+        if request_headers:
+            request["headers"] = request_headers
+        if depends_on:
+            request["dependsOn"] = list(depends_on)
+        self._requests.append(request)
+        self._request_ids.add(request_id)
+        logger.debug(f"Queued batch request {request_id}: {request['method']} {request['url']}")
+        return request_id
+
+    def get(self, path: str, headers: dict = None, depends_on: list = None, request_id: str = None) -> str:
+        """Queue a GET request"""
+        return self.add("GET", path, None, headers, depends_on, request_id)
+
+    def post(self, path: str, body: dict, headers: dict = None, depends_on: list = None, request_id: str = None) -> str:
+        """Queue a POST request"""
+        return self.add("POST", path, body, headers, depends_on, request_id)
+
+    def patch(
+        self, path: str, body: dict, headers: dict = None, depends_on: list = None, request_id: str = None
+    ) -> str:
+        """Queue a PATCH request"""
+        return self.add("PATCH", path, body, headers, depends_on, request_id)
+
+    def delete(self, path: str, headers: dict = None, depends_on: list = None, request_id: str = None) -> str:
+        """Queue a DELETE request"""
+        return self.add("DELETE", path, None, headers, depends_on, request_id)
+
+    @property
+    def envelopes(self) -> list:
+        """Split the queued requests into $batch envelopes, keeping each dependsOn chain in the same envelope"""
+        # Requests that depend on each other have to be sent in the same envelope, so group them first
+        group_of: dict = {}
+        groups: list = []
+        for request in self._requests:
+            group = None
+            for depends_on_id in request.get("dependsOn", []):
+                depends_on_group = group_of[depends_on_id]
+                if group is None:
+                    group = depends_on_group
+                elif depends_on_group is not group:
+                    group.extend(depends_on_group)
+                    for merged_request in depends_on_group:
+                        group_of[merged_request["id"]] = group
+                    groups = [other_group for other_group in groups if other_group is not depends_on_group]
+            if group is None:
+                group = []
+                groups.append(group)
+            group.append(request)
+            group_of[request["id"]] = group
+
+        envelopes: list = []
+        envelope: list = []
+        for group in groups:
+            if len(group) > self.max_batch_size:
+                raise AgendaException(
+                    f"A chain of {len(group)} dependent batch requests exceeds the limit of {self.max_batch_size}"
+                )
+            if len(envelope) + len(group) > self.max_batch_size:
+                envelopes.append(envelope)
+                envelope = []
+            envelope.extend(sorted(group, key=self._requests.index))
+        if envelope:
+            envelopes.append(envelope)
+        return envelopes
+
+    @staticmethod
+    def parse_response(response: dict) -> dict:
+        """Parse a $batch sub-response into a dictionary with the id, status, etag, headers and body"""
+        headers = response.get("headers") or {}
+        body = response.get("body")
+        etag = headers.get("ETag") or headers.get("etag")
+        if etag is None and isinstance(body, dict):
+            etag = body.get("@odata.etag")
+        return {
+            "id": response["id"],
+            "status": int(response["status"]),
+            "etag": etag,
+            "headers": headers,
+            "body": body,
+        }
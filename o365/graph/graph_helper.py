@@ -1,10 +1,21 @@
+import importlib.util
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import httpx
-import requests
 from loguru import logger
 
 from o365.auth.auth_helper import AuthHelper
 from o365.exception.agenda_exception import AgendaException
 from o365.exception.planner_exception import PlannerException
+from o365.graph.graph_batch import GraphBatch
+from o365.graph.graph_response_cache import GraphResponseCache
+from o365.graph.retry_transport import RetryTransport
+from o365.util.constants import Constants
+from o365.util.rate_limiter import RateLimiter
+from o365.util.retry_policy import RetryPolicy
+from o365.util.single_flight import SingleFlight
 
 
 class GraphHelper:
@@ -15,6 +26,14 @@ class GraphHelper:
     url = "https://graph.microsoft.com/v1.0/"
     headers = None
     timeout = 60
+    max_connections: int = Constants.GRAPH_HTTP_MAX_CONNECTIONS
+    max_keepalive_connections: int = Constants.GRAPH_HTTP_MAX_KEEPALIVE_CONNECTIONS
+    keepalive_expiry: float = Constants.GRAPH_HTTP_KEEPALIVE_EXPIRY
+    _http_client: httpx.Client = None
+    _http_client_lock = threading.Lock()
+    response_cache: GraphResponseCache = GraphResponseCache()
+    rate_limiter: RateLimiter = RateLimiter()
+    _single_flight: SingleFlight = SingleFlight()
 
     def __init__(self, obo_token: bool = False) -> None:
         """initialize the http helper"""
@@ -27,25 +46,123 @@ class GraphHelper:
         self.obo_access_token = AuthHelper.acquire_token_auth_code()
         self.headers.update({"Authorization": f"Bearer {self.obo_access_token}"})
 
-    def get_request(self, path: str, headers: dict):
-        """Make a GET request to the provided graph api path, passing the access token in a header"""
-        request_url = f"{self.url}/{path}"
-        logger.debug(f"Sending GET request to {request_url}")
+    @classmethod
+    def http_client(cls) -> httpx.Client:
+        """Get the keep-alive, connection pooled, retrying http client shared by every graph helper"""
+        if cls._http_client is None:
+            with cls._http_client_lock:
+                if cls._http_client is None:
+                    http2 = importlib.util.find_spec("h2") is not None
+                    limits = httpx.Limits(
+                        max_connections=cls.max_connections,
+                        max_keepalive_connections=cls.max_keepalive_connections,
+                        keepalive_expiry=cls.keepalive_expiry,
+                    )
+                    logger.debug(f"Creating the shared graph http client, http2: {http2}, limits: {limits}")
+                    cls._http_client = httpx.Client(
+                        transport=RetryTransport(http2=http2, limits=limits), timeout=cls.timeout
+                    )
+        return cls._http_client
+
+    @classmethod
+    def configure_pool(
+        cls, max_connections: int = None, max_keepalive_connections: int = None, keepalive_expiry: float = None
+    ):
+        """Configure the connection pool limits, the shared client is recreated on next use"""
+        if max_connections is not None:
+            cls.max_connections = max_connections
+        if max_keepalive_connections is not None:
+            cls.max_keepalive_connections = max_keepalive_connections
+        if keepalive_expiry is not None:
+            cls.keepalive_expiry = keepalive_expiry
+        cls.close()
+
+    @classmethod
+    def close(cls):
+        """Close the shared http client and release the pooled connections"""
+        with cls._http_client_lock:
+            if cls._http_client is not None:
+                cls._http_client.close()
+                cls._http_client = None
+
+    def get_request(self, path: str, headers: dict, use_cache: bool = False, not_found_ok: bool = False):
+        """Make a GET request to the provided graph api path, passing the access token in a header
+
+        With use_cache the response is served from the response cache while fresh, and revalidated with its etag after.
+        With not_found_ok a resource that does not exist (404) returns None instead of raising an error.
+        """
+        # The @odata.nextLink of a page is already an absolute url
+        request_url = path if path.startswith(self.url) else f"{self.url}/{path}"
         self.headers.update(headers)
-        graph_response = httpx.get(url=request_url, headers=self.headers, timeout=self.timeout)
+        request_headers = self.headers
+        # Responses are cached by the path relative to the api url, apart for the app and the delegated token
+        cache_path = path[len(self.url) :] if path.startswith(self.url) else path
+        cache_scope = "obo" if self.obo_access_token is not None else "app"
+        cached_response = self.response_cache.get(cache_path, cache_scope) if use_cache else None
+        if cached_response is not None:
+            if cached_response["fresh"]:
+                logger.debug(f"Using the cached response for {request_url}")
+                return cached_response["body"]
+            if cached_response["etag"] is not None:
+                request_headers = dict(self.headers)
+                request_headers.update({"If-None-Match": cached_response["etag"]})
+        # Identical requests already in flight in other threads are waited on instead of being sent again
+        status_code, etag, response = self._single_flight.call(
+            (request_url, tuple(sorted(request_headers.items()))), self._get, request_url, request_headers
+        )
+
+        if status_code == 304 and cached_response is not None:
+            logger.debug(f"The cached response for {request_url} is not modified")
+            self.response_cache.touch(cache_path, cache_scope)
+            return cached_response["body"]
+        if status_code >= 200 and status_code < 300:
+            if use_cache:
+                if etag is None and isinstance(response, dict):
+                    etag = response.get("@odata.etag")
+                self.response_cache.put(cache_path, etag, response, cache_scope)
+            return response
+        if status_code == 404 and not_found_ok:
+            return None
 
+        raise AgendaException(f"Error {status_code} - {response}")
+
+    def _get(self, request_url: str, request_headers: dict) -> tuple:
+        """Send the GET request, returns the status code, etag and the json response or the error text"""
+        logger.debug(f"Sending GET request to {request_url}")
+        self.rate_limiter.acquire()
+        graph_response = self.http_client().get(url=request_url, headers=request_headers, timeout=self.timeout)
         if graph_response.status_code >= 200 and graph_response.status_code < 300:
             # Print the results in a JSON format
             # print(graph_response.json())
-            return graph_response.json()
+            return graph_response.status_code, graph_response.headers.get("ETag"), graph_response.json()
+        return graph_response.status_code, graph_response.headers.get("ETag"), graph_response.text
 
-        raise AgendaException(f"Error {graph_response.status_code} - {graph_response.text}")
+    def get_paged_items(self, path: str, headers: dict, top: int = None, use_cache: bool = False):
+        """Make GET requests to the provided graph api collection path, yielding the items of each page as it is read
+
+        The @odata.nextLink of each page is followed until the last page, or until the caller stops iterating
+        """
+        if top is not None:
+            path = f"{path}{'&' if '?' in path else '?'}$top={top}"
+        while path:
+            page = self.get_request(path, headers, use_cache)
+            yield from page.get("value") or []
+            path = page.get("@odata.nextLink")
+
+    @classmethod
+    def invalidate(cls, path: str):
+        """Remove the cached responses of the resources a write to the path may change, also for sdk writes"""
+        # Writes can change the collections a resource is listed in, so drop the whole resource family
+        cls.response_cache.invalidate(path.lstrip("/").split("/")[0])
 
     def _post(self, request_url: str, data: str, headers: dict):
         """Make a POST request to the provided url, passing the access token in a header"""
         self.headers.update(headers)
         logger.debug(f"Sending POST request to {request_url}")
-        graph_response = httpx.post(url=request_url, data=data, headers=self.headers, timeout=self.timeout)
+        self.rate_limiter.acquire()
+        graph_response = self.http_client().post(
+            url=request_url, content=data, headers=self.headers, timeout=self.timeout
+        )
 
         if graph_response.status_code >= 200 and graph_response.status_code < 300:
             # Print the results in a JSON format
@@ -59,25 +176,67 @@ class GraphHelper:
         request_url = f"{self.url}/{path}"
         logger.debug(f"Sending POST request with data {data} to {request_url}")
         self.headers.update(headers)
+        self.invalidate(path)
         return self._post(request_url, data, headers)
 
+    def post_request_for_monitor(self, path: str, data: str, headers: dict):
+        """Make a POST request starting a long running action, such as a copy, returns the url of its monitor from
+        the Location header of the accepted (202) response
+        """
+        request_url = f"{self.url}/{path}"
+        logger.debug(f"Sending POST request with data {data} to {request_url}")
+        self.headers.update(headers)
+        self.invalidate(path)
+        self.rate_limiter.acquire()
+        graph_response = self.http_client().post(
+            url=request_url, content=data, headers=self.headers, timeout=self.timeout
+        )
+        if graph_response.status_code >= 200 and graph_response.status_code < 300:
+            return graph_response.headers.get("Location")
+
+        raise AgendaException(f"Error {graph_response.status_code} - {graph_response.text}")
+
+    def get_monitor_status(self, monitor_url: str) -> dict:
+        """Make a GET request to the monitor of a long running action, returns its status
+
+        The monitor url is preauthenticated, so no access token is sent with it. A monitor redirecting (303) to the
+        resource is reported as completed with the resourceLocation, a Retry-After is returned as retryAfter.
+        """
+        logger.debug(f"Sending GET request to monitor {monitor_url}")
+        self.rate_limiter.acquire()
+        graph_response = self.http_client().get(url=monitor_url, timeout=self.timeout)
+        if graph_response.status_code == 303:
+            return {"status": "completed", "resourceLocation": graph_response.headers.get("Location")}
+        if graph_response.status_code >= 200 and graph_response.status_code < 300:
+            monitor_status = graph_response.json()
+            monitor_status["retryAfter"] = RetryPolicy.retry_after(graph_response)
+            return monitor_status
+
+        raise AgendaException(f"Error {graph_response.status_code} - {graph_response.text}")
+
     def patch_request(self, path: str, data: str, headers: dict):
         """Make a PATCH request to the provided graph api path, passing the access token in a header"""
         request_url = f"{self.url}/{path}"
         logger.debug(f"Sending PATCH request to {request_url}")
         self.headers.update(headers)
-        graph_response = requests.patch(request_url, data=data, headers=self.headers, timeout=self.timeout)
+        self.invalidate(path)
+        self.rate_limiter.acquire()
+        graph_response = self.http_client().patch(
+            url=request_url, content=data, headers=self.headers, timeout=self.timeout
+        )
 
         if graph_response.status_code >= 200 and graph_response.status_code < 300:
             # Print the results in a JSON format
             try:
                 return graph_response.json()
-            except requests.exceptions.JSONDecodeError:
+            except json.JSONDecodeError:
                 logger.debug(f"The PATCH response was not json return text. {graph_response}")
                 return graph_response.text
         else:
             if "planner" in path:
-                raise PlannerException(f"Error {graph_response.status_code} - {graph_response.text}")
+                raise PlannerException(
+                    f"Error {graph_response.status_code} - {graph_response.text}", graph_response.status_code
+                )
             raise AgendaException(f"Error {graph_response.status_code} - {graph_response.text}")
 
     def delete_request(self, path: str, data: str, headers: dict):
@@ -85,26 +244,150 @@ class GraphHelper:
         request_url = f"{self.url}/{path}"
         logger.debug(f"Sending DELETE request to {request_url}")
         self.headers.update(headers)
-        graph_response = requests.delete(request_url, data=data, headers=self.headers, timeout=self.timeout)
+        self.invalidate(path)
+        self.rate_limiter.acquire()
+        # httpx.Client.delete does not accept a body, so build the request explicitly
+        graph_response = self.http_client().request(
+            "DELETE", url=request_url, content=self._body(data), headers=self.headers, timeout=self.timeout
+        )
 
         if graph_response.status_code >= 200 and graph_response.status_code < 300:
             # Print the results in a JSON format
             try:
                 return graph_response.json()
-            except requests.exceptions.JSONDecodeError:
+            except json.JSONDecodeError:
                 logger.debug(f"The DELETE response was not json return text. {graph_response.text}")
                 return graph_response.text
         else:
             if "planner" in path:
-                raise PlannerException(f"Error {graph_response.status_code} - {graph_response.text}")
+                raise PlannerException(
+                    f"Error {graph_response.status_code} - {graph_response.text}", graph_response.status_code
+                )
             raise AgendaException(f"Error {graph_response.status_code} - {graph_response.text}")
 
     def post_request_to_url(self, url: str, data: str, headers: dict):
         """Make a POST data in request to the provided url, in a header"""
         logger.debug(f"Sending POST request to {url}")
-        response = requests.post(url=url, headers=headers, data=data, timeout=120)
+        response = self.http_client().post(url=url, headers=headers, content=data, timeout=120)
         if response.status_code >= 200 and response.status_code < 300:
             logger.debug(f"The message was posted successfully. {response.status_code}")
             return True
         logger.error(f"Failed to post the message: {response.status_code}, {response.text}")
         return False
+
+    # POST https://graph.microsoft.com/v1.0/$batch
+    def batch_request(
+        self,
+        batch: GraphBatch,
+        max_workers: int = Constants.GRAPH_HTTP_MAX_CONCURRENCY,
+        on_sending=None,
+        on_sent=None,
+    ) -> dict:
+        """Send the queued batch requests through the $batch endpoint, returns the responses keyed by request id
+
+        Each dependsOn chain is kept in one envelope, so the envelopes are independent and up to max_workers of them
+        are sent concurrently. on_sending is called with the requests of each envelope before it is sent and on_sent
+        with its responses keyed by request id as soon as it completes, from the thread that sent it.
+        """
+        batch_responses: dict = {}
+        envelopes = batch.envelopes
+        for envelope in envelopes:
+            for request in envelope:
+                if request["method"] != "GET":
+                    self.invalidate(request["url"])
+
+        def send_envelope(envelope: list) -> dict:
+            if on_sending is not None:
+                on_sending(envelope)
+            envelope_responses = self._send_batch_envelope(envelope)
+            if on_sent is not None:
+                on_sent(envelope_responses)
+            return envelope_responses
+
+        if len(envelopes) <= 1:
+            for envelope in envelopes:
+                batch_responses.update(send_envelope(envelope))
+            return batch_responses
+        with ThreadPoolExecutor(max_workers=min(len(envelopes), max_workers)) as executor:
+            for envelope_responses in executor.map(send_envelope, envelopes):
+                batch_responses.update(envelope_responses)
+        return batch_responses
+
+    def _send_batch_envelope(self, envelope: list) -> dict:
+        """Send a $batch envelope, sending the throttled sub-requests and the ones that depend on them again
+
+        Sub-requests that are not idempotent are only sent again when they were throttled.
+        """
+        retry_policy = RetryPolicy()
+        non_idempotent_retry_policy = RetryPolicy(idempotent=False)
+        idempotent_ids = {
+            request["id"]
+            for request in envelope
+            if RetryPolicy.is_idempotent_request(request["method"], request.get("headers"))
+        }
+        request_url = f"{self.url}$batch"
+        headers = dict(self.headers)
+        headers.update({"Content-Type": "application/json"})
+        batch_responses: dict = {}
+        pending = envelope
+        started = time.monotonic()
+        for attempt in range(retry_policy.max_attempts):
+            logger.debug(f"Sending $batch request with {len(pending)} requests to {request_url}")
+            # Each request in the envelope counts against the graph api throttling limits
+            self.rate_limiter.acquire(len(pending))
+            graph_response = self.http_client().post(
+                url=request_url,
+                content=json.dumps({"requests": pending}),
+                headers=headers,
+                timeout=self.timeout,
+                # An envelope of idempotent sub-requests can be sent again like them
+                extensions={"idempotent": all(request["id"] in idempotent_ids for request in pending)},
+            )
+            if graph_response.status_code < 200 or graph_response.status_code >= 300:
+                raise AgendaException(f"Error {graph_response.status_code} - {graph_response.text}")
+            retry_ids = set()
+            delay = 0.0
+            for response in graph_response.json()["responses"]:
+                batch_response = GraphBatch.parse_response(response)
+                batch_responses[batch_response["id"]] = batch_response
+                sub_request_retry_policy = (
+                    retry_policy if batch_response["id"] in idempotent_ids else non_idempotent_retry_policy
+                )
+                if sub_request_retry_policy.is_retryable(response):
+                    retry_ids.add(batch_response["id"])
+                    delay = max(delay, retry_policy.delay(attempt, response))
+            if not retry_ids:
+                break
+            # Requests that failed because a throttled request they depend on failed are sent again too
+            for request in pending:
+                if request["id"] not in retry_ids and batch_responses[request["id"]]["status"] == 424:
+                    if any(depends_on_id in retry_ids for depends_on_id in request.get("dependsOn", [])):
+                        retry_ids.add(request["id"])
+            if attempt + 1 >= retry_policy.max_attempts or time.monotonic() - started + delay > retry_policy.deadline:
+                logger.warning(f"Giving up retrying {len(retry_ids)} throttled $batch requests")
+                break
+            logger.warning(f"Retrying {len(retry_ids)} throttled $batch requests after {delay:.1f}s")
+            time.sleep(delay)
+            pending = [self._without_completed_depends_on(request, retry_ids) for request in pending]
+            pending = [request for request in pending if request["id"] in retry_ids]
+        return batch_responses
+
+    @staticmethod
+    def _without_completed_depends_on(request: dict, retry_ids: set) -> dict:
+        """Get the request depending only on the requests that are sent again"""
+        if "dependsOn" not in request:
+            return request
+        request = dict(request)
+        depends_on = [depends_on_id for depends_on_id in request.pop("dependsOn") if depends_on_id in retry_ids]
+        if depends_on:
+            request["dependsOn"] = depends_on
+        return request
+
+    @staticmethod
+    def _body(data):
+        """Get the request body content, empty request data is sent without a body"""
+        if not data:
+            return None
+        if isinstance(data, (dict, list)):
+            return json.dumps(data)
+        return data
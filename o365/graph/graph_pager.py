@@ -0,0 +1,44 @@
+from loguru import logger
+from kiota_abstractions.api_error import APIError
+
+from o365.util.async_runner import AsyncRunner
+from o365.util.single_flight import SingleFlight
+
+
+class GraphPager:
+    """This class iterates the items of paged graph sdk collection responses"""
+
+    _single_flight: SingleFlight = SingleFlight()
+
+    @staticmethod
+    async def get_page(request_builder, request_configuration=None):
+        """Get a page of the collection, awaiting an identical page request already in flight instead of sending it"""
+        request_url = request_builder.to_get_request_information(request_configuration).url
+        return await GraphPager._single_flight.call_async(
+            request_url, request_builder.get, request_configuration=request_configuration
+        )
+
+    @staticmethod
+    def iter_items(request_builder, request_configuration=None, quiet_first_page: bool = False):
+        """Yield the items of each page as it is read, following @odata.nextLink until the last page
+
+        The next page is only requested when the items of the previous page are used up, so callers that stop
+        iterating once they find a match do not read the rest of the collection. A failed page is logged and its
+        APIError raised, so a collection is never silently cut short. When quiet_first_page a failed first page
+        yields no items instead.
+        """
+        first_page = True
+        try:
+            page = AsyncRunner.run(GraphPager.get_page(request_builder, request_configuration))
+            first_page = False
+            while page is not None:
+                yield from page.value or []
+                if not page.odata_next_link:
+                    return
+                logger.debug(f"Getting the next page {page.odata_next_link}")
+                page = AsyncRunner.run(GraphPager.get_page(request_builder.with_url(page.odata_next_link)))
+        except APIError as e:
+            logger.error(f"Error getting the page of items: {e.error.message}")
+            if first_page and quiet_first_page:
+                return
+            raise
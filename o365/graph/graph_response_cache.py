@@ -0,0 +1,94 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from loguru import logger
+
+from o365.util.constants import Constants
+
+
+class GraphResponseCache:
+    """This class is a size bounded LRU cache of graph api GET responses keyed by their path and query
+
+    Each entry keeps the response body and its ETag. An entry is served as is until the time to live of its resource
+    passes, after that it is revalidated with If-None-Match so an unchanged resource costs only a 304 response.
+    Collections have no ETag and are only cached for the time to live of their path. Entries are kept apart by the
+    scope of the identity that read them, so responses read with a delegated token are not served to the app.
+    """
+
+    # Seconds a cached response is served without revalidating, by graph api path prefix
+    default_ttls: dict = {
+        "teams/": 3600,
+        "planner/plans/": 300,
+        "planner/buckets/": 60,
+    }
+    max_entries: int
+    ttls: dict
+    _entries: OrderedDict
+    _lock: threading.Lock
+
+    def __init__(self, max_entries: int = Constants.GRAPH_CACHE_MAX_ENTRIES, ttls: dict = None) -> None:
+        """initialize the response cache, ttls overrides the default time to live for path prefixes"""
+        self.max_entries = max_entries
+        self.ttls = dict(self.default_ttls)
+        self.ttls.update(ttls or {})
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of cached responses"""
+        return len(self._entries)
+
+    def ttl(self, path: str) -> float:
+        """Get the time to live for the path, from its longest matching prefix"""
+        path = path.lstrip("/")
+        prefixes = [prefix for prefix in self.ttls if path.startswith(prefix)]
+        if not prefixes:
+            return 0
+        return self.ttls[max(prefixes, key=len)]
+
+    def get(self, path: str, scope: str = ""):
+        """Get the cached entry for the path with its etag, body and if it is still fresh, or None"""
+        key = (scope, path.lstrip("/"))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return {
+                "etag": entry["etag"],
+                "body": copy.deepcopy(entry["body"]),
+                "fresh": entry["expires_at"] > time.monotonic(),
+            }
+
+    def put(self, path: str, etag: str, body, scope: str = ""):
+        """Cache the response body and etag for the path, responses without an etag or ttl are not cached"""
+        key = (scope, path.lstrip("/"))
+        ttl = self.ttl(path)
+        if etag is None and ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = {
+                "etag": etag,
+                "body": copy.deepcopy(body),
+                "expires_at": time.monotonic() + ttl,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                (_, evicted_path), _ = self._entries.popitem(last=False)
+                logger.debug(f"Evicted the cached response for {evicted_path}")
+
+    def touch(self, path: str, scope: str = ""):
+        """Mark the cached response for the path as fresh again after it was revalidated"""
+        key = (scope, path.lstrip("/"))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["expires_at"] = time.monotonic() + self.ttl(path)
+
+    def invalidate(self, path_prefix: str = ""):
+        """Remove the cached responses with paths starting with the prefix in every scope, all of them by default"""
+        path_prefix = path_prefix.lstrip("/")
+        with self._lock:
+            for key in [key for key in self._entries if key[1].startswith(path_prefix)]:
+                del self._entries[key]
@@ -0,0 +1,57 @@
+import httpx
+
+from o365.util.retry_policy import RetryPolicy
+
+
+class RetryTransport(httpx.BaseTransport):
+    """This class is an http transport that retries throttled and transient graph api failures
+
+    Requests that are not idempotent are only retried when that is safe, unless the request has the idempotent
+    extension, such as a $batch envelope of reads.
+    """
+
+    _transport: httpx.BaseTransport
+    _retry_policy: RetryPolicy
+
+    def __init__(self, transport: httpx.BaseTransport = None, retry_policy: RetryPolicy = None, **kwargs) -> None:
+        """initialize the retry transport, kwargs are passed to the wrapped http transport"""
+        self._transport = transport or httpx.HTTPTransport(**kwargs)
+        self._retry_policy = retry_policy or RetryPolicy()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        """Send the request, retrying it with the retry policy for its method"""
+        # Load the body so the request can be sent again
+        request.read()
+        retry_policy = self._retry_policy.for_request(
+            request.method, request.headers, request.extensions.get("idempotent")
+        )
+        return retry_policy.execute(self._transport.handle_request, request)
+
+    def close(self) -> None:
+        """Close the wrapped http transport"""
+        self._transport.close()
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    """This class is an async http transport that retries throttled and transient graph api failures"""
+
+    _transport: httpx.AsyncBaseTransport
+    _retry_policy: RetryPolicy
+
+    def __init__(self, transport: httpx.AsyncBaseTransport = None, retry_policy: RetryPolicy = None, **kwargs) -> None:
+        """initialize the async retry transport, kwargs are passed to the wrapped http transport"""
+        self._transport = transport or httpx.AsyncHTTPTransport(**kwargs)
+        self._retry_policy = retry_policy or RetryPolicy()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send the request, retrying it with the retry policy for its method"""
+        # Load the body so the request can be sent again
+        await request.aread()
+        retry_policy = self._retry_policy.for_request(
+            request.method, request.headers, request.extensions.get("idempotent")
+        )
+        return await retry_policy.execute_async(self._transport.handle_async_request, request)
+
+    async def aclose(self) -> None:
+        """Close the wrapped http transport"""
+        await self._transport.aclose()
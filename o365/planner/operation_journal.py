@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from loguru import logger
+
+from o365.planner.plan_snapshot import PlanSnapshot
+from o365.util.constants import Constants
+
+
+class OperationJournal:
+    """This class is a write-ahead journal of the operations to reconcile planner plans, kept as a JSON lines file
+
+    Before the operations for a plan are applied the run is journaled with the buckets and tasks it was planned from,
+    each $batch envelope of operations is journaled as sending before it is sent and, as soon as the envelope
+    completes, each of its operations as done with the item the graph api returned, or as failed. A run that did not
+    complete is resumed from its journaled state and the operations not done yet, without reading the plan again. When
+    an envelope was sent but its outcome was not journaled, when a create failed and may still have created the item,
+    or when the run is older than max_age seconds and its etags are likely stale, the run can not be resumed safely and
+    the plan is read again instead.
+    """
+
+    path: str
+    max_age: float = Constants.PLANNER_JOURNAL_MAX_AGE
+    _lock: threading.Lock
+
+    def __init__(self, path: str) -> None:
+        """initialize the journal kept in the file at the path"""
+        self.path = os.path.expanduser(path)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def operation_key(operation: dict) -> str:
+        """Get the key of the operation, by plan bucket and template task"""
+        if operation["op"] == "create_bucket":
+            return f"{operation['op']}/{operation['bucket_name']}"
+        return f"{operation['op']}/{operation['bucket_name']}/{operation['desired_task']['title']}"
+
+    def _append(self, record: dict):
+        """Append the record to the journal and flush it to disk"""
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as journal_file:
+                journal_file.write(json.dumps(record) + "\n")
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+
+    def _records(self, plan_id: str) -> list:
+        """Read the journaled records of the plan"""
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with self._lock:
+            with open(self.path, "r", encoding="utf-8") as journal_file:
+                for line in journal_file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A record cut short by a crash is the last one and was never acted on
+                        logger.warning(f"Skipping an incomplete record in the journal {self.path}")
+                        continue
+                    if record["plan_id"] == plan_id:
+                        records.append(record)
+        return records
+
+    def plan(self, plan_snapshot: PlanSnapshot, operations: list):
+        """Journal a run of the operations with the buckets and tasks of the snapshot they were planned from"""
+        self._append(
+            {
+                "plan_id": plan_snapshot.plan_id,
+                "event": "planned",
+                "planned_at": time.time(),
+                "buckets": plan_snapshot.buckets,
+                "tasks": plan_snapshot.tasks,
+                "operations": operations,
+            }
+        )
+
+    def sending(self, plan_id: str, operation_keys: list):
+        """Journal the operations about to be sent"""
+        self._append({"plan_id": plan_id, "event": "sending", "keys": operation_keys})
+
+    def done(self, plan_id: str, operation_key: str, result):
+        """Journal the operation as done with the item the graph api returned"""
+        self._append({"plan_id": plan_id, "event": "done", "key": operation_key, "result": result})
+
+    def failed(self, plan_id: str, operation_key: str, status: int = None):
+        """Journal the operation as failed with the http status of its response, so a resumed run sends it again"""
+        self._append({"plan_id": plan_id, "event": "failed", "key": operation_key, "status": status})
+
+    def complete(self, plan_id: str):
+        """Drop the journaled run of the plan once all its operations are done"""
+        if not os.path.exists(self.path):
+            return
+        with self._lock:
+            with open(self.path, "r", encoding="utf-8") as journal_file:
+                lines = [line for line in journal_file if self._other_plan_record(line, plan_id)]
+            with open(self.path, "w", encoding="utf-8") as journal_file:
+                journal_file.writelines(lines)
+        logger.debug(f"Completed the journaled run of plan {plan_id}")
+
+    @staticmethod
+    def _other_plan_record(line: str, plan_id: str) -> bool:
+        """Check if the journal line is a record of another plan"""
+        try:
+            return json.loads(line)["plan_id"] != plan_id
+        except ValueError:
+            return False
+
+    def resume(self, plan_id: str):
+        """Get the snapshot and the operations not done of the journaled run of the plan, or None to start over
+
+        The snapshot is the one the run was planned from with the buckets and tasks created since added to it.
+        """
+        records = self._records(plan_id)
+        planned = [index for index, record in enumerate(records) if record["event"] == "planned"]
+        if not planned:
+            return None
+        records = records[planned[-1] :]
+        run = records[0]
+        age = time.time() - run.get("planned_at", 0)
+        if age > self.max_age:
+            logger.warning(f"The journaled run of plan {plan_id} is {age:.0f}s old, reading the plan again")
+            return None
+        plan_snapshot = PlanSnapshot(plan_id, run["buckets"], run["tasks"])
+        sent_keys = set()
+        failed_keys = set()
+        results = {}
+        for record in records[1:]:
+            if record["event"] == "sending":
+                sent_keys.update(record["keys"])
+            elif record["event"] == "failed":
+                failed_keys.add(record["key"])
+            elif record["event"] == "done":
+                results[record["key"]] = record["result"]
+        unknown_keys = sent_keys - failed_keys - set(results)
+        if unknown_keys:
+            logger.warning(f"The outcome of {len(unknown_keys)} sent operations on plan {plan_id} is unknown")
+            return None
+        # A create that failed, such as with a 503 or 504, may still have created the item, sending it again could
+        # create it twice
+        failed_create_keys = [key for key in failed_keys - set(results) if key.startswith("create_")]
+        if failed_create_keys:
+            logger.warning(f"{len(failed_create_keys)} creates on plan {plan_id} failed, reading the plan again")
+            return None
+        operations = []
+        for operation in run["operations"]:
+            operation_key = self.operation_key(operation)
+            if operation_key not in results:
+                operations.append(operation)
+            elif operation["op"] == "create_bucket":
+                plan_snapshot.add_bucket(results[operation_key])
+            elif operation["op"] == "create_task":
+                plan_snapshot.add_task(results[operation_key])
+        logger.info(f"Resuming plan {plan_id} with {len(operations)} of {len(run['operations'])} operations not done")
+        return {"plan_snapshot": plan_snapshot, "operations": operations}
@@ -0,0 +1,74 @@
+from o365.exception.planner_exception import PlannerException
+
+
+class OrderHint:
+    """This class computes planner order hints, short strings planner sorts items by in ordinal order
+
+    The hints are strings of the printable characters after the space, read as base 94 numbers of the same length.
+    They are only as long as needed for the items to fit strictly between the bounds, which can be hints planner
+    computed itself.
+    """
+
+    first_char: int = ord("!")
+    base: int = ord("~") - ord("!") + 1
+
+    @staticmethod
+    def spread(count: int, after: str = None, before: str = None) -> list:
+        """Compute count ascending order hints spread evenly after and before the hints, in one pass
+
+        Without after the hints start at the beginning of the list and without before they go to its end.
+        """
+        if count <= 0:
+            return []
+        if after is not None and before is not None and after >= before:
+            raise PlannerException(f"The order hint '{after}' is not before '{before}'")
+        max_length = len(after or "") + len(before or "") + len(OrderHint._digits(count, 1)) + 1
+        for length in range(1, max_length + 1):
+            low = -1 if after is None else OrderHint._bound(after, length, lower=True)
+            high = OrderHint.base ** length if before is None else OrderHint._bound(before, length, lower=False)
+            if high - low - 1 >= count:
+                return [
+                    OrderHint._hint(low + (high - low) * index // (count + 1), length) for index in range(1, count + 1)
+                ]
+        raise PlannerException(f"There is no room for {count} order hints between '{after}' and '{before}'")
+
+    @staticmethod
+    def between(after: str = None, before: str = None) -> str:
+        """Compute the shortest order hint after and before the hints"""
+        return OrderHint.spread(1, after, before)[0]
+
+    @staticmethod
+    def _bound(order_hint: str, length: int, lower: bool) -> int:
+        """Get the bound of the hint for hints of the length, a hint with a greater value than the lower bound of an
+        order hint sorts after it and one with a lower value than its upper bound sorts before it
+        """
+        value = 0
+        for position in range(length):
+            # The end of the hint sorts before any character, like a character below the alphabet
+            digit = ord(order_hint[position]) - OrderHint.first_char if position < len(order_hint) else -1
+            padding = OrderHint.base ** (length - position)
+            if digit < 0:
+                # Hints from the start of this position on sort after the hint
+                return value * padding - 1 if lower else value * padding
+            if digit >= OrderHint.base:
+                # Hints from the end of this position on sort before the hint
+                return (value + 1) * padding - 1 if lower else (value + 1) * padding
+            value = value * OrderHint.base + digit
+        if not lower and len(order_hint) > length:
+            # The hint cut to the length sorts before the hint itself, so only lower values sort before it
+            return value + 1
+        return value
+
+    @staticmethod
+    def _digits(value: int, length: int) -> list:
+        """Get the base 94 digits of the value, at least length of them"""
+        digits = []
+        while value > 0 or len(digits) < length:
+            value, digit = divmod(value, OrderHint.base)
+            digits.insert(0, digit)
+        return digits
+
+    @staticmethod
+    def _hint(value: int, length: int) -> str:
+        """Write the value as a hint of the length"""
+        return "".join(chr(OrderHint.first_char + digit) for digit in OrderHint._digits(value, length))
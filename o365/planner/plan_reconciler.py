@@ -0,0 +1,346 @@
+import threading
+from loguru import logger
+
+from o365.exception.agenda_exception import AgendaException
+from o365.exception.planner_exception import PlannerException
+from o365.graph.graph_batch import GraphBatch
+from o365.graph.graph_helper import GraphHelper
+from o365.planner.operation_journal import OperationJournal
+from o365.planner.order_hint import OrderHint
+from o365.planner.plan_snapshot import PlanSnapshot
+from o365.planner.planner_name_resolver import PlannerNameResolver
+from o365.util.constants import Constants
+
+
+class PlanReconciler:
+    """This class reconciles a planner plan with the buckets and tasks it should have, sending only the differences
+
+    The desired state is a list of buckets in order, each a dictionary with the bucket name and its tasks in order.
+    Each task is a dictionary with the title, the due_date_time and the details to PATCH. The actual state is a
+    snapshot of the plan. Missing buckets and tasks are created, tasks due on another date are updated and the details
+    of tasks that were never populated are updated, all through $batch. Buckets and tasks that are not in the desired
+    state are left as they are, so a plan that is already reconciled costs no writes.
+    """
+
+    plan_snapshot: PlanSnapshot
+    desired_buckets: list
+    journal: OperationJournal
+
+    def __init__(self, plan_snapshot: PlanSnapshot, desired_buckets: list, journal: OperationJournal = None) -> None:
+        """initialize the reconciler with the snapshot of the plan and its desired buckets, journaling to journal"""
+        self.plan_snapshot = plan_snapshot
+        self.desired_buckets = desired_buckets
+        self.journal = journal
+
+    def operations(self) -> list:
+        """Compare the desired buckets and tasks with the plan snapshot, returns the operations to reconcile them
+
+        Each operation is a dictionary with the op, create_bucket, create_task, update_task or update_details, the
+        bucket_name and, for the task operations, the desired task and the task in the plan if there is one.
+        """
+        operations = []
+        for desired_bucket in self.desired_buckets:
+            bucket = self.plan_snapshot.get_bucket_by_name(desired_bucket["name"])
+            if bucket is None:
+                operations.append({"op": "create_bucket", "bucket_name": desired_bucket["name"]})
+            for desired_task in desired_bucket["tasks"]:
+                task = None
+                if bucket is not None:
+                    task = self.plan_snapshot.get_task_by_title(bucket["id"], desired_task["title"])
+                operation = {"bucket_name": desired_bucket["name"], "desired_task": desired_task, "task": task}
+                if task is None:
+                    operations.append(dict(operation, op="create_task"))
+                    if self._has_details(desired_task):
+                        operations.append(dict(operation, op="update_details"))
+                    continue
+                if (task.get("dueDateTime") or "")[0:19] != desired_task["due_date_time"][0:19]:
+                    operations.append(dict(operation, op="update_task"))
+                if not self._details_populated(task, desired_task):
+                    operations.append(dict(operation, op="update_details"))
+        return operations
+
+    @staticmethod
+    def _has_details(desired_task: dict) -> bool:
+        """Check if the desired task has a description or references"""
+        details = desired_task.get("details") or {}
+        return bool(details.get("description") or details.get("references"))
+
+    @staticmethod
+    def _details_populated(task: dict, desired_task: dict) -> bool:
+        """Check from the task if its details were populated, without reading the details"""
+        details = desired_task.get("details") or {}
+        return task.get("hasDescription", False) == bool(details.get("description")) and task.get(
+            "referenceCount", 0
+        ) == len(details.get("references") or {})
+
+    def apply(self, operations: list = None) -> bool:
+        """Apply the operations, or the ones to reconcile the plan, returns if all of them succeeded
+
+        The buckets are created first, then the tasks, then the details of the tasks to update are read for their
+        etags in one batched pass and the tasks and details are updated in a last one. The batches are split into
+        $batch envelopes sent concurrently. With a journal, the run of the operations computed here is journaled
+        first, while operations passed in are those of a journaled run being resumed.
+        """
+        if operations is None:
+            operations = self.operations()
+            if operations and self.journal is not None:
+                self.journal.plan(self.plan_snapshot, operations)
+        if not operations:
+            logger.info(f"The plan {self.plan_snapshot.plan_id} is already reconciled.")
+            self._complete_journal()
+            return True
+        logger.info(
+            f"Reconciling plan {self.plan_snapshot.plan_id} with {len(operations)} operations: "
+            + ", ".join(
+                f"{len([o for o in operations if o['op'] == op])} {op}"
+                for op in ["create_bucket", "create_task", "update_task", "update_details"]
+            )
+        )
+        try:
+            graph_helper: GraphHelper = GraphHelper()
+            succeeded = self._create_buckets(graph_helper, operations)
+            succeeded = self._create_tasks(graph_helper, operations) and succeeded
+            succeeded = self._update_tasks(graph_helper, operations) and succeeded
+            if succeeded:
+                self._complete_journal()
+            return succeeded
+        except AgendaException as e:
+            logger.error(f"Error reconciling plan {self.plan_snapshot.plan_id}. {e}")
+        return False
+
+    def _complete_journal(self):
+        """Drop the journaled run once the plan is reconciled"""
+        if self.journal is not None:
+            self.journal.complete(self.plan_snapshot.plan_id)
+
+    def _send(
+        self, graph_helper: GraphHelper, batch: GraphBatch, operation_keys: dict, add_item=None, conflicts: list = None
+    ) -> bool:
+        """Send the batch, journaling the operations keyed by request id, returns if all the requests succeeded
+
+        Each envelope is journaled as sending before it is sent and its operations as done or failed as soon as it
+        completes, so an interrupted run only leaves the outcome of the envelopes in flight unknown. The items created
+        are added to the snapshot with add_item. With conflicts, the ids of the requests rejected with a 412 are added
+        to it to be sent again instead of failing.
+        """
+        succeeded = True
+        lock = threading.Lock()
+
+        def on_sending(envelope: list):
+            if self.journal is not None:
+                self.journal.sending(
+                    self.plan_snapshot.plan_id,
+                    [operation_keys[request["id"]] for request in envelope if request["id"] in operation_keys],
+                )
+
+        def on_sent(envelope_responses: dict):
+            nonlocal succeeded
+            with lock:
+                for result in envelope_responses.values():
+                    operation_key = operation_keys.get(result["id"])
+                    if result["status"] == 412 and conflicts is not None:
+                        conflicts.append(result["id"])
+                        continue
+                    if result["status"] >= 300:
+                        logger.error(f"Error in request {result['id']}. {result['status']} {result['body']}")
+                        succeeded = False
+                        if self.journal is not None and operation_key is not None:
+                            self.journal.failed(self.plan_snapshot.plan_id, operation_key, result["status"])
+                        continue
+                    if add_item is not None:
+                        add_item(result["body"])
+                    if self.journal is not None and operation_key is not None:
+                        self.journal.done(self.plan_snapshot.plan_id, operation_key, result["body"])
+
+        graph_helper.batch_request(batch, Constants.PLANNER_MAX_WORKERS, on_sending, on_sent)
+        return succeeded
+
+    # POST https://graph.microsoft.com/v1.0/$batch
+    def _create_buckets(self, graph_helper: GraphHelper, operations: list) -> bool:
+        """Create the buckets concurrently, ordered by the order hints computed for them"""
+        bucket_operations = [operation for operation in operations if operation["op"] == "create_bucket"]
+        if not bucket_operations:
+            return True
+        batch = GraphBatch()
+        operation_keys = {}
+        order_hints = self._order_hints(
+            [self.plan_snapshot.get_bucket_by_name(desired_bucket["name"]) for desired_bucket in self.desired_buckets]
+        )
+        for operation, order_hint in zip(bucket_operations, order_hints):
+            request_id = batch.post(
+                "planner/buckets",
+                {"name": operation["bucket_name"], "planId": self.plan_snapshot.plan_id, "orderHint": order_hint},
+                request_id=f"bucket-{len(batch)}",
+            )
+            operation_keys[request_id] = OperationJournal.operation_key(operation)
+        succeeded = self._send(graph_helper, batch, operation_keys, self.plan_snapshot.add_bucket)
+        PlannerNameResolver.invalidate_buckets(self.plan_snapshot.plan_id)
+        return succeeded
+
+    # POST https://graph.microsoft.com/v1.0/$batch
+    def _create_tasks(self, graph_helper: GraphHelper, operations: list) -> bool:
+        """Create the tasks of all the buckets concurrently, ordered in each bucket by the order hints computed for them
+
+        The tasks do not depend on each other, so they are packed into full $batch envelopes sent by up to
+        PLANNER_MAX_WORKERS workers, paced by the rate limiter shared by all the graph requests.
+        """
+        operations_by_bucket_name: dict = {}
+        for operation in operations:
+            if operation["op"] == "create_task":
+                operations_by_bucket_name.setdefault(operation["bucket_name"], []).append(operation)
+        succeeded = True
+        batch = GraphBatch()
+        operation_keys = {}
+        for bucket_name, task_operations in operations_by_bucket_name.items():
+            bucket = self.plan_snapshot.get_bucket_by_name(bucket_name)
+            if bucket is None:
+                logger.error(f"Skipping the tasks for bucket '{bucket_name}' that was not created.")
+                succeeded = False
+                continue
+            desired_bucket = next(
+                desired_bucket for desired_bucket in self.desired_buckets if desired_bucket["name"] == bucket_name
+            )
+            order_hints = self._order_hints(
+                [
+                    self.plan_snapshot.get_task_by_title(bucket["id"], desired_task["title"])
+                    for desired_task in desired_bucket["tasks"]
+                ]
+            )
+            for operation, order_hint in zip(task_operations, order_hints):
+                request_id = batch.post(
+                    "planner/tasks",
+                    {
+                        "planId": self.plan_snapshot.plan_id,
+                        "bucketId": bucket["id"],
+                        "title": operation["desired_task"]["title"],
+                        "orderHint": order_hint,
+                        "dueDateTime": operation["desired_task"]["due_date_time"],
+                    },
+                    request_id=f"task-{len(batch)}",
+                )
+                operation_keys[request_id] = OperationJournal.operation_key(operation)
+        if len(batch):
+            succeeded = self._send(graph_helper, batch, operation_keys, self.plan_snapshot.add_task) and succeeded
+        return succeeded
+
+    @staticmethod
+    def _order_hints(items: list) -> list:
+        """Compute the order hints of the items to create, each run of them spread between the items around it
+
+        The items are in the desired order, the ones in the plan with their order hint and the ones to create None.
+        """
+        order_hints = []
+        after = None
+        run = 0
+        for item in items + [{"orderHint": None}]:
+            if item is None:
+                run += 1
+                continue
+            before = item.get("orderHint")
+            if after is not None and before is not None and after >= before:
+                # The items in the plan were moved out of the desired order, so only keep after the previous ones
+                before = None
+            if run > 0:
+                try:
+                    order_hints.extend(OrderHint.spread(run, after, before))
+                except PlannerException as e:
+                    logger.warning(f"Placing {run} items after '{after}' only. {e}")
+                    order_hints.extend(OrderHint.spread(run, after))
+                    before = None
+                if before is None:
+                    after = order_hints[-1]
+                run = 0
+            if before is not None:
+                after = before
+        return order_hints
+
+    # POST https://graph.microsoft.com/v1.0/$batch
+    def _update_tasks(self, graph_helper: GraphHelper, operations: list) -> bool:
+        """Update the tasks with the etags in the snapshot, and the details after reading their etags"""
+        succeeded = True
+        updates = []
+        for operation in operations:
+            if operation["op"] not in ["update_task", "update_details"]:
+                continue
+            task = operation["task"]
+            bucket = self.plan_snapshot.get_bucket_by_name(operation["bucket_name"])
+            if task is None and bucket is not None:
+                task = self.plan_snapshot.get_task_by_title(bucket["id"], operation["desired_task"]["title"])
+            if task is None:
+                logger.error(
+                    f"Skipping the update of task '{operation['desired_task']['title']}' that was not created."
+                )
+                succeeded = False
+                continue
+            updates.append(dict(operation, task=task))
+        if not updates:
+            return succeeded
+        return self._send_updates(graph_helper, updates) and succeeded
+
+    # POST https://graph.microsoft.com/v1.0/$batch
+    def _send_updates(self, graph_helper: GraphHelper, updates: list, retry_conflicts: bool = True) -> bool:
+        """Send the task and details updates, returns if all of them succeeded
+
+        The details are read for their etags, the tasks use the etags in the snapshot unless they are to be read
+        again. Updates rejected because the task changed since it was read (412 Precondition Failed) are read and
+        sent again once.
+        """
+        succeeded = True
+        read_batch = GraphBatch()
+        for update in updates:
+            if update["op"] == "update_details":
+                read_batch.get(
+                    f"planner/tasks/{update['task']['id']}/details", request_id=f"details-{update['task']['id']}"
+                )
+            elif update.get("read_task"):
+                read_batch.get(f"planner/tasks/{update['task']['id']}", request_id=f"task-{update['task']['id']}")
+        read_results = graph_helper.batch_request(read_batch, Constants.PLANNER_MAX_WORKERS) if len(read_batch) else {}
+
+        write_batch = GraphBatch()
+        operation_keys = {}
+        updates_by_request_id = {}
+        for update in updates:
+            task_id = update["task"]["id"]
+            if update["op"] == "update_task":
+                etag = update["task"]["@odata.etag"]
+                if update.get("read_task"):
+                    task_result = read_results.get(f"task-{task_id}")
+                    if task_result is None or task_result["status"] != 200:
+                        logger.error(f"Error getting task with id {task_id}. {task_result}")
+                        succeeded = False
+                        continue
+                    etag = task_result["etag"]
+                request_id = write_batch.patch(
+                    f"planner/tasks/{task_id}",
+                    {"dueDateTime": update["desired_task"]["due_date_time"]},
+                    {"If-Match": etag},
+                    request_id=f"task-{task_id}",
+                )
+                operation_keys[request_id] = OperationJournal.operation_key(update)
+                updates_by_request_id[request_id] = update
+                continue
+            details_result = read_results.get(f"details-{task_id}")
+            if details_result is None or details_result["status"] != 200:
+                logger.error(f"Error getting task details for task {task_id}. {details_result}")
+                succeeded = False
+                continue
+            request_id = write_batch.patch(
+                f"planner/tasks/{task_id}/details",
+                update["desired_task"]["details"],
+                {"If-Match": details_result["etag"]},
+                request_id=f"details-{task_id}",
+            )
+            operation_keys[request_id] = OperationJournal.operation_key(update)
+            updates_by_request_id[request_id] = update
+        if len(write_batch) == 0:
+            return succeeded
+        conflicted_request_ids = [] if retry_conflicts else None
+        sent = self._send(graph_helper, write_batch, operation_keys, conflicts=conflicted_request_ids)
+        succeeded = sent and succeeded
+        if conflicted_request_ids:
+            logger.warning(f"{len(conflicted_request_ids)} tasks changed since they were read, updating them again")
+            conflicted_updates = [
+                dict(updates_by_request_id[request_id], read_task=True) for request_id in conflicted_request_ids
+            ]
+            succeeded = self._send_updates(graph_helper, conflicted_updates, False) and succeeded
+        return succeeded
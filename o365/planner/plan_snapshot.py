@@ -0,0 +1,101 @@
+from datetime import date
+from loguru import logger
+
+from o365.graph.async_graph_helper import AsyncGraphHelper
+from o365.util.async_runner import AsyncRunner
+
+
+class PlanSnapshot:
+    """This class is a point in time snapshot of the buckets and tasks in a planner plan, indexed for lookups
+
+    The buckets and the tasks of the whole plan are read once, every page of them, and kept as the graph api returned
+    them. The tasks are indexed by bucket id, by bucket id and title, and by due date.
+    """
+
+    plan_id: str
+    buckets: list
+    tasks: list
+    _buckets_by_id: dict
+    _buckets_by_name: dict
+    _tasks_by_bucket_id: dict
+    _tasks_by_bucket_id_and_title: dict
+    _tasks_by_due_date: dict
+
+    def __init__(self, plan_id: str, buckets: list, tasks: list) -> None:
+        """initialize the plan snapshot from the buckets and tasks read from the plan"""
+        self.plan_id = plan_id
+        self.buckets = list(buckets)
+        self.tasks = []
+        self._buckets_by_id = {}
+        self._buckets_by_name = {}
+        self._tasks_by_bucket_id = {}
+        for bucket in buckets:
+            self._index_bucket(bucket)
+        self._tasks_by_bucket_id_and_title = {}
+        self._tasks_by_due_date = {}
+        for task in tasks:
+            self.add_task(task)
+
+    # GET https://graph.microsoft.com/v1.0/planner/plans/{plan-id}/buckets
+    # GET https://graph.microsoft.com/v1.0/planner/plans/{plan-id}/tasks
+    @staticmethod
+    def fetch(plan_id: str):
+        """Read the buckets and tasks of the plan concurrently into a snapshot, returns None if either read failed"""
+        logger.debug(f"Fetching the snapshot of the buckets and tasks in plan {plan_id}")
+        async_graph_helper: AsyncGraphHelper = AsyncGraphHelper()
+        buckets, tasks = AsyncRunner.run(
+            async_graph_helper.get_requests(
+                [f"planner/plans/{plan_id}/buckets", f"planner/plans/{plan_id}/tasks"],
+                {"Content-Type": "application/json"},
+            )
+        )
+        if buckets is None or tasks is None:
+            logger.error(f"Error fetching the snapshot of plan {plan_id}")
+            return None
+        logger.debug(f"Found {len(buckets['value'])} buckets and {len(tasks['value'])} tasks in plan {plan_id}")
+        return PlanSnapshot(plan_id, buckets["value"], tasks["value"])
+
+    def add_bucket(self, bucket: dict):
+        """Add a bucket to the snapshot, such as one created after the snapshot was read"""
+        self.buckets.append(bucket)
+        self._index_bucket(bucket)
+
+    def _index_bucket(self, bucket: dict):
+        """Index the bucket by id and name"""
+        self._buckets_by_id[bucket["id"]] = bucket
+        self._buckets_by_name.setdefault(bucket["name"], bucket)
+        self._tasks_by_bucket_id.setdefault(bucket["id"], [])
+
+    def add_task(self, task: dict):
+        """Add a task to the snapshot, such as one created after the snapshot was read"""
+        self.tasks.append(task)
+        self._tasks_by_bucket_id.setdefault(task["bucketId"], []).append(task)
+        self._tasks_by_bucket_id_and_title.setdefault((task["bucketId"], task["title"]), task)
+        if task.get("dueDateTime"):
+            self._tasks_by_due_date.setdefault(task["dueDateTime"][0:10], []).append(task)
+
+    def get_bucket(self, bucket_id: str):
+        """Get the bucket with the id"""
+        return self._buckets_by_id.get(bucket_id)
+
+    def get_bucket_by_name(self, bucket_name: str):
+        """Get the bucket with the name, or else the first bucket with a name containing it"""
+        bucket = self._buckets_by_name.get(bucket_name)
+        if bucket is not None:
+            return bucket
+        for bucket in self.buckets:
+            if bucket_name in bucket["name"]:
+                return bucket
+        return None
+
+    def get_tasks_in_bucket(self, bucket_id: str) -> list:
+        """Get the tasks in the bucket with the id"""
+        return self._tasks_by_bucket_id.get(bucket_id, [])
+
+    def get_task_by_title(self, bucket_id: str, title: str):
+        """Get the task with the title in the bucket with the id"""
+        return self._tasks_by_bucket_id_and_title.get((bucket_id, title))
+
+    def get_tasks_by_due_date(self, due_date: date) -> list:
+        """Get the tasks due on the date"""
+        return self._tasks_by_due_date.get(due_date.strftime("%Y-%m-%d"), [])
@@ -1,6 +1,4 @@
-import asyncio
 from datetime import datetime
-import time
 from loguru import logger
 from msgraph import GraphServiceClient
 from msgraph.generated.planner.plans.item.planner_plan_item_request_builder import (
@@ -13,48 +11,16 @@ from msgraph.generated.models.planner_plan_container import PlannerPlanContainer
 from msgraph.generated.models.planner_bucket import PlannerBucket
 from msgraph.generated.models.planner_task import PlannerTask
 from kiota_abstractions.api_error import APIError
+from o365.graph.graph_helper import GraphHelper
+from o365.graph.graph_pager import GraphPager
+from o365.planner.planner_name_resolver import PlannerNameResolver
+from o365.util.async_runner import AsyncRunner
+from o365.util.retry_policy import RetryPolicy
 
 
 class PlannerHelper:
     """This is a helper for MS Planner"""
 
-    @staticmethod
-    # GET /groups/{group-id}/planner/plans
-    async def get_all_plans(graph_client: GraphServiceClient, group_id: str):
-        """Gets all the planner tasks"""
-        try:
-            logger.debug("Getting all plans")
-            plans = await graph_client.groups.by_group_id(group_id).planner.plans.get()
-            return plans
-        except APIError as e:
-            logger.error(f"Error getting all plans: {e.error.message}")
-
-        return None
-
-    @staticmethod
-    # GET /planner/plans/{plan-id}/buckets
-    async def get_all_buckets(graph_client: GraphServiceClient, plan_id: str):
-        """Gets all the buckets in the plan"""
-        logger.debug("Getting all buckets in the plan")
-        try:
-            buckets = await graph_client.planner.plans.by_planner_plan_id(plan_id).buckets.get()
-            return buckets
-        except APIError as e:
-            logger.error(f"Error getting all buckets: {e.error.message}")
-        return None
-
-    @staticmethod
-    # GET planner/buckets/{bucket-id}/tasks
-    async def get_tasks_in_bucket(graph_client: GraphServiceClient, bucket_id: str):
-        """Gets all the planner tasks in the bucket"""
-        logger.debug("Getting all tasks in the bucket")
-        try:
-            tasks = await graph_client.planner.buckets.by_planner_bucket_id(bucket_id).tasks.get()
-            return tasks
-        except APIError as e:
-            logger.error(f"Error getting all tasks in bucket: {e.error.message}")
-        return None
-
     @staticmethod
     # GET /planner/plans/{plan-id}
     async def delete_plan(graph_client: GraphServiceClient, plan_id: str, etag: str):
@@ -70,6 +36,9 @@ class PlannerHelper:
             await graph_client.planner.plans.by_planner_plan_id(plan_id).delete(
                 request_configuration=request_configuration
             )
+            GraphHelper.invalidate("planner/plans")
+            PlannerNameResolver.invalidate_plans()
+            PlannerNameResolver.invalidate_buckets(plan_id)
 
         except APIError as e:
             logger.error(f"Error deleting plan: {e.error.message}")
@@ -88,6 +57,8 @@ class PlannerHelper:
                 title=plan_name,
             )
             result = await graph_client.planner.plans.post(request_body)
+            GraphHelper.invalidate("planner/plans")
+            PlannerNameResolver.invalidate_plans(group_id)
             return result
         except APIError as e:
             logger.error(f"Error creating plan: {e.error.message}")
@@ -106,6 +77,8 @@ class PlannerHelper:
             )
 
             result = await graph_client.planner.buckets.post(request_body)
+            GraphHelper.invalidate("planner/buckets")
+            PlannerNameResolver.invalidate_buckets(plan_id)
             return result
         except APIError as e:
             logger.error(f"Error creating bucket: {e.error.message}")
@@ -125,6 +98,8 @@ class PlannerHelper:
             await graph_client.planner.buckets.by_planner_bucket_id(bucket_id).delete(
                 request_configuration=request_configuration
             )
+            GraphHelper.invalidate("planner/buckets")
+            PlannerNameResolver.invalidate_buckets()
 
         except APIError as e:
             logger.error(f"Error deleting bucket: {e.error.message}")
@@ -140,7 +115,7 @@ class PlannerHelper:
         )
         try:
             result = await graph_client.planner.tasks.post(task)
-
+            GraphHelper.invalidate("planner/tasks")
             return result
         except APIError as e:
             logger.error(f"Error creating task: {e.error.message}")
@@ -175,286 +150,148 @@ class PlannerHelper:
     @staticmethod
     def get_plan_by_name(graph_client: GraphServiceClient, group_id: str, plan_name: str):
         """Gets plan by name for the specified group_id"""
-        retry_count = 0
-        plan_by_name = None
-        while retry_count < 5:
-            try:
-                logger.debug(f"Getting the plan in group: {group_id} with name {plan_name}")
-                plans = asyncio.run(PlannerHelper.get_all_plans(graph_client, group_id))
-                logger.debug(plans)
-                if plans and plans.value:
-                    for plan in plans.value:
-                        if plan_name.lower() in plan.title.lower():
-                            logger.debug(f"Found plan {plan}")
-                            return plan
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(5)
-                    else:
-                        logger.error(f"Unexpected error getting plan {plan_name}. {e}")
-                        break  # do something here, like log the error
-        return plan_by_name
+        logger.debug(f"Getting the plan in group: {group_id} with name {plan_name}")
+        try:
+            plan = PlannerNameResolver.get_plan(graph_client, group_id, plan_name)
+        except APIError as e:
+            logger.error(f"Error getting plan {plan_name}: {e.error.message}")
+            return None
+        if plan is not None:
+            logger.debug(f"Found plan {plan}")
+        return plan
 
     @staticmethod
     def get_plan_by_exact_name(graph_client: GraphServiceClient, group_id: str, plan_name: str):
         """Gets plan by name for the specified group_id"""
-        retry_count = 0
-        plan_by_name = None
-        while retry_count < 5:
-            try:
-                logger.debug(f"Getting the plan in group: {group_id} with exact name {plan_name}")
-                plans = asyncio.run(PlannerHelper.get_all_plans(graph_client, group_id))
-                logger.debug(plans)
-                if plans and plans.value:
-                    for plan in plans.value:
-                        if plan_name.lower() == plan.title.lower():
-                            logger.debug(f"Found plan {plan}")
-                            return plan
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(5)
-                    else:
-                        logger.error(f"Unexpected error getting plan with exact name {plan_name}. {e}")
-                        break  # do something here, like log the error
-        return plan_by_name
+        logger.debug(f"Getting the plan in group: {group_id} with exact name {plan_name}")
+        try:
+            plan = PlannerNameResolver.get_plan(graph_client, group_id, plan_name, exact=True)
+        except APIError as e:
+            logger.error(f"Error getting plan {plan_name}: {e.error.message}")
+            return None
+        if plan is not None:
+            logger.debug(f"Found plan {plan}")
+        return plan
 
     @staticmethod
     def get_bucket_by_name(graph_client, plan_id, bucket_name):
         """Gets bucket by name for the specified plan id"""
-        retry_count = 0
-        bucket_by_name = None
-        while retry_count < 5:
-            try:
-                logger.debug(f"Getting the bucket {bucket_name} in plan: {plan_id}")
-                buckets = asyncio.run(PlannerHelper.get_all_buckets(graph_client, plan_id))
-                if buckets and buckets.value:
-                    for bucket in buckets.value:
-                        if bucket_name in bucket.name:
-                            logger.debug(f"Found bucket {bucket}")
-                            return bucket
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(5)
-                    else:
-                        logger.error(f"Unexpected error getting bucket {bucket_name}. {e}")
-                        break  # do something here, like log the error
-        return bucket_by_name
+        logger.debug(f"Getting the bucket {bucket_name} in plan: {plan_id}")
+        try:
+            bucket = PlannerNameResolver.get_bucket(graph_client, plan_id, bucket_name)
+        except APIError as e:
+            logger.error(f"Error getting bucket {bucket_name}: {e.error.message}")
+            return None
+        if bucket is not None:
+            logger.debug(f"Found bucket {bucket}")
+        return bucket
 
     @staticmethod
+    # GET /planner/plans/{plan-id}/buckets
     def fetch_all_buckets(graph_client, plan_id):
         """Fetches all the buckets for the specified plan id"""
-        retry_count = 0
-        buckets = None
-        while retry_count < 5:
-            try:
-                logger.debug(f"Getting the buckets in plan: {plan_id}")
-                buckets = asyncio.run(PlannerHelper.get_all_buckets(graph_client, plan_id))
-                if buckets and buckets.value:
-                    return buckets.value
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(5)
-                    else:
-                        logger.error(f"Unexpected error getting buckets. {e}")
-                        break  # do something here, like log the error
-        return buckets
+        logger.debug(f"Getting the buckets in plan: {plan_id}")
+        try:
+            buckets = list(GraphPager.iter_items(graph_client.planner.plans.by_planner_plan_id(plan_id).buckets))
+        except APIError as e:
+            logger.error(f"Error getting all buckets: {e.error.message}")
+            return None
+        if buckets:
+            return buckets
+        return None
 
     @staticmethod
+    # GET planner/buckets/{bucket-id}/tasks
     def get_task_by_name(graph_client, bucket_id, task_name):
         """Get the task with the specified name in the bucket"""
-        retry_count = 0
-        task_in_bucket = None
-        while retry_count < 3:
-            try:
-                logger.debug(f"Getting the task {task_name} in bucket: {bucket_id}")
-                tasks = asyncio.run(PlannerHelper.get_tasks_in_bucket(graph_client, bucket_id))
-                if tasks and tasks.value:
-                    for task in tasks.value:
-                        if task.title == task_name:
-                            return task
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 3:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-                    else:
-                        logger.error(f"Unexpected error getting task by name from bucket. {e}")
-                        break  # do something here, like log the error
-        return task_in_bucket
+        logger.debug(f"Getting the task {task_name} in bucket: {bucket_id}")
+        try:
+            for task in GraphPager.iter_items(graph_client.planner.buckets.by_planner_bucket_id(bucket_id).tasks):
+                if task.title == task_name:
+                    return task
+        except APIError as e:
+            logger.error(f"Error getting task {task_name}: {e.error.message}")
+        return None
 
     @staticmethod
+    # GET planner/buckets/{bucket-id}/tasks
     def get_tasks_by_due_date(graph_client, bucket_id, task_name, due_date: datetime):
         """Get the task with the specified name and due date in the bucket"""
-        retry_count = 0
-        task_in_bucket = None
-        while retry_count < 3:
-            try:
-                logger.debug(f"Getting the task {task_name} due {due_date} in bucket: {bucket_id}")
-                tasks = asyncio.run(PlannerHelper.get_tasks_in_bucket(graph_client, bucket_id))
-                if not due_date:
-                    logger.error(f"Error the task {task_name} due date was not provided.")
-                    return task_in_bucket
-                due_date_str = due_date.strftime("%Y-%m-%d")
-                if tasks and tasks.value:
-                    for task in tasks.value:
-                        if task_name in task.title:
-                            if not task.dueDateTime:
-                                logger.error(
-                                    f"Error the task with {task_name} was found\
-                                          but does not have due date assigned {task.id}."
-                                )
-                                return task_in_bucket
-                            if task.dueDateTime.strftime("%Y-%m-%d") == due_date_str:
-                                return task
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 3:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-                    else:
-                        logger.error(f"Unexpected error getting task by name and ue date from bucket. {e}")
-                        break  # do something here, like log the error
-        return task_in_bucket
+        logger.debug(f"Getting the task {task_name} due {due_date} in bucket: {bucket_id}")
+        if not due_date:
+            logger.error(f"Error the task {task_name} due date was not provided.")
+            return None
+        due_date_str = due_date.strftime("%Y-%m-%d")
+        try:
+            for task in GraphPager.iter_items(graph_client.planner.buckets.by_planner_bucket_id(bucket_id).tasks):
+                if task_name in task.title:
+                    if not task.due_date_time:
+                        logger.error(
+                            f"Error the task with {task_name} was found\
+                                  but does not have due date assigned {task.id}."
+                        )
+                        return None
+                    if task.due_date_time.strftime("%Y-%m-%d") == due_date_str:
+                        return task
+        except APIError as e:
+            logger.error(f"Error getting task {task_name}: {e.error.message}")
+        return None
 
     @staticmethod
+    # GET planner/buckets/{bucket-id}/tasks
     def fetch_tasks_in_bucket(graph_client, bucket_id):
         """Fetches all the tasks in the bucket"""
-        retry_count = 0
-        tasks_in_bucket = None
-        while retry_count < 10:
-            try:
-                logger.debug(f"Getting the tasks in bucket: {bucket_id}")
-                tasks = asyncio.run(PlannerHelper.get_tasks_in_bucket(graph_client, bucket_id))
-                if tasks and tasks.value:
-                    return tasks.value
-            except IndexError as ie:
-                if "string index out of range" in str(ie):
-                    if retry_count < 10:
-                        logger.error(
-                            f"An index out of range error occurred getting tasks from bucket. {ie}. Retrying.."
-                        )
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 10:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-                    else:
-                        logger.error(f"Unexpected error getting tasks from bucket. {e}")
-                        break  # do something here, like log the error
-        return tasks_in_bucket
+        # The sdk intermittently fails to parse the tasks response with an index out of range error
+        retry_policy = RetryPolicy(
+            base_delay=10, retry_if=lambda e: isinstance(e, IndexError) and "string index out of range" in str(e)
+        )
+        logger.debug(f"Getting the tasks in bucket: {bucket_id}")
+        try:
+            tasks = retry_policy.execute(
+                lambda: list(GraphPager.iter_items(graph_client.planner.buckets.by_planner_bucket_id(bucket_id).tasks))
+            )
+        except APIError as e:
+            logger.error(f"Error getting all tasks in bucket: {e.error.message}")
+            return None
+        if tasks:
+            return tasks
+        return None
 
     @staticmethod
     def fetch_task(graph_client, task_id: str):
         """Get the task"""
-        retry_count = 0
-        task = None
-        while retry_count < 5:
-            try:
-                logger.debug(f"Getting the task with id: {task_id}")
-                task = asyncio.run(PlannerHelper.get_task(graph_client, task_id))
-                if task:
-                    return task
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-                    else:
-                        logger.error(f"Unexpected error getting task. {e}")
-                        break  # do something here, like log the error
-        return task
+        logger.debug(f"Getting the task with id: {task_id}")
+        return AsyncRunner.run(PlannerHelper.get_task(graph_client, task_id))
 
     @staticmethod
     def fetch_task_details(graph_client, task_id: str):
         """Get the task details"""
-        retry_count = 0
-        task_details = None
-        while retry_count < 10:
-            try:
-                logger.debug(f"Getting the task details for: {task_id}")
-                task_details = asyncio.run(PlannerHelper.get_task_details(graph_client, task_id))
-                if task_details:
-                    return task_details
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 10:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-                    else:
-                        logger.error(f"Unexpected error getting get the task details from bucket. {e}")
-                        break  # do something here, like log the error
-        return task_details
+        logger.debug(f"Getting the task details for: {task_id}")
+        return AsyncRunner.run(PlannerHelper.get_task_details(graph_client, task_id))
 
     @staticmethod
     def delete_plan_by_name(graph_client: GraphServiceClient, group_id: str, plan_name: str):
         """Deletes plan by name for the specified group_id"""
-        retry_count = 0
-        while retry_count < 5:
-            try:
-                logger.debug(f"Getting the plan to delete with name {plan_name}")
-                plan = PlannerHelper.get_plan_by_name(graph_client, group_id, plan_name)
-                if plan is None:
-                    logger.debug(f"No matching plan found with name {plan_name} in group {group_id}")
-                    continue
-                etag = plan.additional_data["@odata.etag"]
-                asyncio.run(PlannerHelper.delete_plan(graph_client, plan.id, etag))
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-                    else:
-                        logger.error(f"Unexpected error deleting plan {plan_name}. {e}")
-                        break  # do something here, like log the error
+        logger.debug(f"Getting the plan to delete with name {plan_name}")
+        plan = PlannerHelper.get_plan_by_name(graph_client, group_id, plan_name)
+        if plan is None:
+            logger.debug(f"No matching plan found with name {plan_name} in group {group_id}")
+            return True
+        etag = plan.additional_data["@odata.etag"]
+        AsyncRunner.run(PlannerHelper.delete_plan(graph_client, plan.id, etag))
         return True
 
     @staticmethod
     def create_plan_with_name(graph_client: GraphServiceClient, group_id: str, plan_name: str):
         """Creates a plan with specified name in the specified group_id"""
-        retry_count = 0
-        while retry_count < 5:
-            try:
-                logger.debug(f"Creating the plan with name {plan_name}")
-                plan = asyncio.run(PlannerHelper.create_plan(graph_client, plan_name, group_id))
-                return plan
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-                    else:
-                        logger.error(f"Unexpected error creating plan {plan_name}. {e}")
-                        break  # do something here, like log the error
-        return None
+        logger.debug(f"Creating the plan with name {plan_name}")
+        return AsyncRunner.run(PlannerHelper.create_plan(graph_client, plan_name, group_id))
 
     @staticmethod
     def create_bucket_with_name(graph_client: GraphServiceClient, plan_id: str, bucket_name: str, order_hint: str):
         """Creates a bucket with with specified name in the specified plan_id"""
-        retry_count = 0
-        while retry_count < 5:
-            try:
-                logger.debug(f"Creating the bucket with name {bucket_name}")
-                bucket = asyncio.run(PlannerHelper.create_bucket(graph_client, bucket_name, plan_id, order_hint))
-                return bucket
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-                    else:
-                        logger.error(f"Unexpected error creating bucket {bucket_name}. {e}")
-                        break  # do something here, like log the error
-        return None
+        logger.debug(f"Creating the bucket with name {bucket_name}")
+        return AsyncRunner.run(PlannerHelper.create_bucket(graph_client, bucket_name, plan_id, order_hint))
 
     @staticmethod
     def create_task_in_bucket(
@@ -465,47 +302,23 @@ class PlannerHelper:
         order_hint: str = " !",
     ):
         """Creates a task with with specified name, due date, assignment in the specified bucket_id for plan_id"""
-        retry_count = 0
-        while retry_count < 1:  # prevent duplicates
-            try:
-                logger.debug(f"Creating the task with name {task_title}, in bucket {bucket_id}")
-                request_body = PlannerTask(
-                    plan_id=plan_id,
-                    bucket_id=bucket_id,
-                    title=task_title,
-                    assignments=None,
-                    order_hint=order_hint,
-                )
-                task = asyncio.run(PlannerHelper.create_task(graph_client, request_body))
-                return task
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 1:
-                        retry_count = retry_count + 1
-                        time.sleep(15)
-                    else:
-                        logger.error(f"Unexpected error creating task {task.title}. {e}")
-                        break  # do something here, like log the error
-        return None
+        logger.debug(f"Creating the task with name {task_title}, in bucket {bucket_id}")
+        request_body = PlannerTask(
+            plan_id=plan_id,
+            bucket_id=bucket_id,
+            title=task_title,
+            assignments=None,
+            order_hint=order_hint,
+        )
+        return AsyncRunner.run(PlannerHelper.create_task(graph_client, request_body))
 
     @staticmethod
     def delete_bucket_by_name(graph_client: GraphServiceClient, plan_id: str, bucket_name: str):
         """Deletes bucket by name for the specified bucket_id"""
-        retry_count = 0
-        while retry_count < 3:
-            try:
-                logger.debug(f"Getting the bucket to delete with name {bucket_name}")
-                bucket = PlannerHelper.get_bucket_by_name(graph_client, plan_id, bucket_name)
-                if bucket is None:
-                    logger.debug(f"No matching bucket found with name {bucket_name} in group {plan_id}")
-                    continue
-                asyncio.run(PlannerHelper.delete_bucket(graph_client, plan_id, bucket.id))
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 3:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-                    else:
-                        logger.error(f"Unexpected error deleting bucke {bucket_name}. {e}")
-                        break  # do something here, like log the error
+        logger.debug(f"Getting the bucket to delete with name {bucket_name}")
+        bucket = PlannerHelper.get_bucket_by_name(graph_client, plan_id, bucket_name)
+        if bucket is None:
+            logger.debug(f"No matching bucket found with name {bucket_name} in group {plan_id}")
+            return True
+        AsyncRunner.run(PlannerHelper.delete_bucket(graph_client, bucket.id, bucket.additional_data["@odata.etag"]))
         return True
@@ -0,0 +1,110 @@
+import threading
+import time
+from loguru import logger
+
+from o365.graph.graph_pager import GraphPager
+from o365.util.constants import Constants
+
+
+class PlannerNameResolver:
+    """This class resolves planner plans and buckets by name from indexes of all of them, kept for a time to live
+
+    The plans of a group and the buckets of a plan are each read once into an index by exact name and by case
+    insensitive name, substring lookups are scanned once and remembered. The indexes are read again when their time
+    to live passes, or after a plan or bucket is created or deleted.
+    """
+
+    ttl: float = Constants.PLANNER_NAME_CACHE_TTL
+    _plan_indexes: dict = {}
+    _bucket_indexes: dict = {}
+    _generation: int = 0
+    _lock = threading.Lock()
+
+    # GET /groups/{group-id}/planner/plans
+    @staticmethod
+    def get_plan(graph_client, group_id: str, plan_name: str, exact: bool = False):
+        """Get the plan with the name, ignoring case, or else when not exact the first one with a name containing it"""
+        plan_index = PlannerNameResolver._index(
+            PlannerNameResolver._plan_indexes,
+            group_id,
+            lambda: GraphPager.iter_items(graph_client.groups.by_group_id(group_id).planner.plans),
+            lambda plan: plan.title,
+        )
+        return PlannerNameResolver._lookup(plan_index, plan_name, exact)
+
+    # GET /planner/plans/{plan-id}/buckets
+    @staticmethod
+    def get_bucket(graph_client, plan_id: str, bucket_name: str, exact: bool = False):
+        """Get the bucket with the name, or else ignoring case, or else when not exact the first one containing it"""
+        bucket_index = PlannerNameResolver._index(
+            PlannerNameResolver._bucket_indexes,
+            plan_id,
+            lambda: GraphPager.iter_items(graph_client.planner.plans.by_planner_plan_id(plan_id).buckets),
+            lambda bucket: bucket.name,
+        )
+        return PlannerNameResolver._lookup(bucket_index, bucket_name, exact)
+
+    @staticmethod
+    def invalidate_plans(group_id: str = None):
+        """Read the plans of the group, or of all the groups, again on the next lookup"""
+        with PlannerNameResolver._lock:
+            PlannerNameResolver._invalidate(PlannerNameResolver._plan_indexes, group_id)
+
+    @staticmethod
+    def invalidate_buckets(plan_id: str = None):
+        """Read the buckets of the plan, or of all the plans, again on the next lookup"""
+        with PlannerNameResolver._lock:
+            PlannerNameResolver._invalidate(PlannerNameResolver._bucket_indexes, plan_id)
+
+    @staticmethod
+    def _invalidate(indexes: dict, key: str):
+        """Drop the index with the key, or all the indexes"""
+        PlannerNameResolver._generation += 1
+        if key is None:
+            indexes.clear()
+        else:
+            indexes.pop(key, None)
+
+    @staticmethod
+    def _index(indexes: dict, key: str, iter_items, name_of) -> dict:
+        """Get the index with the key, reading its items when it is missing or expired"""
+        with PlannerNameResolver._lock:
+            index = indexes.get(key)
+            if index is not None and index["expires_at"] > time.monotonic():
+                return index
+            generation = PlannerNameResolver._generation
+        items = list(iter_items())
+        logger.debug(f"Indexed {len(items)} planner items of {key}")
+        index = {
+            "expires_at": time.monotonic() + PlannerNameResolver.ttl,
+            "items": items,
+            "names": [name_of(item) or "" for item in items],
+            "by_name": {},
+            "by_lower_name": {},
+            "by_substring": {},
+        }
+        for item, name in zip(items, index["names"]):
+            index["by_name"].setdefault(name, item)
+            index["by_lower_name"].setdefault(name.lower(), item)
+        with PlannerNameResolver._lock:
+            # A failed read raises before getting here, an empty index may be a plan not set up yet and an index read
+            # while a plan or bucket was created or deleted may miss the change, so neither is kept
+            if items and generation == PlannerNameResolver._generation:
+                indexes[key] = index
+        return index
+
+    @staticmethod
+    def _lookup(index: dict, name: str, exact: bool):
+        """Look up the item with the name, or else ignoring case, or else when not exact the first one containing it"""
+        item = index["by_name"].get(name)
+        if item is None:
+            item = index["by_lower_name"].get(name.lower())
+        if item is not None or exact:
+            return item
+        lower_name = name.lower()
+        if lower_name not in index["by_substring"]:
+            index["by_substring"][lower_name] = next(
+                (item for item, item_name in zip(index["items"], index["names"]) if lower_name in item_name.lower()),
+                None,
+            )
+        return index["by_substring"][lower_name]
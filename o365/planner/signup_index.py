@@ -0,0 +1,92 @@
+from datetime import date, datetime
+from loguru import logger
+
+
+class SignupIndex:
+    """This class indexes the signup tasks of the 'Functionary Role' bucket by meeting date and role
+
+    The tasks are read once and grouped in one pass, so the functionary roles and absentees of any meeting date are
+    then looked up without reading the plan again. Meeting dates can be dates, datetimes or YYYYMMDD strings.
+    """
+
+    functionary_roles: list = [
+        "Joke Master",
+        "Toastmaster",
+        "General Evaluator",
+        "Speaker 1",
+        "Speaker 2",
+        "Speaker 3",
+        "Manual Evaluator 1",
+        "Manual Evaluator 2",
+        "Manual Evaluator 3",
+        "Ah Counter",
+        "Grammarian",
+        "Timer",
+        "Ballot Counter",
+        "WOW",
+        "GEM",
+    ]
+    # Roles signed up for by more than one member, filled in the order of the signups
+    numbered_roles: list = ["Speaker", "Manual Evaluator"]
+    _functionary_signups_by_date: dict
+    _absentee_signups_by_date: dict
+
+    def __init__(self, signup_tasks: list) -> None:
+        """initialize the index from the signup tasks"""
+        self._functionary_signups_by_date = {}
+        self._absentee_signups_by_date = {}
+        for signup_task in signup_tasks:
+            if signup_task.due_date_time is None:
+                continue
+            meeting_date = self.date_key(signup_task.due_date_time)
+            if signup_task.title == "Absent":
+                self._absentee_signups_by_date.setdefault(meeting_date, []).append(signup_task)
+                continue
+            if signup_task.percent_complete >= 100 or signup_task.due_date_time.date() < date.today():
+                continue
+            functionary_signups = self._functionary_signups_by_date.setdefault(
+                meeting_date, dict.fromkeys(self.functionary_roles)
+            )
+            self._add_functionary_signup(functionary_signups, signup_task)
+        logger.debug(
+            f"Indexed the signups for {len(self._functionary_signups_by_date)} meeting dates and the absentees for "
+            f"{len(self._absentee_signups_by_date)} meeting dates"
+        )
+
+    @staticmethod
+    def date_key(meeting_date) -> str:
+        """Get the YYYYMMDD key of the meeting date"""
+        if isinstance(meeting_date, (date, datetime)):
+            return meeting_date.strftime("%Y%m%d")
+        return str(meeting_date).replace("-", "")[0:8]
+
+    def _add_functionary_signup(self, functionary_signups: dict, signup_task):
+        """Add the signup to the roles of its meeting date, numbered roles take the first one not filled"""
+        logger.debug(
+            f"Found signup task {signup_task.title}, completion {signup_task.percent_complete}%, "
+            f"due {signup_task.due_date_time}"
+        )
+        for numbered_role in self.numbered_roles:
+            if numbered_role in signup_task.title:
+                role_names = [f"{numbered_role} {number}" for number in range(1, 4)]
+                role_name = next((name for name in role_names if functionary_signups[name] is None), None)
+                if role_name is None:
+                    logger.debug(f"All 3 {numbered_role} roles have been filled.")
+                    return
+                functionary_signups[role_name] = signup_task
+                return
+        for role_name in ["GEM", "WOW"]:
+            if role_name in signup_task.title:
+                functionary_signups[role_name] = signup_task
+                return
+        functionary_signups[signup_task.title] = signup_task
+
+    def functionary_signups(self, meeting_date) -> dict:
+        """Get the signup task of each functionary role for the meeting date, None for the roles not signed up for"""
+        return dict(
+            self._functionary_signups_by_date.get(self.date_key(meeting_date)) or dict.fromkeys(self.functionary_roles)
+        )
+
+    def absentee_signups(self, meeting_date) -> list:
+        """Get the absentee signup tasks for the meeting date"""
+        return list(self._absentee_signups_by_date.get(self.date_key(meeting_date), []))
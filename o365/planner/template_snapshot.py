@@ -0,0 +1,85 @@
+import threading
+from loguru import logger
+
+from o365.exception.agenda_exception import AgendaException
+from o365.graph.graph_batch import GraphBatch
+from o365.graph.graph_helper import GraphHelper
+from o365.planner.planner_helper import PlannerHelper
+from o365.util.constants import Constants
+
+
+class TemplateSnapshot:
+    """This class holds the tasks of the weekly meeting template bucket with their details, loaded once per run
+
+    Each task is a dictionary with the id, title, description and references of the template task, in the order the
+    template bucket lists them.
+    """
+
+    template_bucket_name: str = "YYYYMMDD Meeting Roles"
+    plan_id: str
+    tasks: list
+    _tasks_by_id: dict
+    _snapshots: dict = {}
+    _lock = threading.Lock()
+
+    def __init__(self, plan_id: str, tasks: list) -> None:
+        """initialize the template snapshot from the template tasks and their details"""
+        self.plan_id = plan_id
+        self.tasks = tasks
+        self._tasks_by_id = {task["id"]: task for task in tasks}
+
+    @staticmethod
+    def load(graph_client, plan_id: str = Constants.WEEKLY_MEETING_TEMPLATE_PLAN_ID, refresh: bool = False):
+        """Get the snapshot of the template plan, it is only read the first time or when refresh is set"""
+        with TemplateSnapshot._lock:
+            template_snapshot = TemplateSnapshot._snapshots.get(plan_id)
+            if template_snapshot is None or refresh:
+                template_snapshot = TemplateSnapshot._fetch(graph_client, plan_id)
+                if template_snapshot is not None:
+                    TemplateSnapshot._snapshots[plan_id] = template_snapshot
+            return template_snapshot
+
+    # GET https://graph.microsoft.com/v1.0/planner/buckets/{bucket-id}/tasks
+    # POST https://graph.microsoft.com/v1.0/$batch
+    @staticmethod
+    def _fetch(graph_client, plan_id: str):
+        """Read the template bucket tasks, then the details of all of them in one batched pass"""
+        logger.debug(f"Fetching the template tasks and details from plan {plan_id}")
+        template_bucket = PlannerHelper.get_bucket_by_name(graph_client, plan_id, TemplateSnapshot.template_bucket_name)
+        if template_bucket is None:
+            logger.error(f"The template bucket '{TemplateSnapshot.template_bucket_name}' was not found.")
+            return None
+        try:
+            graph_helper: GraphHelper = GraphHelper()
+            template_tasks = list(
+                graph_helper.get_paged_items(
+                    f"planner/buckets/{template_bucket.id}/tasks", {"Content-Type": "application/json"}
+                )
+            )
+            details_batch = GraphBatch()
+            for template_task in template_tasks:
+                details_batch.get(f"planner/tasks/{template_task['id']}/details", request_id=template_task["id"])
+            details_results = graph_helper.batch_request(details_batch)
+        except AgendaException as e:
+            logger.error(f"Error getting the template tasks from bucket {template_bucket.id}. {e}")
+            return None
+        tasks = []
+        for template_task in template_tasks:
+            details_result = details_results.get(template_task["id"])
+            if details_result is None or details_result["status"] != 200:
+                logger.error(f"Error getting the template task details for {template_task['title']}. {details_result}")
+                return None
+            tasks.append(
+                {
+                    "id": template_task["id"],
+                    "title": template_task["title"],
+                    "description": details_result["body"]["description"],
+                    "references": details_result["body"]["references"],
+                }
+            )
+        logger.debug(f"Found {len(tasks)} template tasks in bucket {template_bucket.id}.")
+        return TemplateSnapshot(plan_id, tasks)
+
+    def get_task(self, task_id: str):
+        """Get the template task with the id"""
+        return self._tasks_by_id.get(task_id)
@@ -3,6 +3,7 @@ from o365.auth.auth_helper import AuthHelper
 from o365.exception.agenda_exception import AgendaException
 from o365.graph.graph_helper import GraphHelper
 from o365.planner.planner_helper import PlannerHelper
+from o365.planner.planner_name_resolver import PlannerNameResolver
 from o365.util.constants import Constants
 
 
@@ -37,5 +38,7 @@ class PlannerCleanup:
                 {},
                 {"If-Match": etag},
             )
+            PlannerNameResolver.invalidate_plans(self._group_id)
+            PlannerNameResolver.invalidate_buckets(plan_id)
         except AgendaException as e:
             logger.error(f"Error deleting plan: {e}")
@@ -1,6 +1,5 @@
-import asyncio
 import datetime
-import time
+import itertools
 from loguru import logger
 
 from msgraph import GraphServiceClient
@@ -22,7 +21,9 @@ from msgraph.generated.teams.item.channels.item.messages.messages_request_builde
 from msgraph.generated.models.identity import Identity
 from kiota_abstractions.api_error import APIError
 
+from o365.graph.graph_pager import GraphPager
 from o365.teams.weekly_meeting_message import WeeklyMeetingMessage
+from o365.util.async_runner import AsyncRunner
 
 
 class TeamsHelper:
@@ -180,91 +181,56 @@ class TeamsHelper:
             logger.error(f"Error posting message: {e.error.message}")
         return None
 
-    @staticmethod
-    # GET /teams/{team-id}/channels/{channel-id}/messages
-    async def list_messages(graph_client, team_id, channel_id):
-        """Get the list of message in a teams channel"""
-        try:
-            logger.debug(f"List last 10 messages in channel {channel_id} for team: {team_id}")
-            query_params = MessagesRequestBuilder.MessagesRequestBuilderGetQueryParameters(top=10)
-
-            request_configuration = MessagesRequestBuilder.MessagesRequestBuilderGetRequestConfiguration(
-                query_parameters=query_params,
-            )
-            messages_list = (
-                await graph_client.teams.by_team_id(team_id)
-                .channels.by_channel_id(channel_id)
-                .messages.get(request_configuration=request_configuration)
-            )
-            return messages_list
-        except APIError as e:
-            logger.error(f"Error getting list of message: {e.error.message}")
-        return None
-
     @staticmethod
     # GET /teams/{team-id}/channels
     def get_teams_channel(graph_client, team_id, channel_name):
         """Get the teams channel"""
-        retry_count = 0
-        channel_item = None
-        while retry_count < 5:
-            try:
-                logger.debug(f"Getting the channel {channel_name} for team: {team_id}")
-                channels = asyncio.run(TeamsHelper.get_channels(graph_client, team_id, channel_name))
-                logger.debug(channels)
-                if channels and channels.value:
-                    if len(channels.value) > 0:
-                        return channels.value[0]
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-            except Exception as ex:
-                logger.error(f"Error getting teams channel {channel_name}. {ex}")
+        try:
+            logger.debug(f"Getting the channel {channel_name} for team: {team_id}")
+            channels = AsyncRunner.run(TeamsHelper.get_channels(graph_client, team_id, channel_name))
+            logger.debug(channels)
+            if channels and channels.value:
+                if len(channels.value) > 0:
+                    return channels.value[0]
+        except Exception as ex:
+            logger.error(f"Error getting teams channel {channel_name}. {ex}")
 
-        return channel_item
+        return None
 
     @staticmethod
     # GET /teams/{team-id}/channels/{channel-id}/messages
     def post_message_to_channel(graph_client, team_id, channel_id, meeting_message: WeeklyMeetingMessage):
         """Post the message to a teams channel"""
-        retry_count = 0
-        message_item = None
-        while retry_count < 5:
-            try:
-                logger.debug(f"Posting message to channel {channel_id} for team: {team_id}")
-                message_response = asyncio.run(
-                    TeamsHelper.post_message(graph_client, team_id, channel_id, meeting_message)
-                )
-                if message_response:
-                    return message_response
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-
-        return message_item
+        logger.debug(f"Posting message to channel {channel_id} for team: {team_id}")
+        return AsyncRunner.run(TeamsHelper.post_message(graph_client, team_id, channel_id, meeting_message))
 
     @staticmethod
     # GET /teams/{team-id}/channels/{channel-id}/messages
-    def find_message_in_channel(graph_client, team_id, channel_id, meeting_message: WeeklyMeetingMessage):
-        """Find the message in a teams channel"""
-        retry_count = 0
-        message_in_channel = None
-        while retry_count < 5:
-            try:
-                logger.debug(f"Finding message in channel {channel_id} for team: {team_id}")
-                messages_list = asyncio.run(TeamsHelper.list_messages(graph_client, team_id, channel_id))
-                if messages_list and messages_list.value:
-                    for message in messages_list.value:
-                        if meeting_message.subject == message.subject:
-                            return message
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
+    def iter_messages(graph_client, team_id, channel_id, top: int = 10, quiet_first_page: bool = False):
+        """Iterates the messages in a teams channel newest first, reading pages of top messages as they are needed"""
+        logger.debug(f"Iterating the messages in channel {channel_id} for team: {team_id}")
+        query_params = MessagesRequestBuilder.MessagesRequestBuilderGetQueryParameters(top=top)
+        request_configuration = MessagesRequestBuilder.MessagesRequestBuilderGetRequestConfiguration(
+            query_parameters=query_params,
+        )
+        return GraphPager.iter_items(
+            graph_client.teams.by_team_id(team_id).channels.by_channel_id(channel_id).messages,
+            request_configuration,
+            quiet_first_page,
+        )
 
-        return message_in_channel
+    @staticmethod
+    # GET /teams/{team-id}/channels/{channel-id}/messages
+    def find_message_in_channel(
+        graph_client, team_id, channel_id, meeting_message: WeeklyMeetingMessage, max_messages: int = 10
+    ):
+        """Find the message in the last max_messages messages of a teams channel"""
+        logger.debug(f"Finding message in channel {channel_id} for team: {team_id}")
+        # A channel whose messages cannot be read has no message to update, so a new one is posted
+        messages = TeamsHelper.iter_messages(
+            graph_client, team_id, channel_id, top=min(max_messages, 50), quiet_first_page=True
+        )
+        for message in itertools.islice(messages, max_messages):
+            if meeting_message.subject == message.subject:
+                return message
+        return None
@@ -0,0 +1,224 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from loguru import logger
+
+from o365.exception.agenda_exception import AgendaException
+from o365.graph.graph_helper import GraphHelper
+from o365.util.constants import Constants
+
+
+class MemberDirectory:
+    """This class resolves users from a directory of the members of a group, read once per run
+
+    The members of a group are read in one paged call and indexed by id, by normalized display name and by name
+    prefix. The directory can be kept in a snapshot file for a time to live, so runs within it read no members at all.
+    Users that are not members of the group are read by id and kept in a size bounded LRU cache.
+    """
+
+    ttl: float = Constants.MEMBER_DIRECTORY_TTL
+    # Seconds a failed or empty read of the members is kept, so lookups during an outage do not each read them again
+    failed_read_ttl: float = 60
+    snapshot_path: str = Constants.MEMBER_DIRECTORY_PATH
+    max_users: int = Constants.USER_CACHE_MAX_ENTRIES
+    _directories: dict = {}
+    _users: OrderedDict = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def normalize_name(display_name: str) -> str:
+        """Normalize the display name for lookups, ignoring case and repeated whitespace"""
+        return " ".join(str(display_name or "").split()).casefold()
+
+    @staticmethod
+    def members(group_id: str) -> list:
+        """Get the members of the group, each with its id, displayName and mail"""
+        return list(MemberDirectory._directory(group_id)["members"])
+
+    # GET https://graph.microsoft.com/v1.0/users/{id}?$select=id,displayName,mail
+    @staticmethod
+    def get_user(group_id: str, user_id: str):
+        """Get the user with the id from the members of the group, or else read it once and keep it"""
+        if user_id is None:
+            return None
+        member = MemberDirectory._directory(group_id)["by_id"].get(user_id)
+        if member is not None:
+            return member
+        user = MemberDirectory.cached_user(user_id)
+        if user is not None:
+            return user
+        try:
+            logger.debug(f"Getting the user {user_id} that is not a member of group {group_id}")
+            user = GraphHelper().get_request(
+                f"users/{user_id}?$select=id,displayName,mail", {"Content-Type": "application/json"}
+            )
+        except AgendaException as e:
+            logger.error(f"Error getting user {user_id}. {e}")
+            return None
+        MemberDirectory.put_user(user)
+        return user
+
+    @staticmethod
+    def cached_user(user_id: str):
+        """Get the user with the id kept in the LRU cache, or None when it was not read before"""
+        with MemberDirectory._lock:
+            user = MemberDirectory._users.get(user_id)
+            if user is not None:
+                MemberDirectory._users.move_to_end(user_id)
+            return user
+
+    @staticmethod
+    def put_user(user: dict):
+        """Keep the user read outside the directory in the LRU cache"""
+        with MemberDirectory._lock:
+            MemberDirectory._users[user["id"]] = user
+            MemberDirectory._users.move_to_end(user["id"])
+            while len(MemberDirectory._users) > MemberDirectory.max_users:
+                MemberDirectory._users.popitem(last=False)
+
+    @staticmethod
+    def get_member_by_display_name(group_id: str, display_name: str):
+        """Get the member of the group with the display name, ignoring case and repeated whitespace"""
+        return MemberDirectory._directory(group_id)["by_name"].get(MemberDirectory.normalize_name(display_name))
+
+    @staticmethod
+    def find_members_by_display_name(group_id: str, display_name: str) -> list:
+        """Find the members of the group by display name, the member with the exact name or else all the members with
+        a name starting with it, in name order
+
+        More than one member means the name is ambiguous and it is left to the caller to decide, none that no member
+        has a name starting with it.
+        """
+        directory = MemberDirectory._directory(group_id)
+        name = MemberDirectory.normalize_name(display_name)
+        if not name:
+            return []
+        member = directory["by_name"].get(name)
+        if member is not None:
+            return [member]
+        sorted_names = directory["sorted_names"]
+        members = []
+        index = bisect.bisect_left(sorted_names, name)
+        while index < len(sorted_names) and sorted_names[index].startswith(name):
+            members.append(directory["sorted_members"][index])
+            index += 1
+        return members
+
+    @staticmethod
+    def invalidate(group_id: str = None):
+        """Read the members of the group, or of all the groups, again on the next lookup"""
+        with MemberDirectory._lock:
+            if group_id is None:
+                MemberDirectory._directories.clear()
+                MemberDirectory._users.clear()
+            else:
+                MemberDirectory._directories.pop(group_id, None)
+
+    @staticmethod
+    def _directory(group_id: str) -> dict:
+        """Get the directory of the group, from memory, else from its snapshot, else reading the members"""
+        with MemberDirectory._lock:
+            directory = MemberDirectory._directories.get(group_id)
+            if directory is not None and directory["expires_at"] > time.time():
+                return directory
+        snapshot = MemberDirectory._read_snapshot(group_id)
+        if snapshot is not None:
+            directory = MemberDirectory._index(snapshot["members"], snapshot["fetched_at"])
+        else:
+            members = MemberDirectory._fetch_members(group_id)
+            directory = MemberDirectory._index(members or [], time.time())
+            if members:
+                MemberDirectory._write_snapshot(group_id, directory)
+            else:
+                # A failed read is only kept for a short time and not written to the snapshot
+                directory["expires_at"] = time.time() + MemberDirectory.failed_read_ttl
+        with MemberDirectory._lock:
+            MemberDirectory._directories[group_id] = directory
+        return directory
+
+    # GET https://graph.microsoft.com/v1.0/groups/{id}/members?$select=id,displayName,mail
+    @staticmethod
+    def _fetch_members(group_id: str):
+        """Read the members of the group"""
+        try:
+            logger.debug(f"Getting the members of group {group_id}")
+            graph_helper: GraphHelper = GraphHelper()
+            members = [
+                {"id": member["id"], "displayName": member.get("displayName"), "mail": member.get("mail")}
+                for member in graph_helper.get_paged_items(
+                    f"groups/{group_id}/members?$select=id,displayName,mail",
+                    {"Content-Type": "application/json"},
+                    top=999,
+                )
+            ]
+            logger.debug(f"Found {len(members)} members in group {group_id}")
+            return members
+        except AgendaException as e:
+            logger.error(f"Error getting the members of group {group_id}. {e}")
+        return None
+
+    @staticmethod
+    def _index(members: list, fetched_at: float) -> dict:
+        """Index the members by id, by normalized display name and in name order"""
+        directory = {
+            "fetched_at": fetched_at,
+            "expires_at": fetched_at + MemberDirectory.ttl,
+            "members": members,
+            "by_id": {},
+            "by_name": {},
+        }
+        for member in members:
+            directory["by_id"][member["id"]] = member
+            directory["by_name"].setdefault(MemberDirectory.normalize_name(member["displayName"]), member)
+        # The names in order, with the members in the same order, for prefix lookups by bisection
+        sorted_members = sorted(
+            members, key=lambda member: (MemberDirectory.normalize_name(member["displayName"]), member["id"])
+        )
+        directory["sorted_names"] = [MemberDirectory.normalize_name(member["displayName"]) for member in sorted_members]
+        directory["sorted_members"] = sorted_members
+        return directory
+
+    @staticmethod
+    def _read_snapshot(group_id: str):
+        """Read the members of the group from the snapshot file, if it has them within their time to live"""
+        if MemberDirectory.snapshot_path is None:
+            return None
+        snapshot_path = os.path.expanduser(MemberDirectory.snapshot_path)
+        if not os.path.exists(snapshot_path):
+            return None
+        try:
+            with open(snapshot_path, "r", encoding="utf-8") as snapshot_file:
+                snapshot = json.load(snapshot_file).get(group_id)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring the member directory snapshot {snapshot_path}. {e}")
+            return None
+        if snapshot is None or snapshot["fetched_at"] + MemberDirectory.ttl <= time.time():
+            return None
+        logger.debug(f"Read {len(snapshot['members'])} members of group {group_id} from the snapshot")
+        return snapshot
+
+    @staticmethod
+    def _write_snapshot(group_id: str, directory: dict):
+        """Write the members of the group to the snapshot file, readable only by the current user"""
+        if MemberDirectory.snapshot_path is None:
+            return
+        snapshot_path = os.path.expanduser(MemberDirectory.snapshot_path)
+        try:
+            snapshots = {}
+            if os.path.exists(snapshot_path):
+                with open(snapshot_path, "r", encoding="utf-8") as snapshot_file:
+                    snapshots = json.load(snapshot_file)
+        except (OSError, ValueError):
+            snapshots = {}
+        snapshots[group_id] = {"fetched_at": directory["fetched_at"], "members": directory["members"]}
+        try:
+            file_descriptor = os.open(snapshot_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            # The mode only applies when the file is created, so also restrict an existing file before writing to it
+            os.fchmod(file_descriptor, 0o600)
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as snapshot_file:
+                json.dump(snapshots, snapshot_file)
+        except OSError as e:
+            logger.warning(f"Could not write the member directory snapshot {snapshot_path}. {e}")
@@ -1,25 +1,80 @@
 import asyncio
-import time
 from loguru import logger
 from msgraph import GraphServiceClient
 from kiota_abstractions.api_error import APIError
+from msgraph.generated.models.user import User
 from msgraph.generated.users.users_request_builder import UsersRequestBuilder
+from o365.util.async_runner import AsyncRunner
+from o365.util.single_flight import SingleFlight
 
 
 class UserHelper:
     """This is a helper for Office 365 users"""
 
+    # Values the graph api allows in the 'in' operator of a $filter
+    filter_in_max_values: int = 15
+    _single_flight: SingleFlight = SingleFlight()
+
     @staticmethod
     # GET /users/{id | userPrincipalName}
     async def get_user(graph_client: GraphServiceClient, user_id: str):
-        """Gets the user"""
+        """Gets the user, awaiting a request for the same user already in flight instead of sending it again"""
         try:
             logger.debug(f"Getting the user for id {user_id}")
-            user = await graph_client.users.by_user_id(user_id).get()
+            user = await UserHelper._single_flight.call_async(user_id, graph_client.users.by_user_id(user_id).get)
             return user
         except APIError as e:
             logger.error(f"Error getting user: {e.error.message}")
 
+    @staticmethod
+    # GET /users?$filter=id in ('{id}', ...)&$select=id,displayName,mail
+    async def get_users(graph_client: GraphServiceClient, user_ids) -> dict:
+        """Gets the users with the ids keyed by id, reading up to 15 of them per request and the requests concurrently
+
+        Ids that are repeated are read once and ids of users that were not found are left out.
+        """
+        user_ids = list(dict.fromkeys(user_id for user_id in user_ids if user_id is not None))
+        chunks = [
+            user_ids[index : index + UserHelper.filter_in_max_values]
+            for index in range(0, len(user_ids), UserHelper.filter_in_max_values)
+        ]
+
+        async def get_chunk(chunk: list) -> list:
+            try:
+                logger.debug(f"Getting the users for ids {chunk}")
+                quoted_user_ids = [f"'{user_id}'" for user_id in chunk]
+                query_params = UsersRequestBuilder.UsersRequestBuilderGetQueryParameters(
+                    select=["id", "displayName", "mail"],
+                    filter=f"id in ({', '.join(quoted_user_ids)})",
+                    top=len(chunk),
+                )
+                request_configuration = UsersRequestBuilder.UsersRequestBuilderGetRequestConfiguration(
+                    query_parameters=query_params,
+                )
+                users = await graph_client.users.get(request_configuration=request_configuration)
+                return (users.value or []) if users is not None else []
+            except APIError as e:
+                logger.error(f"Error getting users {chunk}: {e.error.message}")
+            return []
+
+        users = {}
+        for chunk_users in await asyncio.gather(*[get_chunk(chunk) for chunk in chunks]):
+            users.update({user.id: user for user in chunk_users})
+        logger.debug(f"Found {len(users)} of {len(user_ids)} users")
+        return users
+
+    @staticmethod
+    def user_to_dict(user) -> dict:
+        """Gets the user model as a dict with id, displayName and mail"""
+        return {"id": user.id, "displayName": user.display_name, "mail": user.mail}
+
+    @staticmethod
+    def user_from_dict(user: dict):
+        """Gets the user model for the user read as a dict with id, displayName and mail"""
+        if user is None:
+            return None
+        return User(id=user["id"], display_name=user.get("displayName"), mail=user.get("mail"))
+
     @staticmethod
     # GET /users?$filter=startswith(displayName,'a')&$orderby=displayName&$count=true&$top=1
     async def get_user_by_display_name(graph_client: GraphServiceClient, display_name: str):
@@ -46,26 +101,12 @@ class UserHelper:
     @staticmethod
     def get_assigned_to_user_by_display_name(graph_client, display_name):
         """Gets assigned to user by display name"""
-        retry_count = 0
-        assigned_to_user = None
-        while retry_count < 5:
-            try:
-                logger.debug(f"Getting the assigned to user with display name : {display_name}")
-                user = asyncio.run(UserHelper.get_user_by_display_name(graph_client, display_name))
-                if user is not None:
-                    logger.debug(user)
-                    return user
-
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-                    else:
-                        logger.error(f"Unexpected runtime error getting user by display name {display_name}. {e}")
-                        break  # do something here, like log the error
-            except Exception as ex:
-                logger.error(f"Unexpected exception getting user by display name {display_name}. {ex}")
-                break  # do something here, like log the error
-
-        return assigned_to_user
+        try:
+            logger.debug(f"Getting the assigned to user with display name : {display_name}")
+            user = AsyncRunner.run(UserHelper.get_user_by_display_name(graph_client, display_name))
+            if user is not None:
+                logger.debug(user)
+                return user
+        except Exception as ex:
+            logger.error(f"Unexpected exception getting user by display name {display_name}. {ex}")
+        return None
@@ -0,0 +1,62 @@
+import asyncio
+import atexit
+import threading
+from loguru import logger
+
+
+class AsyncRunner:
+    """This class runs coroutines for the synchronous helpers on one long-lived event loop
+
+    The msgraph sdk http client is bound to the event loop it was first used on, so every coroutine is submitted to
+    the same loop running in a background thread instead of creating and closing a new loop per call.
+    """
+
+    _loop: asyncio.AbstractEventLoop = None
+    _thread: threading.Thread = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def loop() -> asyncio.AbstractEventLoop:
+        """Get the shared event loop, starting the background thread that runs it on first use"""
+        if AsyncRunner._loop is None:
+            with AsyncRunner._lock:
+                if AsyncRunner._loop is None:
+                    loop = asyncio.new_event_loop()
+                    thread = threading.Thread(target=loop.run_forever, name="async-runner", daemon=True)
+                    thread.start()
+                    AsyncRunner._thread = thread
+                    AsyncRunner._loop = loop
+                    logger.debug("Started the shared event loop")
+        return AsyncRunner._loop
+
+    @staticmethod
+    def started_loop():
+        """Get the shared event loop if it was started, without starting it"""
+        return AsyncRunner._loop
+
+    @staticmethod
+    def run(coroutine, timeout: float = None):
+        """Run the coroutine on the shared event loop and wait for its result"""
+        loop = AsyncRunner.loop()
+        if threading.current_thread() is AsyncRunner._thread:
+            coroutine.close()
+            raise RuntimeError("AsyncRunner.run cannot be called from a coroutine running on the shared event loop")
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result(timeout)
+
+    @staticmethod
+    def shutdown():
+        """Stop the shared event loop and its background thread"""
+        with AsyncRunner._lock:
+            loop = AsyncRunner._loop
+            if loop is None:
+                return
+            loop.call_soon_threadsafe(loop.stop)
+            AsyncRunner._thread.join(timeout=5)
+            if not loop.is_running():
+                loop.close()
+            AsyncRunner._loop = None
+            AsyncRunner._thread = None
+            logger.debug("Stopped the shared event loop")
+
+
+atexit.register(AsyncRunner.shutdown)
@@ -1,3 +1,6 @@
+import os
+
+
 class Constants:
     """This class is used to store the project constants"""
 
@@ -10,3 +13,38 @@ class Constants:
     WEEKLY_MEETING_TEMPLATE_PLAN_ID = "mixhP6cY2UuVA52v9NFuVGUACpcr"
 
     TEAMS_MSG_MAX_PAYLOAD_SIZE = 16 * 1024  # 16kb payload limit
+
+    # Connection pool limits for the shared graph http client
+    GRAPH_HTTP_MAX_CONNECTIONS = int(os.environ.get("GRAPH_HTTP_MAX_CONNECTIONS", "20"))
+    GRAPH_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("GRAPH_HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    GRAPH_HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("GRAPH_HTTP_KEEPALIVE_EXPIRY", "60"))
+    # Maximum concurrent requests in flight through the async graph http client
+    GRAPH_HTTP_MAX_CONCURRENCY = int(os.environ.get("GRAPH_HTTP_MAX_CONCURRENCY", "8"))
+    # Retries of throttled (429) and unavailable (503, 504) graph api requests and transient network errors
+    GRAPH_RETRY_MAX_ATTEMPTS = int(os.environ.get("GRAPH_RETRY_MAX_ATTEMPTS", "5"))
+    GRAPH_RETRY_BASE_DELAY = float(os.environ.get("GRAPH_RETRY_BASE_DELAY", "1"))
+    GRAPH_RETRY_MAX_DELAY = float(os.environ.get("GRAPH_RETRY_MAX_DELAY", "60"))
+    GRAPH_RETRY_DEADLINE = float(os.environ.get("GRAPH_RETRY_DEADLINE", "300"))
+    # Maximum graph api GET responses kept by the opt-in conditional GET cache
+    GRAPH_CACHE_MAX_ENTRIES = int(os.environ.get("GRAPH_CACHE_MAX_ENTRIES", "256"))
+    # Requests per second, and burst, sent through the graph helper by all threads together, 0 to not limit them
+    GRAPH_RATE_LIMIT = float(os.environ.get("GRAPH_RATE_LIMIT", "20"))
+    GRAPH_RATE_LIMIT_BURST = float(os.environ.get("GRAPH_RATE_LIMIT_BURST", "40"))
+    # Concurrent $batch envelopes sent while creating and updating the weekly meeting plan
+    PLANNER_MAX_WORKERS = int(os.environ.get("PLANNER_MAX_WORKERS", "4"))
+    # Seconds the plans of a group and the buckets of a plan are resolved by name without reading them again
+    PLANNER_NAME_CACHE_TTL = float(os.environ.get("PLANNER_NAME_CACHE_TTL", "300"))
+    # Journal of the planner operations to resume an interrupted plan creation from, not kept when unset
+    PLANNER_JOURNAL_PATH = os.environ.get("PLANNER_JOURNAL_PATH")
+    # Seconds a journaled plan creation can be resumed within, older runs read the plan again
+    PLANNER_JOURNAL_MAX_AGE = float(os.environ.get("PLANNER_JOURNAL_MAX_AGE", "3600"))
+    # Seconds the members of a group are resolved from the member directory without reading them again
+    MEMBER_DIRECTORY_TTL = float(os.environ.get("MEMBER_DIRECTORY_TTL", "86400"))
+    # Snapshot file of the member directory shared by runs within its time to live, not kept when unset
+    MEMBER_DIRECTORY_PATH = os.environ.get("MEMBER_DIRECTORY_PATH")
+    # Maximum users that are not group members kept by the member directory
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", "256"))
+    # Seconds drive items are resolved by path without reading them again
+    DRIVE_ITEM_CACHE_TTL = float(os.environ.get("DRIVE_ITEM_CACHE_TTL", "300"))
+    # Seconds to wait for a created or copied drive item to appear before searching for it
+    DRIVE_ITEM_WAIT_DEADLINE = float(os.environ.get("DRIVE_ITEM_WAIT_DEADLINE", "900"))
@@ -0,0 +1,47 @@
+import threading
+import time
+from loguru import logger
+
+from o365.util.constants import Constants
+
+
+class RateLimiter:
+    """This class is a token bucket that paces requests shared by all the threads sending them
+
+    Tokens are added at the rate per second up to the burst, each request takes a token and waits for one when
+    the bucket is empty. A rate of 0 or less does not limit the requests.
+    """
+
+    rate: float
+    burst: float
+    _tokens: float
+    _updated_at: float
+    _lock: threading.Lock
+
+    def __init__(
+        self, rate: float = Constants.GRAPH_RATE_LIMIT, burst: float = Constants.GRAPH_RATE_LIMIT_BURST
+    ) -> None:
+        """initialize the rate limiter with a full bucket"""
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1):
+        """Take the tokens, waiting until the bucket has them, more than the burst are taken a burst at a time"""
+        if self.rate <= 0:
+            return
+        while tokens > 0:
+            taken = min(tokens, self.burst)
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                # Take the tokens now, going into debt, so threads waiting behind this one wait their turn
+                self._tokens -= taken
+                wait = -self._tokens / self.rate if self._tokens < 0 else 0
+            if wait > 0:
+                logger.debug(f"Waiting {wait:.2f}s for the rate limit")
+                time.sleep(wait)
+            tokens -= taken
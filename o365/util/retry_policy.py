@@ -0,0 +1,172 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+import httpx
+from loguru import logger
+from kiota_abstractions.api_error import APIError
+
+from o365.util.constants import Constants
+
+
+class RetryPolicy:
+    """This class retries throttled and transient failures with jittered exponential backoff
+
+    Responses and errors with a 429, 503 or 504 status and transient network errors are retried, waiting for the
+    Retry-After the graph api asked for when it was provided. The Retry-After is waited in full, as retrying any sooner
+    only fails again, the max delay only bounds the backoff. The operation gives up once the attempts are used up or
+    the next wait would pass the deadline, returning the last response or raising the last error.
+
+    A request that is not idempotent, such as a POST creating an item, may have been processed when it failed with
+    a 503, a 504 or a timeout, so it is only retried when it was throttled (429) or could not connect.
+    """
+
+    RETRYABLE_STATUS_CODES = (429, 503, 504)
+    IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+    max_attempts: int
+    base_delay: float
+    max_delay: float
+    deadline: float
+    retry_if = None
+    idempotent: bool
+
+    def __init__(
+        self,
+        max_attempts: int = Constants.GRAPH_RETRY_MAX_ATTEMPTS,
+        base_delay: float = Constants.GRAPH_RETRY_BASE_DELAY,
+        max_delay: float = Constants.GRAPH_RETRY_MAX_DELAY,
+        deadline: float = Constants.GRAPH_RETRY_DEADLINE,
+        retry_if=None,
+        idempotent: bool = True,
+    ) -> None:
+        """initialize the retry policy, retry_if is an optional predicate for other errors that should be retried
+
+        Without idempotent only throttled requests and requests that could not connect are retried.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retry_if = retry_if
+        self.idempotent = idempotent
+
+    @staticmethod
+    def is_idempotent_request(method: str, headers) -> bool:
+        """Return if sending the request again has the same effect as sending it once, a PATCH only with If-Match"""
+        method = method.upper()
+        if method in RetryPolicy.IDEMPOTENT_METHODS:
+            return True
+        return method == "PATCH" and "if-match" in {str(name).lower() for name in (headers or {})}
+
+    def for_request(self, method: str, headers, idempotent: bool = None):
+        """Get the retry policy for the request, this policy or else a copy retrying only what is safe to send again"""
+        if idempotent is None:
+            idempotent = self.is_idempotent_request(method, headers)
+        if idempotent or not self.idempotent:
+            return self
+        return RetryPolicy(self.max_attempts, self.base_delay, self.max_delay, self.deadline, idempotent=False)
+
+    @staticmethod
+    def status_code(outcome):
+        """Get the http status code of the response, $batch sub-response or error, if it has one"""
+        if isinstance(outcome, dict):
+            return int(outcome["status"])
+        if isinstance(outcome, httpx.Response):
+            return outcome.status_code
+        if isinstance(outcome, httpx.HTTPStatusError):
+            return outcome.response.status_code
+        if isinstance(outcome, APIError):
+            return outcome.response_status_code
+        return None
+
+    @staticmethod
+    def retry_after(outcome):
+        """Get the seconds to wait from the Retry-After header of the response, $batch sub-response or error"""
+        headers = None
+        if isinstance(outcome, dict):
+            headers = httpx.Headers(outcome.get("headers") or {})
+        elif isinstance(outcome, httpx.Response):
+            headers = outcome.headers
+        elif isinstance(outcome, httpx.HTTPStatusError):
+            headers = outcome.response.headers
+        elif isinstance(outcome, APIError) and outcome.response_headers:
+            headers = httpx.Headers(outcome.response_headers)
+        if headers is None or headers.get("Retry-After") is None:
+            return None
+        retry_after = headers.get("Retry-After").strip()
+        if retry_after.isdigit():
+            return float(retry_after)
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def is_retryable(self, outcome) -> bool:
+        """Return if the response or error is a throttling or transient failure that should be retried"""
+        if not self.idempotent:
+            # The request may have reached the graph api unless it was throttled or never connected
+            return self.status_code(outcome) == 429 or isinstance(outcome, (httpx.ConnectError, httpx.ConnectTimeout))
+        if self.status_code(outcome) in self.RETRYABLE_STATUS_CODES:
+            return True
+        if isinstance(outcome, httpx.TransportError):
+            return True
+        return isinstance(outcome, Exception) and self.retry_if is not None and self.retry_if(outcome)
+
+    def delay(self, attempt: int, outcome=None) -> float:
+        """Get the seconds to wait before the next attempt, the full Retry-After or jittered exponential backoff"""
+        retry_after = self.retry_after(outcome)
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def _next_delay(self, attempt: int, started: float, outcome):
+        """Get the wait before the next attempt, or None when the attempts or the deadline are used up"""
+        if not self.is_retryable(outcome) or attempt + 1 >= self.max_attempts:
+            return None
+        delay = self.delay(attempt, outcome)
+        if time.monotonic() - started + delay > self.deadline:
+            logger.warning(f"Giving up retrying as waiting {delay:.1f}s would pass the {self.deadline}s deadline")
+            return None
+        logger.warning(f"Retrying after {delay:.1f}s, attempt {attempt + 1} of {self.max_attempts} failed: {outcome}")
+        return delay
+
+    def execute(self, operation, *args, **kwargs):
+        """Call the operation, retrying throttled and transient failures"""
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                outcome = operation(*args, **kwargs)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                delay = self._next_delay(attempt, started, e)
+                if delay is None:
+                    raise
+            else:
+                delay = self._next_delay(attempt, started, outcome)
+                if delay is None:
+                    return outcome
+                if isinstance(outcome, httpx.Response):
+                    outcome.close()
+            time.sleep(delay)
+            attempt += 1
+
+    async def execute_async(self, operation, *args, **kwargs):
+        """Await the operation, retrying throttled and transient failures"""
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                outcome = await operation(*args, **kwargs)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                delay = self._next_delay(attempt, started, e)
+                if delay is None:
+                    raise
+            else:
+                delay = self._next_delay(attempt, started, outcome)
+                if delay is None:
+                    return outcome
+                if isinstance(outcome, httpx.Response):
+                    await outcome.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
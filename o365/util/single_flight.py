@@ -0,0 +1,85 @@
+import asyncio
+import copy
+import threading
+from loguru import logger
+
+
+class SingleFlight:
+    """This class collapses identical calls made while one is already in flight into that one call
+
+    The first caller for a key makes the call, callers with the same key that arrive before it completes wait for
+    it and get a copy of its result, or its error. Nothing is kept once the call completes.
+    """
+
+    _calls: dict
+    _async_calls: dict
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        """initialize the single flight"""
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+
+    def call(self, key, function, *args, **kwargs):
+        """Call the function, or wait for the call with the same key that is in flight in another thread"""
+        with self._lock:
+            in_flight = self._calls.get(key)
+            if in_flight is None:
+                in_flight = {"done": threading.Event(), "waiters": 0, "result": None, "error": None}
+                self._calls[key] = in_flight
+                leader = True
+            else:
+                in_flight["waiters"] += 1
+                leader = False
+        if not leader:
+            logger.debug(f"Waiting for the call in flight for {key}")
+            in_flight["done"].wait()
+            if in_flight["error"] is not None:
+                raise in_flight["error"]
+            return copy.deepcopy(in_flight["result"])
+        try:
+            result = function(*args, **kwargs)
+            self._complete(key, in_flight, result)
+            return result
+        except Exception as e:
+            in_flight["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            in_flight["done"].set()
+
+    def _complete(self, key, in_flight: dict, result):
+        """Stop sharing the call and keep a copy of its result for the waiters, so the caller can change the result"""
+        with self._lock:
+            self._calls.pop(key, None)
+            if in_flight["waiters"] > 0:
+                in_flight["result"] = copy.deepcopy(result)
+
+    async def call_async(self, key, coroutine_function, *args, **kwargs):
+        """Await the coroutine function, or the call with the same key that is in flight on the running event loop"""
+        loop = asyncio.get_running_loop()
+        # Futures belong to the loop they were created on, so calls are only shared within a loop
+        loop_key = (id(loop), key)
+        in_flight = self._async_calls.get(loop_key)
+        if in_flight is not None:
+            logger.debug(f"Awaiting the call in flight for {key}")
+            in_flight["waiters"] += 1
+            return copy.deepcopy(await asyncio.shield(in_flight["future"]))
+        in_flight = {"future": loop.create_future(), "waiters": 0}
+        self._async_calls[loop_key] = in_flight
+        try:
+            result = await coroutine_function(*args, **kwargs)
+            in_flight["future"].set_result(copy.deepcopy(result) if in_flight["waiters"] > 0 else None)
+            return result
+        except asyncio.CancelledError:
+            in_flight["future"].cancel()
+            raise
+        except Exception as e:
+            in_flight["future"].set_exception(e)
+            # Retrieve the exception so it is not reported as never retrieved when nobody else was waiting
+            in_flight["future"].exception()
+            raise
+        finally:
+            del self._async_calls[loop_key]
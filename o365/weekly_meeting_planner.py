@@ -1,7 +1,5 @@
-import asyncio
 import json
 from datetime import date, datetime
-import time
 from loguru import logger
 from msgraph.generated.models.planner_task import PlannerTask
 from msgraph.generated.models.planner_assignments import PlannerAssignments
@@ -10,10 +8,18 @@ from msgraph.generated.models.planner_preview_type import PlannerPreviewType
 from msgraph.generated.models.planner_external_references import PlannerExternalReferences
 from o365.auth.auth_helper import AuthHelper
 from o365.exception.agenda_exception import AgendaException
+from o365.exception.planner_exception import PlannerException
+from o365.planner.operation_journal import OperationJournal
+from o365.planner.plan_reconciler import PlanReconciler
+from o365.planner.plan_snapshot import PlanSnapshot
 from o365.planner.planner_helper import PlannerHelper
+from o365.planner.signup_index import SignupIndex
+from o365.planner.template_snapshot import TemplateSnapshot
+from o365.user.member_directory import MemberDirectory
 from o365.user.user_helper import UserHelper
 from o365.util.constants import Constants
 from o365.util.date_util import DateUtil
+from o365.graph.graph_batch import GraphBatch
 from o365.graph.graph_helper import GraphHelper
 
 
@@ -26,6 +32,7 @@ class WeeklyMeetingPlanner:
     _next_months_meeting_dates: list
     _next_tuesday: datetime
     _next_tuesday_date: str
+    _signup_index: SignupIndex = None
 
     def __init__(self, next_month_first_day: date = None):
         self._graph_client = AuthHelper.graph_service_client_with_adapter()
@@ -50,127 +57,48 @@ class WeeklyMeetingPlanner:
             return plan
         return PlannerHelper.create_plan_with_name(self._graph_client, self._group_id, plan_name)
 
-    def create_buckets(self, plan_id: str):
-        """Creates the weekly meeting buckets"""
-        logger.info(f"Creating weekly meeting buckets {self._next_months_meeting_dates} in plan {plan_id}")
-        order_hint = " !"
+    def desired_plan_buckets(self, tasks_in_template_bucket: list) -> list:
+        """Get the buckets the weekly meeting plan should have, one per meeting date with the template tasks"""
+        desired_buckets = []
         for next_meeting_date in self._next_months_meeting_dates:
-            bucket_name = next_meeting_date.strftime("%Y%m%d Meeting Roles")
-            bucket = PlannerHelper.get_bucket_by_name(self._graph_client, plan_id, bucket_name)
-            if bucket is not None:
-                logger.info(f"Found bucket with name {bucket_name} and id {bucket.id}")
-                continue
-            PlannerHelper.create_bucket_with_name(self._graph_client, plan_id, bucket_name, order_hint)
-            order_hint += order_hint
-
-    def populate_tasks_in_buckets_from_template(self, plan_id: str):
-        """Populates the tasks in weekly meeting plan buckets from weekly meeting meeting template plan"""
-        logger.info(f"Populating weekly meeting tasks from template in plan {plan_id}")
-        order_hint = " !"
-        template_bucket = PlannerHelper.get_bucket_by_name(
-            self._graph_client, Constants.WEEKLY_MEETING_TEMPLATE_PLAN_ID, "YYYYMMDD Meeting Roles"
-        )
-        tasks_in_template_bucket = []
-        tmp_tasks_in_template_bucket = self._fetch_tasks_in_bucket(template_bucket.id)
-        for tmp_task_in_template_bucket in tmp_tasks_in_template_bucket:
-            tasks_in_template_bucket.append(
-                {"id": tmp_task_in_template_bucket.id, "title": tmp_task_in_template_bucket.title}
+            desired_buckets.append(
+                {
+                    "name": next_meeting_date.strftime("%Y%m%d Meeting Roles"),
+                    "tasks": [
+                        {
+                            "title": task_in_template_bucket["title"],
+                            "due_date_time": next_meeting_date.strftime("%Y-%m-%dT12:00:00Z"),
+                            "details": self._planner_task_details_data(
+                                {}, task_in_template_bucket["description"], task_in_template_bucket["references"]
+                            ),
+                        }
+                        for task_in_template_bucket in tasks_in_template_bucket
+                    ],
+                }
             )
-        buckets_4_plan = PlannerHelper.fetch_all_buckets(self._graph_client, plan_id)
-        bucket_details_4_plan = {}
-        for bucket_4_plan in buckets_4_plan:
-            bucket_details_4_plan.update({bucket_4_plan.id: {"bucket_name": bucket_4_plan.name, "tasks_info": []}})
-        logger.debug(f"Bucket details for plan: {bucket_details_4_plan}")
-        for bucket_id, bucket_details in bucket_details_4_plan.items():
-            if bucket_details["bucket_name"] == "To do":
-                # PlannerHelper.delete_bucket_by_name(self._graph_client, bucket_id, etag)
-                continue
-            tasks_in_bucket_4_plan = self._fetch_tasks_in_bucket(bucket_id)
-            logger.debug(f"Tasks in template bucket: {tasks_in_template_bucket}")
-            template_tasks_index = len(tasks_in_template_bucket) - 1
-            # Preserve order of tasks by looping in reverse with the provided order hint
-            while template_tasks_index >= 0:
-                task_in_template_bucket = tasks_in_template_bucket[template_tasks_index]
-                if tasks_in_bucket_4_plan:
-                    found_task = False
-                    for task_in_bucket_4_plan in tasks_in_bucket_4_plan:
-                        if task_in_bucket_4_plan.title == task_in_template_bucket["title"]:
-                            logger.info(f"Found task with name {task_in_bucket_4_plan.title} in bucket id {bucket_id}")
-                            found_task = True
-                            bucket_details["tasks_info"].append(
-                                {"id": task_in_bucket_4_plan.id, "title": task_in_bucket_4_plan.title}
-                            )
-                            break
-                    if found_task:
-                        template_tasks_index -= 1
-                        continue
-                logger.debug(f"Creating task from template: {task_in_template_bucket}")
-                planner_task = PlannerHelper.get_task_by_name(
-                    self._graph_client, bucket_id, task_in_template_bucket["title"]
-                )
-                if planner_task is None:
-                    new_task = PlannerHelper.create_task_in_bucket(
-                        self._graph_client,
-                        bucket_id,
-                        plan_id,
-                        task_in_template_bucket["title"],
-                        order_hint,
-                    )
-                    bucket_details["tasks_info"].append({"id": new_task.id, "title": new_task.title})
-                template_tasks_index -= 1
-            del tasks_in_bucket_4_plan
-        self.populate_task_details_from_template(plan_id, bucket_details_4_plan, tasks_in_template_bucket)
+        return desired_buckets
 
-    def populate_task_details_from_template(
-        self, plan_id: str, bucket_details_4_plan: dict = None, tasks_in_template_bucket: list = None
-    ):
-        """Populates the task details in weekly meeting plan buckets from weekly meeting meeting template plan"""
-        logger.info(f"Populating weekly meeting task details from template in plan {plan_id}")
-        if tasks_in_template_bucket is None or bucket_details_4_plan is None:
-            logger.info("The template tasks and/or target plan bucket details were not provided.")
-            return
-        logger.debug(f"Tasks in template bucket: {tasks_in_template_bucket}")
-        logger.debug(f"Bucket details for plan: {bucket_details_4_plan}")
-        for bucket_id, bucket_details in bucket_details_4_plan.items():
-            logger.info(f"Updating tasks in bucket name {bucket_details['bucket_name']}")
-            tasks_in_bucket_4_plan = bucket_details["tasks_info"]
-            template_tasks_index = len(tasks_in_template_bucket) - 1
-            # Preserve order of tasks by looping in reverse with the provided order hint
-            while template_tasks_index >= 0:
-                task_in_template_bucket = tasks_in_template_bucket[template_tasks_index]
-                if tasks_in_bucket_4_plan:
-                    for task_in_bucket_4_plan in tasks_in_bucket_4_plan:
-                        if task_in_bucket_4_plan["title"] == task_in_template_bucket["title"]:
-                            due_date_part: str = bucket_details["bucket_name"].split()[0]
-                            if datetime.strptime(due_date_part, "%Y%m%d").date() < date.today():
-                                logger.info(
-                                    f"Skipping task update as due date {due_date_part} has passed for task with\
-                                          name {task_in_bucket_4_plan['title']} in bucket id {bucket_id}"
-                                )
-                            logger.info(
-                                f"Updating task for task with name {task_in_bucket_4_plan['title']}\
-                                      in bucket id {bucket_id}"
-                            )
-                            self._update_planner_task(
-                                task_id=task_in_bucket_4_plan["id"],
-                                due_date_time=f"{due_date_part[0:4]}-"
-                                f"{due_date_part[4:6]}-"
-                                f"{due_date_part[6:8]}T12:00:00Z",
-                            )
-                            logger.info(
-                                f"Updating task details for task with\
-                                      name {task_in_bucket_4_plan['title']} in bucket id {bucket_id}"
-                            )
-                            task_details_in_template = self._fetch_task_details(task_in_template_bucket["id"])
-                            logger.debug(task_in_bucket_4_plan)
-                            self._update_planner_task_details(
-                                task_in_bucket_4_plan["id"],
-                                task_details_in_template.description,
-                                task_details_in_template.references,
-                            )
-                            break
-                template_tasks_index -= 1
-            del tasks_in_bucket_4_plan
+    def reconcile_plan(self, plan_id: str) -> bool:
+        """Creates or updates only the weekly meeting buckets, tasks and task details missing from the plan"""
+        logger.info(f"Reconciling weekly meeting buckets {self._next_months_meeting_dates} in plan {plan_id}")
+        template_snapshot = TemplateSnapshot.load(self._graph_client)
+        if template_snapshot is None:
+            logger.error("The weekly meeting template tasks could not be read.")
+            return False
+        desired_buckets = self.desired_plan_buckets(template_snapshot.tasks)
+        journal = None
+        if Constants.PLANNER_JOURNAL_PATH is not None:
+            journal = OperationJournal(Constants.PLANNER_JOURNAL_PATH)
+            resumed_run = journal.resume(plan_id)
+            if resumed_run is not None:
+                return PlanReconciler(resumed_run["plan_snapshot"], desired_buckets, journal).apply(
+                    resumed_run["operations"]
+                )
+        plan_snapshot = PlanSnapshot.fetch(plan_id)
+        if plan_snapshot is None:
+            logger.error(f"The buckets and tasks in plan {plan_id} could not be read.")
+            return False
+        return PlanReconciler(plan_snapshot, desired_buckets, journal).apply()
 
     def _fill_planner_task_from_dict(self, task: dict):
         """Fills the PlannerTask from provided dictionary"""
@@ -186,6 +114,8 @@ class WeeklyMeetingPlanner:
             planner_task.due_date_time = datetime.strptime(task["dueDateTime"], "%Y-%m-%dT%H:%M:%SZ")
         if task["assignments"] is not None:
             planner_task.assignments = PlannerAssignments(additional_data=task["assignments"])
+        # Keep the etag, like the sdk does, so the task can be updated without reading it again
+        planner_task.additional_data = {"@odata.etag": task.get("@odata.etag")}
         return planner_task
 
     # GET https://graph.microsoft.com/v1.0/planner/buckets/{bucket-id}/tasks
@@ -194,17 +124,15 @@ class WeeklyMeetingPlanner:
         try:
             logger.debug(f"Fetching the planner tasks from bucket {bucket_id}")
             graph_helper: GraphHelper = GraphHelper()
-            tasks = graph_helper.get_request(
+            tasks = graph_helper.get_paged_items(
                 f"planner/buckets/{bucket_id}/tasks",
                 {"Content-Type": "application/json"},
+                use_cache=True,
             )
-            if tasks and tasks["value"] is not None:
-                logger.debug(f"Found {len(tasks['value'])} tasks in bucket {bucket_id}.")
-                planner_tasks = []
-                for task in tasks["value"]:
-                    planner_tasks.append(self._fill_planner_task_from_dict(task))
-                logger.debug(f"Tasks: {planner_tasks}")
-                return planner_tasks
+            planner_tasks = [self._fill_planner_task_from_dict(task) for task in tasks]
+            logger.debug(f"Found {len(planner_tasks)} tasks in bucket {bucket_id}.")
+            logger.debug(f"Tasks: {planner_tasks}")
+            return planner_tasks
         except AgendaException as e:
             logger.error(f"Error getting tasks from bucket { {bucket_id}}. {e}")
         return None
@@ -228,25 +156,6 @@ class WeeklyMeetingPlanner:
             logger.error(f"Error getting task with id { {task_id}}. {e}")
         return None
 
-    # GET https://graph.microsoft.com/v1.0/planner/tasks/{id}
-    def _fetch_task_etag(self, task_id):
-        """Fetches the etag for planner task with specified id"""
-        try:
-            logger.debug(f"Fetching the etag for planner task with id {task_id}")
-            graph_helper: GraphHelper = GraphHelper()
-            task = graph_helper.get_request(
-                f"planner/tasks/{task_id}",
-                {"Content-Type": "application/json"},
-            )
-            if task is not None:
-                logger.debug(f"Found task with id {task_id}.")
-                etag = task["@odata.etag"]
-                logger.debug(f"Task etag: {etag}")
-                return etag
-        except AgendaException as e:
-            logger.error(f"Error getting etag for the task with id { {task_id}}. {e}")
-        return None
-
     # GET https://graph.microsoft.com/v1.0/planner/tasks/{id}/details
     def _fetch_task_details(self, task_id):
         """Fetches the details in a planner task with specified id"""
@@ -256,6 +165,7 @@ class WeeklyMeetingPlanner:
             task_details = graph_helper.get_request(
                 f"planner/tasks/{task_id}/details",
                 {"Content-Type": "application/json"},
+                use_cache=True,
             )
             if task_details is not None:
                 logger.debug(f"Found task details for task {task_id}.")
@@ -263,6 +173,7 @@ class WeeklyMeetingPlanner:
                     description=task_details["description"],
                     preview_type=PlannerPreviewType.NoPreview,
                     references=PlannerExternalReferences(additional_data=task_details["references"]),
+                    additional_data={"@odata.etag": task_details["@odata.etag"]},
                 )
                 logger.debug(f"Task Details: {planner_task_details}")
                 return planner_task_details
@@ -270,25 +181,6 @@ class WeeklyMeetingPlanner:
             logger.error(f"Error getting task details from task { {task_id}}. {e}")
         return None
 
-    # GET https://graph.microsoft.com/v1.0/planner/tasks/{id}/details
-    def _fetch_task_details_etag(self, task_id):
-        """Fetches the etag for planner task detail with specified id"""
-        try:
-            logger.debug(f"Fetching the etag for planner task details with id {task_id}")
-            graph_helper: GraphHelper = GraphHelper()
-            task_details = graph_helper.get_request(
-                f"planner/tasks/{task_id}/details",
-                {"Content-Type": "application/json"},
-            )
-            if task_details is not None:
-                logger.debug(f"Found details of task with id {task_id}.")
-                etag = task_details["@odata.etag"]
-                logger.debug(f"Task details etag: {etag}")
-                return etag
-        except AgendaException as e:
-            logger.error(f"Error getting etag for the task details with id { {task_id}}. {e}")
-        return None
-
     # PATCH https://graph.microsoft.com/v1.0/planner/tasks/{task-id}
     # Content-type: application/json
     # Prefer: return=representation
@@ -308,48 +200,56 @@ class WeeklyMeetingPlanner:
     # }
     def _update_planner_task(
         self,
-        task_id: str,
+        task: PlannerTask,
         due_date_time: str,
         assigned_user_id: str = None,
         percent_complete: int = 0,
         unassign_user: bool = False,
     ):
-        """Update the planner task"""
+        """Update the planner task with the etag of the task held, it is only read again on an etag conflict"""
         try:
-            logger.debug(f"Updating the planner task {task_id}")
-            task = self._fetch_task(task_id)
-            assignments = {}
-            if assigned_user_id is not None:
-                if unassign_user:
-                    assignments = {assigned_user_id: None}
-                else:
-                    assignments = {
-                        assigned_user_id: {"@odata.type": "#microsoft.graph.plannerAssignment", "orderHint": " !"}
-                    }
-            task_data = {
-                "bucketId": task.bucket_id,
-                "title": task.title,
-                "assignments": assignments,
-                "priority": task.priority,
-                "dueDateTime": due_date_time,
-                "percentComplete": percent_complete,
-            }
-            etag = self._fetch_task_etag(task_id)
-            graph_helper: GraphHelper = GraphHelper()
-            data_json = json.dumps(task_data)
-            logger.debug(data_json)
-            task_update_result = graph_helper.patch_request(
-                f"planner/tasks/{task_id}",
-                data_json,
-                {"Content-Type": "application/json", "If-Match": etag},
+            logger.debug(f"Updating the planner task {task.id}")
+            task_data = self._planner_task_data(task, due_date_time, assigned_user_id, percent_complete, unassign_user)
+            etag = (task.additional_data or {}).get("@odata.etag")
+            task_update_result = self._patch_planner_item(
+                f"planner/tasks/{task.id}", task_data, etag, lambda: self._fetch_task(task.id)
             )
             if task_update_result:
                 logger.debug(f"Task update result {task_update_result}")
+                task.additional_data = {"@odata.etag": task_update_result.get("@odata.etag")}
                 return task_update_result
-        except AgendaException as e:
-            logger.error(f"Error updating task {task_id}. {e}")
+        except (AgendaException, PlannerException) as e:
+            logger.error(f"Error updating task {task.id}. {e}")
         return None
 
+    def _patch_planner_item(self, path: str, data: dict, etag: str, fetch_item):
+        """PATCH the planner item with the etag and get the updated item back
+
+        Without an etag, or when the item changed since the etag was read (412 Precondition Failed), the item is
+        read with fetch_item for its current etag and the PATCH is sent again.
+        """
+        headers = {"Content-Type": "application/json", "Prefer": "return=representation"}
+        if etag is None:
+            etag = self._fetched_etag(path, fetch_item)
+        data_json = json.dumps(data)
+        logger.debug(data_json)
+        try:
+            return GraphHelper().patch_request(path, data_json, dict(headers, **{"If-Match": etag}))
+        except PlannerException as e:
+            if e.status_code != 412:
+                raise
+        logger.warning(f"The planner item {path} changed since it was read, updating it with its current etag")
+        etag = self._fetched_etag(path, fetch_item)
+        return GraphHelper().patch_request(path, data_json, dict(headers, **{"If-Match": etag}))
+
+    @staticmethod
+    def _fetched_etag(path: str, fetch_item) -> str:
+        """Read the planner item for its current etag"""
+        item = fetch_item()
+        if item is None:
+            raise PlannerException(f"Unable to read the current etag of the planner item {path}")
+        return item.additional_data["@odata.etag"]
+
     # PATCH https://graph.microsoft.com/v1.0/planner/tasks/{task-id}/details
     # Content-type: application/json
     # Prefer: return=representation
@@ -382,69 +282,197 @@ class WeeklyMeetingPlanner:
     #     "a93c93c5-10a6-4167-9551-8bafa09967a7": null
     # }
     # }
-    def _update_planner_task_details(self, task_id: str, description: str, references):
-        """Update the planner task details"""
+    def _update_planner_task_details(self, task_id: str, description: str, references, etag: str = None):
+        """Update the planner task details with the etag of the details held, only read if missing or on a conflict"""
         try:
             logger.debug(f"Updating the planner task details for task {task_id}")
-            task_details = self._fetch_task_details(task_id)
-            logger.debug(task_details)
-            task_detail_references = {}
-            order_hint = " !"
-            if references.additional_data:
-                for ref_url, ref_details in references.additional_data.items():
-                    task_detail_references[ref_url] = {
-                        "@odata.type": ref_details["@odata.type"],
-                        "alias": ref_details["alias"],
-                        "previewPriority": order_hint,
-                        "type": ref_details["type"],
-                    }
-            task_details_2_update = {
-                "additional_data": task_details.additional_data,
-                "description": description,
-                "references": task_detail_references,
-            }
-            etag = self._fetch_task_details_etag(task_id)
-            graph_helper: GraphHelper = GraphHelper()
+            task_details_2_update = self._planner_task_details_data({}, description, references.additional_data)
             logger.debug(f"task details dict: {task_details_2_update}")
-            data_json = json.dumps(task_details_2_update)
-            logger.debug(f"task details json: {data_json}")
-            task_update_result = graph_helper.patch_request(
+            task_update_result = self._patch_planner_item(
                 f"planner/tasks/{task_id}/details",
-                data_json,
-                {"Content-Type": "application/json", "If-Match": etag},
+                task_details_2_update,
+                etag,
+                lambda: self._fetch_task_details(task_id),
             )
             logger.debug(task_update_result)
             if task_update_result:
                 logger.debug(f"Task details update result {task_update_result}")
                 return task_update_result
-        except AgendaException as e:
+        except (AgendaException, PlannerException) as e:
             logger.error(f"Error updating task {task_id}. {e}")
         return None
 
+    @staticmethod
+    def _planner_task_data(
+        task: PlannerTask,
+        due_date_time: str,
+        assigned_user_id: str = None,
+        percent_complete: int = 0,
+        unassign_user: bool = False,
+    ) -> dict:
+        """Build the PATCH payload for the planner task"""
+        assignments = {}
+        if assigned_user_id is not None:
+            if unassign_user:
+                assignments = {assigned_user_id: None}
+            else:
+                assignments = {
+                    assigned_user_id: {"@odata.type": "#microsoft.graph.plannerAssignment", "orderHint": " !"}
+                }
+        return {
+            "bucketId": task.bucket_id,
+            "title": task.title,
+            "assignments": assignments,
+            "priority": task.priority,
+            "dueDateTime": due_date_time,
+            "percentComplete": percent_complete,
+        }
+
+    @staticmethod
+    def _planner_task_details_data(additional_data: dict, description: str, references: dict) -> dict:
+        """Build the PATCH payload for the planner task details"""
+        task_detail_references = {}
+        order_hint = " !"
+        if references:
+            for ref_url, ref_details in references.items():
+                task_detail_references[ref_url] = {
+                    "@odata.type": ref_details["@odata.type"],
+                    "alias": ref_details["alias"],
+                    "previewPriority": order_hint,
+                    "type": ref_details["type"],
+                }
+        return {
+            "additional_data": additional_data,
+            "description": description,
+            "references": task_detail_references,
+        }
+
+    # POST https://graph.microsoft.com/v1.0/$batch
+    def _update_planner_tasks_in_batch(self, task_updates: list, retry_conflicts: bool = True):
+        """Update the planner tasks, and optionally their details, via $batch
+
+        Each task update is a dictionary with the task_id and due_date_time, optionally the task already held with
+        its etag, the assigned_user_id, percent_complete and unassign_user for the task and the description and
+        references for its details. Only the tasks not held and the details are read, in one batched pass for the
+        etags, then all the updates are sent in a second batched pass. Updates rejected because the task changed
+        since it was read (412 Precondition Failed) are read and sent again once.
+        """
+        if not task_updates:
+            return {}
+        try:
+            logger.debug(f"Updating {len(task_updates)} planner tasks in batch")
+            graph_helper: GraphHelper = GraphHelper()
+            read_batch = GraphBatch()
+            for task_update in task_updates:
+                task_id = task_update["task_id"]
+                if self._held_task_etag(task_update) is None:
+                    read_batch.get(f"planner/tasks/{task_id}", request_id=f"task-{task_id}")
+                if "description" in task_update:
+                    read_batch.get(f"planner/tasks/{task_id}/details", request_id=f"details-{task_id}")
+            read_results = graph_helper.batch_request(read_batch) if len(read_batch) else {}
+
+            write_batch = GraphBatch()
+            for task_update in task_updates:
+                task_id = task_update["task_id"]
+                task, etag = task_update.get("task"), self._held_task_etag(task_update)
+                if etag is None:
+                    task_result = read_results.get(f"task-{task_id}")
+                    if task_result is None or task_result["status"] != 200:
+                        logger.error(f"Error getting task with id {task_id}. {task_result}")
+                        continue
+                    task, etag = self._fill_planner_task_from_dict(task_result["body"]), task_result["etag"]
+                task_data = self._planner_task_data(
+                    task,
+                    task_update["due_date_time"],
+                    task_update.get("assigned_user_id"),
+                    task_update.get("percent_complete", 0),
+                    task_update.get("unassign_user", False),
+                )
+                write_batch.patch(
+                    f"planner/tasks/{task_id}",
+                    task_data,
+                    {"If-Match": etag},
+                    request_id=f"task-{task_id}",
+                )
+                if "description" not in task_update:
+                    continue
+                details_result = read_results.get(f"details-{task_id}")
+                if details_result is None or details_result["status"] != 200:
+                    logger.error(f"Error getting task details for task {task_id}. {details_result}")
+                    continue
+                task_details_data = self._planner_task_details_data(
+                    {}, task_update["description"], task_update["references"]
+                )
+                write_batch.patch(
+                    f"planner/tasks/{task_id}/details",
+                    task_details_data,
+                    {"If-Match": details_result["etag"]},
+                    request_id=f"details-{task_id}",
+                )
+            write_results = graph_helper.batch_request(write_batch)
+            conflicted_task_ids = {
+                write_result["id"].split("-", 1)[1]
+                for write_result in write_results.values()
+                if write_result["status"] == 412 and retry_conflicts
+            }
+            for write_result in write_results.values():
+                if write_result["status"] >= 300 and write_result["id"].split("-", 1)[1] not in conflicted_task_ids:
+                    logger.error(
+                        f"Error updating {write_result['id']}. {write_result['status']} {write_result['body']}"
+                    )
+            if conflicted_task_ids:
+                logger.warning(f"{len(conflicted_task_ids)} tasks changed since they were read, updating them again")
+                conflicted_task_updates = [
+                    {key: value for key, value in task_update.items() if key != "task"}
+                    for task_update in task_updates
+                    if task_update["task_id"] in conflicted_task_ids
+                ]
+                write_results.update(self._update_planner_tasks_in_batch(conflicted_task_updates, False) or {})
+            return write_results
+        except AgendaException as e:
+            logger.error(f"Error updating tasks in batch. {e}")
+        return None
+
+    @staticmethod
+    def _held_task_etag(task_update: dict):
+        """Get the etag of the task held in the task update, if any"""
+        task = task_update.get("task")
+        if task is None:
+            return None
+        return (task.additional_data or {}).get("@odata.etag")
+
+    def _fetch_tasks_in_next_weeks_bucket(self, plan_id: str):
+        """Fetches the tasks in next weeks bucket from a snapshot of the plan"""
+        plan_snapshot = PlanSnapshot.fetch(plan_id)
+        if plan_snapshot is None:
+            logger.error(f"The buckets and tasks in plan {plan_id} could not be read.")
+            return None
+        next_weeks_bucket = plan_snapshot.get_bucket_by_name(self._next_tuesday_date)
+        if next_weeks_bucket is None:
+            logger.error(f"Next weeks bucket '{self._next_tuesday_date}' was not found.")
+            return None
+        tasks_in_next_weeks_bucket = plan_snapshot.get_tasks_in_bucket(next_weeks_bucket["id"])
+        if not tasks_in_next_weeks_bucket:
+            logger.info(f"There are no new tasks in the '{self._next_tuesday_date}' bucket.")
+            return None
+        return [self._fill_planner_task_from_dict(task) for task in tasks_in_next_weeks_bucket]
+
+    @staticmethod
+    def assigned_to_user_id(task):
+        """Gets the id of the user assigned to the task, without reading the user"""
+        if task.assignments is None or not task.assignments.additional_data:
+            return None
+        return next(iter(task.assignments.additional_data))
+
     def get_assigned_to_user(self, task):
         """Gets assigned to user for task"""
-        retry_count = 0
-        assigned_to_user = None
-        while retry_count < 5:
-            try:
-                logger.debug(f"Getting the assigned to user for task: {task.title}")
-                assigned_to_users = list(task.assignments.additional_data.keys())
-                if assigned_to_users is not None and len(assigned_to_users) > 0:
-                    assigned_to_user_id = list(task.assignments.additional_data.keys())[0]
-                    user = asyncio.run(UserHelper.get_user(self._graph_client, assigned_to_user_id))
-                    if user is not None:
-                        return user
-                else:
-                    return assigned_to_user
-            except RuntimeError as e:
-                if "Event loop is closed" in str(e):
-                    if retry_count < 5:
-                        retry_count = retry_count + 1
-                        time.sleep(10)
-                    else:
-                        logger.error(f"Error getting assigned user. {e}")
-                        break  # do something here, like log the error
-        return assigned_to_user
+        logger.debug(f"Getting the assigned to user for task: {task.title}")
+        return UserHelper.user_from_dict(MemberDirectory.get_user(self._group_id, self.assigned_to_user_id(task)))
+
+    def _user_display_name(self, user_id: str) -> str:
+        """Gets the display name of the user, for logging"""
+        user = MemberDirectory.get_user(self._group_id, user_id)
+        return user["displayName"] if user is not None else user_id
 
     def sync_weekly_meeting_signup_with_plan(self, plan_name: str):
         """Sync the weekly meeting signup tasks plan with the specified name"""
@@ -454,49 +482,59 @@ class WeeklyMeetingPlanner:
         if plan is None:
             logger.error(f"Plan with name {plan_name} was not found.")
             return
-        next_weeks_bucket = PlannerHelper.get_bucket_by_name(self._graph_client, plan.id, self._next_tuesday_date)
-        if next_weeks_bucket is None:
-            logger.error(f"Next weeks bucket '{self._next_tuesday_date}' was not found.")
-            return
-        tasks_in_next_weeks_bucket = self._fetch_tasks_in_bucket(next_weeks_bucket.id)
+        tasks_in_next_weeks_bucket = self._fetch_tasks_in_next_weeks_bucket(plan.id)
         if tasks_in_next_weeks_bucket is None:
-            logger.info(f"There are no new tasks in the '{self._next_tuesday_date}' bucket.")
             return
-        speaker_ids = []
-        evaulator_ids = []
-        for functionary_role_name, signup_task in self.get_functionary_signups(self._next_tuesday).items():
-            if signup_task is None:
+        # The assignees are read from the tasks, the users are only read for the debug log
+        assignee_ids = {task.id: self.assigned_to_user_id(task) for task in tasks_in_next_weeks_bucket}
+        speaker_ids = {
+            assignee_ids[task.id]
+            for task in tasks_in_next_weeks_bucket
+            if "Speaker" in task.title and assignee_ids[task.id] is not None
+        }
+        evaluator_ids = {
+            assignee_ids[task.id]
+            for task in tasks_in_next_weeks_bucket
+            if "Manual Evaluator" in task.title and assignee_ids[task.id] is not None
+        }
+        signup_assignee_ids = {
+            functionary_role_name: self.assigned_to_user_id(signup_task)
+            for functionary_role_name, signup_task in self.get_functionary_signups(self._next_tuesday).items()
+            if signup_task is not None
+        }
+        task_updates = {}
+        for functionary_role_name, signup_assignee_id in signup_assignee_ids.items():
+            if signup_assignee_id is None:
                 continue
             for next_weeks_task in tasks_in_next_weeks_bucket:
-                assigned_to_user = self.get_assigned_to_user(next_weeks_task)
-                if assigned_to_user is not None:
-                    if "Speaker" in next_weeks_task.title:
-                        speaker_ids.append(assigned_to_user.id)
-                    if "Manual Evaluator" in next_weeks_task.title:
-                        evaulator_ids.append(assigned_to_user.id)
+                if assignee_ids[next_weeks_task.id] is not None:
+                    continue
+                if functionary_role_name not in next_weeks_task.title.strip().title():
                     continue
-                if functionary_role_name in next_weeks_task.title.strip().title():
-                    signup_assigned_to_user = self.get_assigned_to_user(signup_task)
-                    if "Speaker" in next_weeks_task.title and (
-                        len(speaker_ids) == 3 or signup_assigned_to_user.id in speaker_ids
-                    ):
+                if "Speaker" in next_weeks_task.title:
+                    if len(speaker_ids) == 3 or signup_assignee_id in speaker_ids:
                         continue
-                    if "Manual Evaluator" in next_weeks_task.title and (
-                        len(evaulator_ids) == 3 or signup_assigned_to_user.id in evaulator_ids
-                    ):
+                    speaker_ids.add(signup_assignee_id)
+                if "Manual Evaluator" in next_weeks_task.title:
+                    if len(evaluator_ids) == 3 or signup_assignee_id in evaluator_ids:
                         continue
-                    logger.debug(
-                        f"Assigining '{signup_assigned_to_user.display_name}' as"
-                        " '{functionary_role_name}' for next week."
-                    )
-                    self._update_planner_task(
-                        task_id=next_weeks_task.id,
-                        due_date_time=f"{self._next_tuesday_date[0:4]}-"
-                        f"{self._next_tuesday_date[4:6]}-"
-                        f"{self._next_tuesday_date[6:8]}T12:00:00Z",
-                        assigned_user_id=signup_assigned_to_user.id,
-                    )
-                    break
+                    evaluator_ids.add(signup_assignee_id)
+                logger.opt(lazy=True).debug(
+                    "Assigning '{}' as '{}' for next week.",
+                    lambda user_id=signup_assignee_id: self._user_display_name(user_id),
+                    lambda role_name=functionary_role_name: role_name,
+                )
+                assignee_ids[next_weeks_task.id] = signup_assignee_id
+                task_updates[next_weeks_task.id] = {
+                    "task_id": next_weeks_task.id,
+                    "task": next_weeks_task,
+                    "due_date_time": f"{self._next_tuesday_date[0:4]}-"
+                    f"{self._next_tuesday_date[4:6]}-"
+                    f"{self._next_tuesday_date[6:8]}T12:00:00Z",
+                    "assigned_user_id": signup_assignee_id,
+                }
+                break
+        self._update_planner_tasks_in_batch(list(task_updates.values()))
 
     def close_past_due_weekly_meeting_signup_tasks(self):
         """Close all the past due signup tasks"""
@@ -516,149 +554,73 @@ class WeeklyMeetingPlanner:
         for tmp_signup_task in tmp_tasks_in_signup_bucket:
             if tmp_signup_task.percent_complete < 100 and tmp_signup_task.due_date_time.date() < date.today():
                 self._update_planner_task(
-                    task_id=tmp_signup_task.id,
+                    task=tmp_signup_task,
                     due_date_time=f'{tmp_signup_task.due_date_time.strftime("%Y-%m-%d")}T12:00:00Z',
-                    assigned_user_id=self.get_assigned_to_user(tmp_signup_task).id,
+                    assigned_user_id=self.assigned_to_user_id(tmp_signup_task),
                     percent_complete=100,
                 )
+                # The closed signups are no longer in the index
+                self._signup_index = None
                 continue
 
     def unassign_absentee_tasks_in_plan(self, plan_name: str):
         """Unassign any tasks assigned to absentees in plan"""
         logger.info(f"Unassigning tasks assigned to absentees in plan {plan_name}")
-        anbsentee_signups = self.get_absentee_signups(self._next_tuesday_date)
-        if len(anbsentee_signups) == 0:
+        absentee_signups = self.get_absentee_signups(self._next_tuesday)
+        if len(absentee_signups) == 0:
             return
         absentee_user_ids = []
-        for absentee_task in self.get_absentee_signups(self._next_tuesday.date):
-            absentee_user_ids.append(self.get_assigned_to_user(absentee_task).id)
+        for absentee_task in absentee_signups:
+            absentee_user_ids.append(self.assigned_to_user_id(absentee_task))
         plan = PlannerHelper.get_plan_by_exact_name(self._graph_client, self._group_id, plan_name)
         if plan is None:
             logger.error(f"Plan with name {plan_name} was not found.")
             return
-        next_weeks_bucket = PlannerHelper.get_bucket_by_name(self._graph_client, plan.id, self._next_tuesday_date)
-        if next_weeks_bucket is None:
-            logger.error(f"Next weeks bucket '{self._next_tuesday_date}' was not found.")
-            return
-        tasks_in_next_weeks_bucket = self._fetch_tasks_in_bucket(next_weeks_bucket.id)
+        tasks_in_next_weeks_bucket = self._fetch_tasks_in_next_weeks_bucket(plan.id)
         if tasks_in_next_weeks_bucket is None:
-            logger.info(f"There are no new tasks in the '{self._next_tuesday_date}' bucket.")
             return
         for next_weeks_task in tasks_in_next_weeks_bucket:
-            assigned_to_user = self.get_assigned_to_user(next_weeks_task)
-            logger.debug(f"Assigned user: {assigned_to_user}, Absentee user ids: {absentee_user_ids}")
-            if assigned_to_user is not None and assigned_to_user.id in absentee_user_ids:
+            assigned_to_user_id = self.assigned_to_user_id(next_weeks_task)
+            logger.debug(f"Assigned user: {assigned_to_user_id}, Absentee user ids: {absentee_user_ids}")
+            if assigned_to_user_id is not None and assigned_to_user_id in absentee_user_ids:
                 self._update_planner_task(
-                    task_id=next_weeks_task.id,
+                    task=next_weeks_task,
                     due_date_time=f"{self._next_tuesday_date[0:4]}-"
                     f"{self._next_tuesday_date[4:6]}-"
                     f"{self._next_tuesday_date[6:8]}T12:00:00Z",
-                    assigned_user_id=assigned_to_user.id,
+                    assigned_user_id=assigned_to_user_id,
                     unassign_user=True,
                 )
 
-    def get_functionary_signups(self, meeting_date: date = None, check_signup_assignments: bool = True) -> dict:
-        """Get all functionaries signups for the meeting date"""
-        functionary_signups: dict = {
-            "Joke Master": None,
-            "Toastmaster": None,
-            "General Evaluator": None,
-            "Speaker 1": None,
-            "Speaker 2": None,
-            "Speaker 3": None,
-            "Manual Evaluator 1": None,
-            "Manual Evaluator 2": None,
-            "Manual Evaluator 3": None,
-            "Ah Counter": None,
-            "Grammarian": None,
-            "Timer": None,
-            "Ballot Counter": None,
-            "WOW": None,
-            "GEM": None,
-        }
-        if not check_signup_assignments:
-            return functionary_signups
+    def signup_index(self, refresh: bool = False):
+        """Get the index of the signup tasks in the 'Functionary Role' bucket, read once and kept for the planner"""
+        if self._signup_index is not None and not refresh:
+            return self._signup_index
         signup_plan = PlannerHelper.get_plan_by_exact_name(self._graph_client, self._group_id, "Weekly Meeting Signup")
         if signup_plan is None:
             logger.error("The Weekly Meeting Signup Plan was not found.")
-            return functionary_signups
+            return SignupIndex([])
         signup_bucket = PlannerHelper.get_bucket_by_name(self._graph_client, signup_plan.id, "Functionary Role")
         if signup_bucket is None:
             logger.error("The Weekly Meeting Plan bucket 'Functionary Role' was not found.")
-            return functionary_signups
+            return SignupIndex([])
         tmp_tasks_in_signup_bucket = self._fetch_tasks_in_bucket(signup_bucket.id)
         if tmp_tasks_in_signup_bucket is None:
             logger.info("There are no new task signups in the 'Functionary Role' bucket.")
-            return functionary_signups
-        for tmp_signup_task in tmp_tasks_in_signup_bucket:
-            if tmp_signup_task.percent_complete < 100 and tmp_signup_task.due_date_time.date() < date.today():
-                continue
-            if tmp_signup_task.title == "Absent":
-                continue
-            if tmp_signup_task.percent_complete < 100 and (
-                tmp_signup_task.due_date_time.strftime("%Y%m%d") == meeting_date.strftime("%Y%m%d")
-            ):
-                logger.debug(
-                    f"Found signup task {tmp_signup_task.title}, \
-                        completion {tmp_signup_task.percent_complete}%, \
-                            due {tmp_signup_task.due_date_time}"
-                )
-                speaker_count = 1
-                manual_evaluator_count = 1
-                if "Speaker" in tmp_signup_task.title:
-                    while speaker_count <= 3 and functionary_signups[f"Speaker {speaker_count}"] is not None:
-                        speaker_count += 1
-                        continue
-                    if speaker_count == 3:
-                        logger.debug(f"All 3 speaker roles have been filled.")
-                        continue
-                    functionary_signups[f"Speaker {speaker_count}"] = tmp_signup_task
-                    continue
-                if "Manual Evaluator" in tmp_signup_task.title:
-                    while (
-                        manual_evaluator_count <= 3
-                        and functionary_signups[f"Manual Evaluator {manual_evaluator_count}"] is not None
-                    ):
-                        manual_evaluator_count += 1
-                        continue
-                    if manual_evaluator_count == 3:
-                        logger.debug(f"All 3 Manual Evaluator roles have been filled.")
-                        continue
-                    functionary_signups[f"Manual Evaluator  {manual_evaluator_count}"] = tmp_signup_task
-                    continue
-                if "GEM" in tmp_signup_task.title:
-                    functionary_signups["GEM"] = tmp_signup_task
-                    continue
-                if "WOW" in tmp_signup_task.title:
-                    functionary_signups["WOW"] = tmp_signup_task
-                    continue
-                functionary_signups[tmp_signup_task.title] = tmp_signup_task
+            return SignupIndex([])
+        self._signup_index = SignupIndex(tmp_tasks_in_signup_bucket)
+        return self._signup_index
 
+    def get_functionary_signups(self, meeting_date: date = None, check_signup_assignments: bool = True) -> dict:
+        """Get all functionaries signups for the meeting date"""
+        if not check_signup_assignments:
+            return dict.fromkeys(SignupIndex.functionary_roles)
+        functionary_signups = self.signup_index().functionary_signups(meeting_date)
         logger.debug(f"Functionary Signup: {functionary_signups}")
         return functionary_signups
 
     def get_absentee_signups(self, meeting_date: date):
         """Get all the absentee signups for the meeting date"""
-        absentee_signups: list = []
-        signup_plan = PlannerHelper.get_plan_by_exact_name(self._graph_client, self._group_id, "Weekly Meeting Signup")
-        if signup_plan is None:
-            logger.error("The Weekly Meeting Signup Plan was not found.")
-            return absentee_signups
-        signup_bucket = PlannerHelper.get_bucket_by_name(self._graph_client, signup_plan.id, "Functionary Role")
-        if signup_bucket is None:
-            logger.error("The Weekly Meeting Plan bucket 'Functionary Role' was not found.")
-            return absentee_signups
-        tmp_tasks_in_signup_bucket = self._fetch_tasks_in_bucket(signup_bucket.id)
-        if tmp_tasks_in_signup_bucket is None:
-            logger.info("There are no new task signups in the 'Functionary Role' bucket.")
-            return absentee_signups
-        for tmp_signup_task in tmp_tasks_in_signup_bucket:
-            if tmp_signup_task.title == "Absent" and tmp_signup_task.due_date_time.date() == meeting_date:
-                absentee_signups.append(tmp_signup_task)
-                absentee_user = self.get_assigned_to_user(tmp_signup_task)
-                logger.debug(
-                    f"Found absentee task, \
-                        assigned to {absentee_user.display_name}"
-                )
-
+        absentee_signups = self.signup_index().absentee_signups(meeting_date)
+        logger.debug(f"Found {len(absentee_signups)} absentee tasks")
         return absentee_signups